@@ -17,6 +17,11 @@ module GenomeAnnotationFileUtil {
                        If not supplied, will use the Taxon Id and the data source to 
                        determine the name.
         taxon_wsname - name of the workspace containing the Taxonomy data, defaults to 'ReferenceTaxons'
+        dedup -- if 1 and the same file was already uploaded with the same genome_name,
+                       workspace_name, source, taxon_wsname and convert_to_legacy, return
+                       the existing GenomeAnnotation instead of saving it again
+        timings -- if 1, the result also gives the seconds spent in each phase of the
+                       upload, and in total
     */
     typedef structure {
         string file_path;
@@ -30,6 +35,8 @@ module GenomeAnnotationFileUtil {
         string taxon_wsname;
 
         boolean convert_to_legacy;
+        boolean dedup;
+        boolean timings;
 
     } GenbankToGenomeAnnotationParams;
 
@@ -37,6 +44,7 @@ module GenomeAnnotationFileUtil {
     /* */
     typedef structure {
         string genome_annotation_ref;
+        mapping<string, float> timings;
     } GenomeAnnotationDetails;
 
 
@@ -44,6 +52,39 @@ module GenomeAnnotationFileUtil {
                 returns (GenomeAnnotationDetails details) authentication required;
 
 
+    /*
+        genome_annotation_ref -- reference to the new GenomeAnnotation, set if the upload worked
+        error -- why the upload failed, set if it did not
+    */
+    typedef structure {
+        string genome_annotation_ref;
+        string error;
+        mapping<string, float> timings;
+    } GenomeAnnotationMassDetails;
+
+    /*
+        details -- one entry per input, in input order
+        succeeded, failed -- the number of uploads that worked and that did not
+        elapsed_seconds -- wall time of the whole batch
+        genomes_per_minute -- aggregate throughput of the successful uploads
+    */
+    typedef structure {
+        list<GenomeAnnotationMassDetails> details;
+        int succeeded;
+        int failed;
+        float elapsed_seconds;
+        float genomes_per_minute;
+    } GenbankToGenomeAnnotationMassResults;
+
+    /*
+        Upload many GenBank files at once.  The uploads run on a bounded pool of workers
+        that share their service clients, and a failed upload is reported in its own
+        entry without failing the batch.
+    */
+    funcdef genbank_to_genome_annotation_mass(list<GenbankToGenomeAnnotationParams> params)
+                returns (GenbankToGenomeAnnotationMassResults results) authentication required;
+
+
     /*
         genome_ref -- Reference to the GenomeAnnotation or Genome object in KBase in 
                       any ws supported format
@@ -54,6 +95,9 @@ module GenomeAnnotationFileUtil {
         new_genbank_file_name -- specify the output name of the genbank file, optional
 
         save_to_shock -- set to 1 or 0, if 1 then output is saved to shock. default is zero
+
+        timings -- if 1, the result also gives the seconds spent in each phase of the
+                      export, and in total
      */
     typedef structure {
 
@@ -65,6 +109,7 @@ module GenomeAnnotationFileUtil {
         string new_genbank_file_name;
 
         boolean save_to_shock;
+        boolean timings;
 
     } GenomeAnnotationToGenbankParams;
 
@@ -72,17 +117,50 @@ module GenomeAnnotationFileUtil {
     typedef structure {
         string path;
         string shock_id;
+        mapping<string, float> timings;
     } GenbankFile;
 
     funcdef genome_annotation_to_genbank(GenomeAnnotationToGenbankParams params)
                 returns (GenbankFile file) authentication required;
 
+    /*
+        genome_refs -- References to the GenomeAnnotation or Genome objects in KBase in
+                      any ws supported format
+
+        save_to_shock -- set to 1 or 0, if 1 then all outputs are saved to shock. default is zero
+
+        parallelism -- how many GenBank files to generate at the same time, optional;
+                      defaults to the service configuration
+     */
+    typedef structure {
+        list<string> genome_refs;
+        boolean save_to_shock;
+        int parallelism;
+    } GenomeAnnotationToGenbankMassParams;
+
+    /*
+        files -- one GenbankFile per genome_ref, in the same order
+    */
+    typedef structure {
+        list<GenbankFile> files;
+    } GenomeAnnotationToGenbankMassOutput;
+
+    /*
+        Export many GenomeAnnotations as GenBank files.  All refs are resolved with a
+        single workspace call and the files are generated concurrently.  If save_to_shock
+        is set, all of the files are loaded to shock in one bulk step.
+    */
+    funcdef genome_annotation_to_genbank_mass(GenomeAnnotationToGenbankMassParams params)
+                returns (GenomeAnnotationToGenbankMassOutput output) authentication required;
+
     typedef structure {
         string input_ref;
+        boolean timings;
     } ExportParams;
 
     typedef structure {
         string shock_id;
+        mapping<string, float> timings;
     } ExportOutput;
 
     /*
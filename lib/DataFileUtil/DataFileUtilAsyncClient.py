@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+'''
+An asyncio client for DataFileUtil, with the same methods as
+DataFileUtilClient.  Every method is a coroutine that submits an SDK job
+and awaits its result; see the blocking client or the DataFileUtil spec
+for the parameters and results.  Job state is polled from the event loop,
+starting after async_job_check_time_ms and backing off from there, so
+many jobs can be waited on without a thread each.
+
+Needs python 3.5 or later.
+'''
+try:
+    # async_baseclient and this client are in a package
+    from .async_baseclient import AsyncBaseClient as _AsyncBaseClient
+except ImportError:
+    # no they aren't
+    from async_baseclient import AsyncBaseClient as _AsyncBaseClient
+
+
+class DataFileUtil(object):
+
+    def __init__(
+            self, url=None, timeout=30 * 60, token=None,
+            trust_all_ssl_certificates=False,
+            service_ver='dev',
+            max_concurrency=50, pool_size=10,
+            async_job_check_time_ms=100):
+        if url is None:
+            url = 'https://kbase.us/services/njs_wrapper'
+        self._service_ver = service_ver
+        self._client = _AsyncBaseClient(
+            url, timeout=timeout, token=token,
+            trust_all_ssl_certificates=trust_all_ssl_certificates,
+            max_concurrency=max_concurrency, pool_size=pool_size,
+            async_job_check_time_ms=async_job_check_time_ms)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._client.close()
+
+    async def shock_to_file(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.shock_to_file', [params], self._service_ver, context)
+
+    async def shock_to_file_mass(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.shock_to_file_mass', [params], self._service_ver, context)
+
+    async def file_to_shock(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.file_to_shock', [params], self._service_ver, context)
+
+    async def package_for_download(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.package_for_download', [params], self._service_ver, context)
+
+    async def file_to_shock_mass(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.file_to_shock_mass', [params], self._service_ver, context)
+
+    async def copy_shock_node(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.copy_shock_node', [params], self._service_ver, context)
+
+    async def own_shock_node(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.own_shock_node', [params], self._service_ver, context)
+
+    async def ws_name_to_id(self, name, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.ws_name_to_id', [name], self._service_ver, context)
+
+    async def save_objects(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.save_objects', [params], self._service_ver, context)
+
+    async def get_objects(self, params, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.get_objects', [params], self._service_ver, context)
+
+    async def versions(self, context=None):
+        return await self._client.run_job(
+            'DataFileUtil.versions', [], self._service_ver, context)
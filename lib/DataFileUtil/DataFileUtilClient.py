@@ -14,7 +14,6 @@ try:
 except:
     # no they aren't
     from baseclient import BaseClient as _BaseClient  # @Reimport
-import time
 
 
 class DataFileUtil(object):
@@ -25,7 +24,7 @@ class DataFileUtil(object):
             trust_all_ssl_certificates=False,
             auth_svc='https://kbase.us/services/authorization/Sessions/Login',
             service_ver='dev',
-            async_job_check_time_ms=5000):
+            async_job_check_time_ms=100):
         if url is None:
             url = 'https://kbase.us/services/njs_wrapper'
         self._service_ver = service_ver
@@ -36,14 +35,6 @@ class DataFileUtil(object):
             auth_svc=auth_svc,
             async_job_check_time_ms=async_job_check_time_ms)
 
-    def _check_job(self, job_id):
-        return self._client._check_job('DataFileUtil', job_id)
-
-    def _shock_to_file_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.shock_to_file', [params],
-             self._service_ver, context)
-
     def shock_to_file(self, params, context=None):
         """
         Download a file from Shock.
@@ -79,17 +70,8 @@ class DataFileUtil(object):
            parameter "file_path" of String, parameter "size" of Long,
            parameter "attributes" of mapping from String to unspecified object
         """
-        job_id = self._shock_to_file_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _shock_to_file_mass_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.shock_to_file_mass', [params],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.shock_to_file', [params], self._service_ver, context)
 
     def shock_to_file_mass(self, params, context=None):
         """
@@ -126,17 +108,8 @@ class DataFileUtil(object):
            parameter "file_path" of String, parameter "size" of Long,
            parameter "attributes" of mapping from String to unspecified object
         """
-        job_id = self._shock_to_file_mass_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _file_to_shock_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.file_to_shock', [params],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.shock_to_file_mass', [params], self._service_ver, context)
 
     def file_to_shock(self, params, context=None):
         """
@@ -179,17 +152,8 @@ class DataFileUtil(object):
            parameter "type" of String, parameter "remote_md5" of String,
            parameter "node_file_name" of String, parameter "size" of String
         """
-        job_id = self._file_to_shock_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _package_for_download_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.package_for_download', [params],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.file_to_shock', [params], self._service_ver, context)
 
     def package_for_download(self, params, context=None):
         """
@@ -217,17 +181,8 @@ class DataFileUtil(object):
            "shock_id" of String, parameter "node_file_name" of String,
            parameter "size" of String
         """
-        job_id = self._package_for_download_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _file_to_shock_mass_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.file_to_shock_mass', [params],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.package_for_download', [params], self._service_ver, context)
 
     def file_to_shock_mass(self, params, context=None):
         """
@@ -270,17 +225,8 @@ class DataFileUtil(object):
            parameter "type" of String, parameter "remote_md5" of String,
            parameter "node_file_name" of String, parameter "size" of String
         """
-        job_id = self._file_to_shock_mass_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _copy_shock_node_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.copy_shock_node', [params],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.file_to_shock_mass', [params], self._service_ver, context)
 
     def copy_shock_node(self, params, context=None):
         """
@@ -306,17 +252,8 @@ class DataFileUtil(object):
            of String, parameter "type" of String, parameter "remote_md5" of
            String
         """
-        job_id = self._copy_shock_node_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _own_shock_node_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.own_shock_node', [params],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.copy_shock_node', [params], self._service_ver, context)
 
     def own_shock_node(self, params, context=None):
         """
@@ -350,17 +287,8 @@ class DataFileUtil(object):
            of String, parameter "type" of String, parameter "remote_md5" of
            String
         """
-        job_id = self._own_shock_node_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _ws_name_to_id_submit(self, name, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.ws_name_to_id', [name],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.own_shock_node', [params], self._service_ver, context)
 
     def ws_name_to_id(self, name, context=None):
         """
@@ -368,17 +296,8 @@ class DataFileUtil(object):
         :param name: instance of String
         :returns: instance of Long
         """
-        job_id = self._ws_name_to_id_submit(name, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _save_objects_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.save_objects', [params],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.ws_name_to_id', [name], self._service_ver, context)
 
     def save_objects(self, params, context=None):
         """
@@ -423,17 +342,8 @@ class DataFileUtil(object):
            parameter "chsum" of String, parameter "size" of Long, parameter
            "meta" of mapping from String to String
         """
-        job_id = self._save_objects_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _get_objects_submit(self, params, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.get_objects', [params],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.save_objects', [params], self._service_ver, context)
 
     def get_objects(self, params, context=None):
         """
@@ -472,17 +382,8 @@ class DataFileUtil(object):
            parameter "chsum" of String, parameter "size" of Long, parameter
            "meta" of mapping from String to String
         """
-        job_id = self._get_objects_submit(params, context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result'][0]
-
-    def _versions_submit(self, context=None):
-        return self._client._submit_job(
-             'DataFileUtil.versions', [],
-             self._service_ver, context)
+        return self._client.run_job(
+            'DataFileUtil.get_objects', [params], self._service_ver, context)
 
     def versions(self, context=None):
         """
@@ -490,9 +391,5 @@ class DataFileUtil(object):
         :returns: multiple set - (1) parameter "wsver" of String, (2)
            parameter "shockver" of String
         """
-        job_id = self._versions_submit(context)
-        while True:
-            time.sleep(self._client.async_job_check_time)
-            job_state = self._check_job(job_id)
-            if job_state['finished']:
-                return job_state['result']
+        return self._client.run_job(
+            'DataFileUtil.versions', [], self._service_ver, context)
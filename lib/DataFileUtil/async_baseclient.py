@@ -0,0 +1,298 @@
+'''
+An asyncio counterpart of BaseClient, for callers that keep many calls in
+flight at once.  A call waiting on the network holds no thread, a
+semaphore bounds how many calls are on the wire, and kept-alive
+connections are pooled per host.  Asynchronous SDK jobs are polled with
+asyncio.sleep, so a job waiting to finish costs neither a thread nor a
+concurrency slot.
+
+This module needs python 3.5 or later and is only imported by the async
+clients.  It has none of BaseClient's batch calls or JobFutures; a job is
+awaited with run_job.
+
+A call is never sent twice: a pooled connection the server has closed is
+dropped before anything is written to it, and a connection that fails
+after the request was written fails the call, as the server may already
+have acted on it.
+'''
+import asyncio as _asyncio
+import json as _json
+import os as _os
+import random as _random
+import ssl as _ssl
+from urllib.parse import urlparse as _urlparse
+
+try:
+    from .baseclient import ServerError, _JSONObjectEncoder
+except ImportError:
+    from baseclient import ServerError, _JSONObjectEncoder
+
+_URL_SCHEME = frozenset(['http', 'https'])
+
+
+class _ConnectionPool(object):
+    ''' Idle kept-alive connections, at most size per host. '''
+
+    def __init__(self, size, ssl_context):
+        self.size = size
+        self._ssl = ssl_context
+        self._idle = {}
+
+    async def get(self, key):
+        ''' Returns (reader, writer), skipping idle connections that were closed. '''
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.transport.is_closing():
+                return reader, writer
+            writer.close()
+        host, port, https = key
+        reader, writer = await _asyncio.open_connection(
+            host, port, ssl=self._ssl if https else None)
+        return reader, writer
+
+    def put(self, key, reader, writer):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.size:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle = {}
+
+
+async def _read_response(reader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError('The server closed the connection')
+    version, status = line.decode('latin-1').split(None, 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, value = line.decode('latin-1').split(':', 1)
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = (version == 'HTTP/1.1' and
+                  headers.get('connection', '').lower() != 'close')
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # trailers, up to the blank line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return int(status), headers, body, keep_alive
+
+
+class AsyncBaseClient(object):
+    '''
+    The asyncio KBase base client.
+    Required initialization arguments (positional):
+    url - the url of the the service to contact, as for BaseClient.
+    Optional arguments (keywords):
+    timeout - calls will fail if they take longer than this value in
+        seconds. Default 1800.
+    token - a KBase authentication token. Defaults to $KB_AUTH_TOKEN.
+    trust_all_ssl_certificates - set to True to trust self-signed
+        certificates.
+    lookup_url - set to true when contacting KBase dynamic services.
+    max_concurrency - the most calls this client has on the wire at once.
+    pool_size - the most idle connections kept open to each host.
+    async_job_check_time_ms, async_job_check_time_scale_percent,
+    async_job_check_max_time_ms - the first wait between job state checks
+        in run_job, how much it grows after each check, and its limit.
+    '''
+    def __init__(
+            self, url=None, timeout=30 * 60, token=None,
+            trust_all_ssl_certificates=False, lookup_url=False,
+            max_concurrency=50, pool_size=10,
+            async_job_check_time_ms=100,
+            async_job_check_time_scale_percent=150,
+            async_job_check_max_time_ms=300000):
+        if url is None:
+            raise ValueError('A url is required')
+        if _urlparse(url).scheme not in _URL_SCHEME:
+            raise ValueError(url + " isn't a valid http url")
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+        self.url = url
+        self.timeout = int(timeout)
+        if self.timeout < 1:
+            raise ValueError('Timeout value must be at least 1 second')
+        self.lookup_url = lookup_url
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.async_job_check_time = async_job_check_time_ms / 1000.0
+        self.async_job_check_time_scale_percent = (
+            async_job_check_time_scale_percent)
+        self.async_job_check_max_time = async_job_check_max_time_ms / 1000.0
+        self._headers = {}
+        token = token or _os.environ.get('KB_AUTH_TOKEN')
+        if token is not None:
+            self._headers['AUTHORIZATION'] = token
+        self._ssl = _ssl.create_default_context()
+        if trust_all_ssl_certificates:
+            self._ssl.check_hostname = False
+            self._ssl.verify_mode = _ssl.CERT_NONE
+        # made on first use, inside the event loop they belong to
+        self._loop = None
+        self._semaphore = None
+        self._pool = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        '''
+        Closes the pooled connections.  Call it before the event loop the
+        client was used in is closed.
+        '''
+        if self._pool is not None and not self._loop.is_closed():
+            self._pool.close()
+        self._loop = self._semaphore = self._pool = None
+
+    async def _post(self, url, body):
+        loop = _asyncio.get_event_loop()
+        if loop is not self._loop:
+            # first use, or use from another loop: connections can't move between loops
+            self.close()
+            self._loop = loop
+            self._semaphore = _asyncio.Semaphore(self.max_concurrency)
+            self._pool = _ConnectionPool(self.pool_size, self._ssl)
+        parts = _urlparse(url)
+        https = parts.scheme == 'https'
+        key = (parts.hostname, parts.port or (443 if https else 80), https)
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        head = ['POST {} HTTP/1.1'.format(path),
+                'Host: {}'.format(parts.netloc),
+                'Content-Type: application/json',
+                'Content-Length: {}'.format(len(body)),
+                'Connection: keep-alive']
+        head += ['{}: {}'.format(k, v) for k, v in self._headers.items()]
+        request = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+        async with self._semaphore:
+            reader, writer = await self._pool.get(key)
+            try:
+                # not retried once written: the call may not be idempotent
+                writer.write(request)
+                await writer.drain()
+                status, headers, data, keep_alive = await _read_response(reader)
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._pool.put(key, reader, writer)
+            else:
+                writer.close()
+            return status, headers, data
+
+    async def _call(self, url, method, params, context=None):
+        arg_hash = {'method': method,
+                    'params': params,
+                    'version': '1.1',
+                    'id': str(_random.random())[2:]
+                    }
+        if context:
+            if type(context) is not dict:
+                raise ValueError('context is not type dict as required.')
+            arg_hash['context'] = context
+        body = _json.dumps(arg_hash, cls=_JSONObjectEncoder).encode('utf-8')
+        status, headers, data = await _asyncio.wait_for(
+            self._post(url, body), self.timeout)
+        text = data.decode('utf-8')
+        if status == 500:
+            if headers.get('content-type') == 'application/json':
+                err = _json.loads(text)
+                if 'error' in err:
+                    raise ServerError(**err['error'])
+            raise ServerError('Unknown', 0, text)
+        if status < 200 or status > 299:
+            raise ServerError('HTTPError', status, text)
+        resp = _json.loads(text)
+        if 'result' not in resp:
+            raise ServerError('Unknown', 0, 'An unknown server error occurred')
+        if not resp['result']:
+            return
+        if len(resp['result']) == 1:
+            return resp['result'][0]
+        return resp['result']
+
+    async def _get_service_url(self, service_method, service_version):
+        if not self.lookup_url:
+            return self.url
+        service, _ = service_method.split('.')
+        service_status_ret = await self._call(
+            self.url, 'ServiceWizard.get_service_status',
+            [{'module_name': service, 'version': service_version}])
+        return service_status_ret['url']
+
+    def _set_up_context(self, service_ver=None, context=None):
+        if service_ver:
+            if not context:
+                context = {}
+            context['service_ver'] = service_ver
+        return context
+
+    async def _check_job(self, service, job_id):
+        return await self._call(self.url, service + '._check_job', [job_id])
+
+    async def _submit_job(self, service_method, args, service_ver=None,
+                          context=None):
+        context = self._set_up_context(service_ver, context)
+        mod, meth = service_method.split('.')
+        return await self._call(self.url, mod + '._' + meth + '_submit',
+                                args, context)
+
+    async def run_job(self, service_method, args, service_ver=None,
+                      context=None):
+        '''
+        Run a SDK method asynchronously, as BaseClient.run_job does.  The
+        job is polled with a growing wait between checks; no thread or
+        concurrency slot is held while waiting.
+        '''
+        mod, _ = service_method.split('.')
+        job_id = await self._submit_job(service_method, args, service_ver,
+                                        context)
+        async_job_check_time = self.async_job_check_time
+        while True:
+            await _asyncio.sleep(async_job_check_time)
+            async_job_check_time = min(
+                async_job_check_time *
+                self.async_job_check_time_scale_percent / 100.0,
+                self.async_job_check_max_time)
+            job_state = await self._check_job(mod, job_id)
+            if job_state['finished']:
+                if job_state.get('error'):
+                    raise ServerError(**job_state['error'])
+                if not job_state['result']:
+                    return
+                if len(job_state['result']) == 1:
+                    return job_state['result'][0]
+                return job_state['result']
+
+    async def call_method(self, service_method, args, service_ver=None,
+                          context=None):
+        '''
+        Call a standard or dynamic service, as BaseClient.call_method does.
+        '''
+        url = await self._get_service_url(service_method, service_ver)
+        context = self._set_up_context(service_ver, context)
+        return await self._call(url, service_method, args, context)
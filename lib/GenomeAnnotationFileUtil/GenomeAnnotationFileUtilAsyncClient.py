@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+'''
+An asyncio client for GenomeAnnotationFileUtil, with the same methods as
+GenomeAnnotationFileUtilClient.  Every method is a coroutine; see the
+blocking client or the spec for the parameters and results.
+
+    async with GenomeAnnotationFileUtil(url, token=token) as gfu:
+        details = await asyncio.gather(*[
+            gfu.genbank_to_genome_annotation(p) for p in uploads])
+
+Needs python 3.5 or later.
+'''
+try:
+    # async_baseclient and this client are in a package
+    from .async_baseclient import AsyncBaseClient as _AsyncBaseClient
+except ImportError:
+    # no they aren't
+    from async_baseclient import AsyncBaseClient as _AsyncBaseClient
+
+
+class GenomeAnnotationFileUtil(object):
+
+    def __init__(
+            self, url=None, timeout=30 * 60, token=None,
+            trust_all_ssl_certificates=False,
+            max_concurrency=50, pool_size=10):
+        if url is None:
+            raise ValueError('A url is required')
+        self._service_ver = None
+        self._client = _AsyncBaseClient(
+            url, timeout=timeout, token=token,
+            trust_all_ssl_certificates=trust_all_ssl_certificates,
+            max_concurrency=max_concurrency, pool_size=pool_size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._client.close()
+
+    async def genbank_to_genome_annotation(self, params, context=None):
+        return await self._client.call_method(
+            'GenomeAnnotationFileUtil.genbank_to_genome_annotation',
+            [params], self._service_ver, context)
+
+    async def genbank_to_genome_annotation_mass(self, params, context=None):
+        return await self._client.call_method(
+            'GenomeAnnotationFileUtil.genbank_to_genome_annotation_mass',
+            [params], self._service_ver, context)
+
+    async def genome_annotation_to_genbank(self, params, context=None):
+        return await self._client.call_method(
+            'GenomeAnnotationFileUtil.genome_annotation_to_genbank',
+            [params], self._service_ver, context)
+
+    async def genome_annotation_to_genbank_mass(self, params, context=None):
+        return await self._client.call_method(
+            'GenomeAnnotationFileUtil.genome_annotation_to_genbank_mass',
+            [params], self._service_ver, context)
+
+    async def export_genome_annotation_as_genbank(self, params, context=None):
+        return await self._client.call_method(
+            'GenomeAnnotationFileUtil.export_genome_annotation_as_genbank',
+            [params], self._service_ver, context)
+
+    async def status(self, context=None):
+        return await self._client.call_method(
+            'GenomeAnnotationFileUtil.status', [], self._service_ver, context)
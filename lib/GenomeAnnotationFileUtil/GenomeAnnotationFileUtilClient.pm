@@ -131,9 +131,12 @@ GenbankToGenomeAnnotationParams is a reference to a hash where the following key
 	source has a value which is a string
 	taxon_wsname has a value which is a string
 	convert_to_legacy has a value which is a GenomeAnnotationFileUtil.boolean
+	dedup has a value which is a GenomeAnnotationFileUtil.boolean
+	timings has a value which is a GenomeAnnotationFileUtil.boolean
 boolean is an int
 GenomeAnnotationDetails is a reference to a hash where the following keys are defined:
 	genome_annotation_ref has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 </pre>
 
@@ -152,9 +155,12 @@ GenbankToGenomeAnnotationParams is a reference to a hash where the following key
 	source has a value which is a string
 	taxon_wsname has a value which is a string
 	convert_to_legacy has a value which is a GenomeAnnotationFileUtil.boolean
+	dedup has a value which is a GenomeAnnotationFileUtil.boolean
+	timings has a value which is a GenomeAnnotationFileUtil.boolean
 boolean is an int
 GenomeAnnotationDetails is a reference to a hash where the following keys are defined:
 	genome_annotation_ref has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 
 =end text
@@ -215,6 +221,134 @@ GenomeAnnotationDetails is a reference to a hash where the following keys are de
  
 
 
+=head2 genbank_to_genome_annotation_mass
+
+  $results = $obj->genbank_to_genome_annotation_mass($params)
+
+=over 4
+
+=item Parameter and return types
+
+=begin html
+
+<pre>
+$params is a reference to a list where each element is a GenomeAnnotationFileUtil.GenbankToGenomeAnnotationParams
+$results is a GenomeAnnotationFileUtil.GenbankToGenomeAnnotationMassResults
+GenbankToGenomeAnnotationParams is a reference to a hash where the following keys are defined:
+	file_path has a value which is a string
+	shock_id has a value which is a string
+	ftp_url has a value which is a string
+	genome_name has a value which is a string
+	workspace_name has a value which is a string
+	source has a value which is a string
+	taxon_wsname has a value which is a string
+	convert_to_legacy has a value which is a GenomeAnnotationFileUtil.boolean
+	dedup has a value which is a GenomeAnnotationFileUtil.boolean
+	timings has a value which is a GenomeAnnotationFileUtil.boolean
+boolean is an int
+GenbankToGenomeAnnotationMassResults is a reference to a hash where the following keys are defined:
+	details has a value which is a reference to a list where each element is a GenomeAnnotationFileUtil.GenomeAnnotationMassDetails
+	succeeded has a value which is an int
+	failed has a value which is an int
+	elapsed_seconds has a value which is a float
+	genomes_per_minute has a value which is a float
+GenomeAnnotationMassDetails is a reference to a hash where the following keys are defined:
+	genome_annotation_ref has a value which is a string
+	error has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
+
+</pre>
+
+=end html
+
+=begin text
+
+$params is a reference to a list where each element is a GenomeAnnotationFileUtil.GenbankToGenomeAnnotationParams
+$results is a GenomeAnnotationFileUtil.GenbankToGenomeAnnotationMassResults
+GenbankToGenomeAnnotationParams is a reference to a hash where the following keys are defined:
+	file_path has a value which is a string
+	shock_id has a value which is a string
+	ftp_url has a value which is a string
+	genome_name has a value which is a string
+	workspace_name has a value which is a string
+	source has a value which is a string
+	taxon_wsname has a value which is a string
+	convert_to_legacy has a value which is a GenomeAnnotationFileUtil.boolean
+	dedup has a value which is a GenomeAnnotationFileUtil.boolean
+	timings has a value which is a GenomeAnnotationFileUtil.boolean
+boolean is an int
+GenbankToGenomeAnnotationMassResults is a reference to a hash where the following keys are defined:
+	details has a value which is a reference to a list where each element is a GenomeAnnotationFileUtil.GenomeAnnotationMassDetails
+	succeeded has a value which is an int
+	failed has a value which is an int
+	elapsed_seconds has a value which is a float
+	genomes_per_minute has a value which is a float
+GenomeAnnotationMassDetails is a reference to a hash where the following keys are defined:
+	genome_annotation_ref has a value which is a string
+	error has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
+
+
+=end text
+
+=item Description
+
+Upload many GenBank files at once.  The uploads run on a bounded pool of workers
+that share their service clients, and a failed upload is reported in its own
+entry without failing the batch.
+
+=back
+
+=cut
+
+ sub genbank_to_genome_annotation_mass
+{
+    my($self, @args) = @_;
+
+# Authentication: required
+
+    if ((my $n = @args) != 1)
+    {
+	Bio::KBase::Exceptions::ArgumentValidationError->throw(error =>
+							       "Invalid argument count for function genbank_to_genome_annotation_mass (received $n, expecting 1)");
+    }
+    {
+	my($params) = @args;
+
+	my @_bad_arguments;
+        (ref($params) eq 'ARRAY') or push(@_bad_arguments, "Invalid type for argument 1 \"params\" (value was \"$params\")");
+        if (@_bad_arguments) {
+	    my $msg = "Invalid arguments passed to genbank_to_genome_annotation_mass:\n" . join("", map { "\t$_\n" } @_bad_arguments);
+	    Bio::KBase::Exceptions::ArgumentValidationError->throw(error => $msg,
+								   method_name => 'genbank_to_genome_annotation_mass');
+	}
+    }
+
+    my $url = $self->{url};
+    my $result = $self->{client}->call($url, $self->{headers}, {
+	    method => "GenomeAnnotationFileUtil.genbank_to_genome_annotation_mass",
+	    params => \@args,
+    });
+    if ($result) {
+	if ($result->is_error) {
+	    Bio::KBase::Exceptions::JSONRPC->throw(error => $result->error_message,
+					       code => $result->content->{error}->{code},
+					       method_name => 'genbank_to_genome_annotation_mass',
+					       data => $result->content->{error}->{error} # JSON::RPC::ReturnObject only supports JSONRPC 1.1 or 1.O
+					      );
+	} else {
+	    return wantarray ? @{$result->result} : $result->result->[0];
+	}
+    } else {
+        Bio::KBase::Exceptions::HTTP->throw(error => "Error invoking method genbank_to_genome_annotation_mass",
+					    status_line => $self->{client}->status_line,
+					    method_name => 'genbank_to_genome_annotation_mass',
+				       );
+    }
+}
+ 
+
+
 =head2 genome_annotation_to_genbank
 
   $file = $obj->genome_annotation_to_genbank($params)
@@ -234,10 +368,12 @@ GenomeAnnotationToGenbankParams is a reference to a hash where the following key
 	workspace_name has a value which is a string
 	new_genbank_file_name has a value which is a string
 	save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
+	timings has a value which is a GenomeAnnotationFileUtil.boolean
 boolean is an int
 GenbankFile is a reference to a hash where the following keys are defined:
 	path has a value which is a string
 	shock_id has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 </pre>
 
@@ -253,10 +389,12 @@ GenomeAnnotationToGenbankParams is a reference to a hash where the following key
 	workspace_name has a value which is a string
 	new_genbank_file_name has a value which is a string
 	save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
+	timings has a value which is a GenomeAnnotationFileUtil.boolean
 boolean is an int
 GenbankFile is a reference to a hash where the following keys are defined:
 	path has a value which is a string
 	shock_id has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 
 =end text
@@ -317,6 +455,112 @@ GenbankFile is a reference to a hash where the following keys are defined:
  
 
 
+=head2 genome_annotation_to_genbank_mass
+
+  $output = $obj->genome_annotation_to_genbank_mass($params)
+
+=over 4
+
+=item Parameter and return types
+
+=begin html
+
+<pre>
+$params is a GenomeAnnotationFileUtil.GenomeAnnotationToGenbankMassParams
+$output is a GenomeAnnotationFileUtil.GenomeAnnotationToGenbankMassOutput
+GenomeAnnotationToGenbankMassParams is a reference to a hash where the following keys are defined:
+	genome_refs has a value which is a reference to a list where each element is a string
+	save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
+	parallelism has a value which is an int
+boolean is an int
+GenomeAnnotationToGenbankMassOutput is a reference to a hash where the following keys are defined:
+	files has a value which is a reference to a list where each element is a GenomeAnnotationFileUtil.GenbankFile
+GenbankFile is a reference to a hash where the following keys are defined:
+	path has a value which is a string
+	shock_id has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
+
+</pre>
+
+=end html
+
+=begin text
+
+$params is a GenomeAnnotationFileUtil.GenomeAnnotationToGenbankMassParams
+$output is a GenomeAnnotationFileUtil.GenomeAnnotationToGenbankMassOutput
+GenomeAnnotationToGenbankMassParams is a reference to a hash where the following keys are defined:
+	genome_refs has a value which is a reference to a list where each element is a string
+	save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
+	parallelism has a value which is an int
+boolean is an int
+GenomeAnnotationToGenbankMassOutput is a reference to a hash where the following keys are defined:
+	files has a value which is a reference to a list where each element is a GenomeAnnotationFileUtil.GenbankFile
+GenbankFile is a reference to a hash where the following keys are defined:
+	path has a value which is a string
+	shock_id has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
+
+
+=end text
+
+=item Description
+
+Export many GenomeAnnotations as GenBank files.  All refs are resolved with a
+single workspace call and the files are generated concurrently.  If save_to_shock
+is set, all of the files are loaded to shock in one bulk step.
+
+=back
+
+=cut
+
+ sub genome_annotation_to_genbank_mass
+{
+    my($self, @args) = @_;
+
+# Authentication: required
+
+    if ((my $n = @args) != 1)
+    {
+	Bio::KBase::Exceptions::ArgumentValidationError->throw(error =>
+							       "Invalid argument count for function genome_annotation_to_genbank_mass (received $n, expecting 1)");
+    }
+    {
+	my($params) = @args;
+
+	my @_bad_arguments;
+        (ref($params) eq 'HASH') or push(@_bad_arguments, "Invalid type for argument 1 \"params\" (value was \"$params\")");
+        if (@_bad_arguments) {
+	    my $msg = "Invalid arguments passed to genome_annotation_to_genbank_mass:\n" . join("", map { "\t$_\n" } @_bad_arguments);
+	    Bio::KBase::Exceptions::ArgumentValidationError->throw(error => $msg,
+								   method_name => 'genome_annotation_to_genbank_mass');
+	}
+    }
+
+    my $url = $self->{url};
+    my $result = $self->{client}->call($url, $self->{headers}, {
+	    method => "GenomeAnnotationFileUtil.genome_annotation_to_genbank_mass",
+	    params => \@args,
+    });
+    if ($result) {
+	if ($result->is_error) {
+	    Bio::KBase::Exceptions::JSONRPC->throw(error => $result->error_message,
+					       code => $result->content->{error}->{code},
+					       method_name => 'genome_annotation_to_genbank_mass',
+					       data => $result->content->{error}->{error} # JSON::RPC::ReturnObject only supports JSONRPC 1.1 or 1.O
+					      );
+	} else {
+	    return wantarray ? @{$result->result} : $result->result->[0];
+	}
+    } else {
+        Bio::KBase::Exceptions::HTTP->throw(error => "Error invoking method genome_annotation_to_genbank_mass",
+					    status_line => $self->{client}->status_line,
+					    method_name => 'genome_annotation_to_genbank_mass',
+				       );
+    }
+}
+ 
+
+
 =head2 export_genome_annotation_as_genbank
 
   $output = $obj->export_genome_annotation_as_genbank($params)
@@ -332,8 +576,11 @@ $params is a GenomeAnnotationFileUtil.ExportParams
 $output is a GenomeAnnotationFileUtil.ExportOutput
 ExportParams is a reference to a hash where the following keys are defined:
 	input_ref has a value which is a string
+	timings has a value which is a GenomeAnnotationFileUtil.boolean
+boolean is an int
 ExportOutput is a reference to a hash where the following keys are defined:
 	shock_id has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 </pre>
 
@@ -345,8 +592,11 @@ $params is a GenomeAnnotationFileUtil.ExportParams
 $output is a GenomeAnnotationFileUtil.ExportOutput
 ExportParams is a reference to a hash where the following keys are defined:
 	input_ref has a value which is a string
+	timings has a value which is a GenomeAnnotationFileUtil.boolean
+boolean is an int
 ExportOutput is a reference to a hash where the following keys are defined:
 	shock_id has a value which is a string
+	timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 
 =end text
@@ -543,6 +793,11 @@ genome_name -- The name you would like to use to reference this GenomeAnnotation
                If not supplied, will use the Taxon Id and the data source to 
                determine the name.
 taxon_wsname - name of the workspace containing the Taxonomy data, defaults to 'ReferenceTaxons'
+dedup -- if 1 and the same file was already uploaded with the same genome_name,
+               workspace_name, source, taxon_wsname and convert_to_legacy, return
+               the existing GenomeAnnotation instead of saving it again
+timings -- if 1, the result also gives the seconds spent in each phase of the
+               upload, and in total
 
 
 =item Definition
@@ -559,6 +814,8 @@ workspace_name has a value which is a string
 source has a value which is a string
 taxon_wsname has a value which is a string
 convert_to_legacy has a value which is a GenomeAnnotationFileUtil.boolean
+dedup has a value which is a GenomeAnnotationFileUtil.boolean
+timings has a value which is a GenomeAnnotationFileUtil.boolean
 
 </pre>
 
@@ -575,6 +832,8 @@ workspace_name has a value which is a string
 source has a value which is a string
 taxon_wsname has a value which is a string
 convert_to_legacy has a value which is a GenomeAnnotationFileUtil.boolean
+dedup has a value which is a GenomeAnnotationFileUtil.boolean
+timings has a value which is a GenomeAnnotationFileUtil.boolean
 
 
 =end text
@@ -596,6 +855,46 @@ convert_to_legacy has a value which is a GenomeAnnotationFileUtil.boolean
 <pre>
 a reference to a hash where the following keys are defined:
 genome_annotation_ref has a value which is a string
+timings has a value which is a reference to a hash where the key is a string and the value is a float
+
+</pre>
+
+=end html
+
+=begin text
+
+a reference to a hash where the following keys are defined:
+genome_annotation_ref has a value which is a string
+timings has a value which is a reference to a hash where the key is a string and the value is a float
+
+
+=end text
+
+=back
+
+
+
+=head2 GenomeAnnotationMassDetails
+
+=over 4
+
+
+=item Description
+
+genome_annotation_ref -- reference to the new GenomeAnnotation, set if the upload worked
+error -- why the upload failed, set if it did not
+
+
+
+=item Definition
+
+=begin html
+
+<pre>
+a reference to a hash where the following keys are defined:
+genome_annotation_ref has a value which is a string
+error has a value which is a string
+timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 </pre>
 
@@ -605,6 +904,56 @@ genome_annotation_ref has a value which is a string
 
 a reference to a hash where the following keys are defined:
 genome_annotation_ref has a value which is a string
+error has a value which is a string
+timings has a value which is a reference to a hash where the key is a string and the value is a float
+
+
+=end text
+
+=back
+
+
+
+
+
+=head2 GenbankToGenomeAnnotationMassResults
+
+=over 4
+
+
+=item Description
+
+details -- one entry per input, in input order
+succeeded, failed -- the number of uploads that worked and that did not
+elapsed_seconds -- wall time of the whole batch
+genomes_per_minute -- aggregate throughput of the successful uploads
+
+
+
+=item Definition
+
+=begin html
+
+<pre>
+a reference to a hash where the following keys are defined:
+details has a value which is a reference to a list where each element is a GenomeAnnotationFileUtil.GenomeAnnotationMassDetails
+succeeded has a value which is an int
+failed has a value which is an int
+elapsed_seconds has a value which is a float
+genomes_per_minute has a value which is a float
+
+</pre>
+
+=end html
+
+=begin text
+
+a reference to a hash where the following keys are defined:
+details has a value which is a reference to a list where each element is a GenomeAnnotationFileUtil.GenomeAnnotationMassDetails
+succeeded has a value which is an int
+failed has a value which is an int
+elapsed_seconds has a value which is a float
+genomes_per_minute has a value which is a float
 
 
 =end text
@@ -631,6 +980,9 @@ new_genbank_file_name -- specify the output name of the genbank file, optional
 
 save_to_shock -- set to 1 or 0, if 1 then output is saved to shock. default is zero
 
+timings -- if 1, the result also gives the seconds spent in each phase of the
+              export, and in total
+
 
 =item Definition
 
@@ -643,6 +995,7 @@ genome_name has a value which is a string
 workspace_name has a value which is a string
 new_genbank_file_name has a value which is a string
 save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
+timings has a value which is a GenomeAnnotationFileUtil.boolean
 
 </pre>
 
@@ -656,6 +1009,7 @@ genome_name has a value which is a string
 workspace_name has a value which is a string
 new_genbank_file_name has a value which is a string
 save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
+timings has a value which is a GenomeAnnotationFileUtil.boolean
 
 
 =end text
@@ -678,6 +1032,7 @@ save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
 a reference to a hash where the following keys are defined:
 path has a value which is a string
 shock_id has a value which is a string
+timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 </pre>
 
@@ -688,6 +1043,89 @@ shock_id has a value which is a string
 a reference to a hash where the following keys are defined:
 path has a value which is a string
 shock_id has a value which is a string
+timings has a value which is a reference to a hash where the key is a string and the value is a float
+
+
+=end text
+
+=back
+
+
+
+=head2 GenomeAnnotationToGenbankMassParams
+
+=over 4
+
+
+=item Description
+
+genome_refs -- References to the GenomeAnnotation or Genome objects in KBase in
+              any ws supported format
+
+save_to_shock -- set to 1 or 0, if 1 then all outputs are saved to shock. default is zero
+
+parallelism -- how many GenBank files to generate at the same time, optional;
+              defaults to the service configuration
+
+
+
+=item Definition
+
+=begin html
+
+<pre>
+a reference to a hash where the following keys are defined:
+genome_refs has a value which is a reference to a list where each element is a string
+save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
+parallelism has a value which is an int
+
+</pre>
+
+=end html
+
+=begin text
+
+a reference to a hash where the following keys are defined:
+genome_refs has a value which is a reference to a list where each element is a string
+save_to_shock has a value which is a GenomeAnnotationFileUtil.boolean
+parallelism has a value which is an int
+
+
+=end text
+
+=back
+
+
+
+
+
+=head2 GenomeAnnotationToGenbankMassOutput
+
+=over 4
+
+
+=item Description
+
+files -- one GenbankFile per genome_ref, in the same order
+
+
+
+=item Definition
+
+=begin html
+
+<pre>
+a reference to a hash where the following keys are defined:
+files has a value which is a reference to a list where each element is a GenomeAnnotationFileUtil.GenbankFile
+
+</pre>
+
+=end html
+
+=begin text
+
+a reference to a hash where the following keys are defined:
+files has a value which is a reference to a list where each element is a GenomeAnnotationFileUtil.GenbankFile
 
 
 =end text
@@ -709,6 +1147,7 @@ shock_id has a value which is a string
 <pre>
 a reference to a hash where the following keys are defined:
 input_ref has a value which is a string
+timings has a value which is a GenomeAnnotationFileUtil.boolean
 
 </pre>
 
@@ -718,6 +1157,7 @@ input_ref has a value which is a string
 
 a reference to a hash where the following keys are defined:
 input_ref has a value which is a string
+timings has a value which is a GenomeAnnotationFileUtil.boolean
 
 
 =end text
@@ -739,6 +1179,7 @@ input_ref has a value which is a string
 <pre>
 a reference to a hash where the following keys are defined:
 shock_id has a value which is a string
+timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 </pre>
 
@@ -748,6 +1189,7 @@ shock_id has a value which is a string
 
 a reference to a hash where the following keys are defined:
 shock_id has a value which is a string
+timings has a value which is a reference to a hash where the key is a string and the value is a float
 
 
 =end text
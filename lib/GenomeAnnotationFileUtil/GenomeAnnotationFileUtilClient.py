@@ -47,14 +47,58 @@ class GenomeAnnotationFileUtil(object):
            parameter "genome_name" of String, parameter "workspace_name" of
            String, parameter "source" of String, parameter "taxon_wsname" of
            String, parameter "convert_to_legacy" of type "boolean" (A boolean
-           - 0 for false, 1 for true. @range (0, 1))
+           - 0 for false, 1 for true. @range (0, 1)), parameter "dedup" of
+           type "boolean" (A boolean - 0 for false, 1 for true. @range (0,
+           1)), parameter "timings" of type "boolean" (A boolean - 0 for
+           false, 1 for true. @range (0, 1))
         :returns: instance of type "GenomeAnnotationDetails" -> structure:
-           parameter "genome_annotation_ref" of String
+           parameter "genome_annotation_ref" of String, parameter "timings"
+           of mapping from String to Double
         """
         return self._client.call_method(
             'GenomeAnnotationFileUtil.genbank_to_genome_annotation',
             [params], self._service_ver, context)
 
+    def genbank_to_genome_annotation_mass(self, params, context=None):
+        """
+        Upload many GenBank files at once.  The uploads run on a bounded
+        pool of workers that share their service clients, and a failed
+        upload is reported in its own entry without failing the batch.
+        :param params: instance of list of type
+           "GenbankToGenomeAnnotationParams" (file_path or shock_id -- Local
+           path or shock_id of the uploaded file with genome sequence in
+           GenBank format or zip-file with GenBank files. genome_name -- The
+           name you would like to use to reference this GenomeAnnotation. If
+           not supplied, will use the Taxon Id and the data source to
+           determine the name. taxon_wsname - name of the workspace
+           containing the Taxonomy data, defaults to 'ReferenceTaxons') ->
+           structure: parameter "file_path" of String, parameter "shock_id"
+           of String, parameter "ftp_url" of String, parameter "genome_name"
+           of String, parameter "workspace_name" of String, parameter
+           "source" of String, parameter "taxon_wsname" of String, parameter
+           "convert_to_legacy" of type "boolean" (A boolean - 0 for false, 1
+           for true. @range (0, 1)), parameter "dedup" of type "boolean" (A
+           boolean - 0 for false, 1 for true. @range (0, 1)), parameter
+           "timings" of type "boolean" (A boolean - 0 for false, 1 for true.
+           @range (0, 1))
+        :returns: instance of type "GenbankToGenomeAnnotationMassResults"
+           (details -- one entry per input, in input order succeeded, failed
+           -- the number of uploads that worked and that did not
+           elapsed_seconds -- wall time of the whole batch genomes_per_minute
+           -- aggregate throughput of the successful uploads) -> structure:
+           parameter "details" of list of type "GenomeAnnotationMassDetails"
+           (genome_annotation_ref -- reference to the new GenomeAnnotation,
+           set if the upload worked error -- why the upload failed, set if it
+           did not) -> structure: parameter "genome_annotation_ref" of
+           String, parameter "error" of String, parameter "timings" of
+           mapping from String to Double, parameter "succeeded" of Long,
+           parameter "failed" of Long, parameter "elapsed_seconds" of Double,
+           parameter "genomes_per_minute" of Double
+        """
+        return self._client.call_method(
+            'GenomeAnnotationFileUtil.genbank_to_genome_annotation_mass',
+            [params], self._service_ver, context)
+
     def genome_annotation_to_genbank(self, params, context=None):
         """
         :param params: instance of type "GenomeAnnotationToGenbankParams"
@@ -64,27 +108,58 @@ class GenomeAnnotationFileUtil(object):
            what you want.  If genome_ref is defined, these args are ignored.
            new_genbank_file_name -- specify the output name of the genbank
            file, optional save_to_shock -- set to 1 or 0, if 1 then output is
-           saved to shock. default is zero) -> structure: parameter
-           "genome_ref" of String, parameter "genome_name" of String,
-           parameter "workspace_name" of String, parameter
-           "new_genbank_file_name" of String, parameter "save_to_shock" of
-           type "boolean" (A boolean - 0 for false, 1 for true. @range (0, 1))
+           saved to shock. default is zero timings -- if 1, the result also
+           gives the seconds spent in each phase of the export, and in total)
+           -> structure: parameter "genome_ref" of String, parameter
+           "genome_name" of String, parameter "workspace_name" of String,
+           parameter "new_genbank_file_name" of String, parameter
+           "save_to_shock" of type "boolean" (A boolean - 0 for false, 1 for
+           true. @range (0, 1)), parameter "timings" of type "boolean" (A
+           boolean - 0 for false, 1 for true. @range (0, 1))
         :returns: instance of type "GenbankFile" -> structure: parameter
-           "path" of String, parameter "shock_id" of String
+           "path" of String, parameter "shock_id" of String, parameter
+           "timings" of mapping from String to Double
         """
         return self._client.call_method(
             'GenomeAnnotationFileUtil.genome_annotation_to_genbank',
             [params], self._service_ver, context)
 
+    def genome_annotation_to_genbank_mass(self, params, context=None):
+        """
+        Export many GenomeAnnotations as GenBank files.  All refs are
+        resolved with a single workspace call and the files are generated
+        concurrently.  If save_to_shock is set, all of the files are loaded
+        to shock in one bulk step.
+        :param params: instance of type "GenomeAnnotationToGenbankMassParams"
+           (genome_refs -- References to the GenomeAnnotation or Genome
+           objects in KBase in any ws supported format save_to_shock -- set
+           to 1 or 0, if 1 then all outputs are saved to shock. default is
+           zero parallelism -- how many GenBank files to generate at the same
+           time, optional; defaults to the service configuration) ->
+           structure: parameter "genome_refs" of list of String, parameter
+           "save_to_shock" of type "boolean" (A boolean - 0 for false, 1 for
+           true. @range (0, 1)), parameter "parallelism" of Long
+        :returns: instance of type "GenomeAnnotationToGenbankMassOutput"
+           (files -- one GenbankFile per genome_ref, in the same order) ->
+           structure: parameter "files" of list of type "GenbankFile" ->
+           structure: parameter "path" of String, parameter "shock_id" of
+           String, parameter "timings" of mapping from String to Double
+        """
+        return self._client.call_method(
+            'GenomeAnnotationFileUtil.genome_annotation_to_genbank_mass',
+            [params], self._service_ver, context)
+
     def export_genome_annotation_as_genbank(self, params, context=None):
         """
         A method designed especially for download, this calls 'genome_annotation_to_genbank' to do
         the work, but then packages the output with WS provenance and object info into
         a zip file and saves to shock.
         :param params: instance of type "ExportParams" -> structure:
-           parameter "input_ref" of String
+           parameter "input_ref" of String, parameter "timings" of type
+           "boolean" (A boolean - 0 for false, 1 for true. @range (0, 1))
         :returns: instance of type "ExportOutput" -> structure: parameter
-           "shock_id" of String
+           "shock_id" of String, parameter "timings" of mapping from String
+           to Double
         """
         return self._client.call_method(
             'GenomeAnnotationFileUtil.export_genome_annotation_as_genbank',
@@ -4,17 +4,29 @@
 import os
 import sys
 import shutil
+import time
 import traceback
 import uuid
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from threading import Lock
 from pprint import pprint, pformat
 
 from biokbase.workspace.client import Workspace
 
-# utilities for unpacking things- could switch to functions in DataFileUtil when available
+# utilities for downloading things- could switch to functions in DataFileUtil when available
 import biokbase.Transform.script_utils as script_utils
 
 import trns_transform_Genbank_Genome_to_KBaseGenomeAnnotations_GenomeAnnotation as uploader
 from DataFileUtil.DataFileUtilClient import DataFileUtil
+from DataFileUtil import baseclient as dfu_baseclient
+from GenomeAnnotationFileUtil import export_cache
+from GenomeAnnotationFileUtil import genbank_input
+from GenomeAnnotationFileUtil import memory_usage
+from GenomeAnnotationFileUtil import ref_resolver
+from GenomeAnnotationFileUtil import staging
+from GenomeAnnotationFileUtil import timings
+from GenomeAnnotationFileUtil import upload_index
 
 # For Genome to genbank downloader
 from doekbase.data_api.downloaders import GenomeAnnotation
@@ -43,6 +55,299 @@ class GenomeAnnotationFileUtil:
     GIT_COMMIT_HASH = "60583507a89da477f8e7b50cfc69c387a6874728"
     
     #BEGIN_CLASS_HEADER
+    def _decompress_staged_file(self, path, input_directory):
+        '''
+        Decompresses a staged input file, or each member of a staged
+        archive, into the staging directory for the uploader, and drops the
+        compressed file.  A plain file is left as it is.
+        '''
+        if genbank_input.detect_compression(path) is None:
+            return
+        for name, stream in genbank_input.iter_input_streams(path):
+            # a new file of its own: a member named like the staged archive must not
+            # write through it, as a hard link or symlink, to the caller's file
+            out_path, out = staging.create_new_file(input_directory, name)
+            print('decompressing ' + os.path.basename(path) + ' -> ' + os.path.basename(out_path))
+            with stream:
+                with out:
+                    shutil.copyfileobj(stream, out, 1 << 20)
+        # the staged file is our own link or copy, so this never touches the caller's file
+        os.remove(path)
+
+    def _prepare_genbank_input(self, staged_files, input_directory):
+        '''
+        Decompresses every staged input and returns the number and size of
+        the GenBank files to upload, with their contigs, bases and features
+        counted from their LOCUS and feature key lines.  Fails before
+        anything is saved if there is nothing to upload.
+        '''
+        for path in staged_files:
+            self._decompress_staged_file(path, input_directory)
+        genbank_files = []
+        for f in sorted(os.listdir(input_directory)):
+            path = os.path.join(input_directory, f)
+            if genbank_input.is_genbank_file(path):
+                genbank_files.append(path)
+        if not genbank_files:
+            raise ValueError('No GenBank files found in the input')
+        stats = {'files': len(genbank_files), 'bytes_in': 0, 'contigs': 0, 'bases': 0,
+                 'features': 0}
+        for path in genbank_files:
+            stats['bytes_in'] += os.path.getsize(path)
+            with open(path, 'rb') as f:
+                for k, n in genbank_input.count_records(f).items():
+                    stats[k] += n
+        return stats
+
+    def _data_file_util(self, token):
+        '''
+        Returns a DataFileUtil client for token, reusing the one made for an
+        earlier request with the same token so that calls go out over its
+        warm pooled connections.
+        '''
+        with self._client_lock:
+            dfUtil = self._dfu_clients.pop(token, None)
+            if dfUtil is None:
+                dfUtil = DataFileUtil(self.callback_url, token=token,
+                                      async_job_check_time_ms=self.job_check_first_ms)
+            # most recently used last; the least recently used token is dropped
+            self._dfu_clients[token] = dfUtil
+            while len(self._dfu_clients) > self.max_cached_clients:
+                self._dfu_clients.popitem(last=False)
+            return dfUtil
+
+    def _genbank_to_genome_annotation(self, ctx, params, usage=None):
+        '''
+        Does the work of genbank_to_genome_annotation, adding the size of
+        the input to usage, a MemoryUsage, if given.
+        '''
+        print('genbank_to_genome_annotation -- paramaters = ')
+        pprint(params)
+        timer = timings.PhaseTimer('genbank_to_genome_annotation')
+
+        # validate input and set defaults.  Note that because we don't call the uploader method
+        # as a stand alone script, we do the validation here.
+        if 'workspace_name' not in params:
+            raise ValueError('workspace_name field was not defined')
+        workspace_name = params['workspace_name']
+
+        if 'genome_name' not in params:
+            raise ValueError('genome_name field was not defined')
+        genome_name = params['genome_name']
+
+        source = 'Genbank'
+        if 'source' in params:
+            source = source;
+
+        taxon_wsname = 'ReferenceTaxons'
+        if 'taxon_wsname' in params:
+            taxon_wsname = params['taxon_wsname']
+
+        # other options to handle
+        # release
+        # taxon_reference
+        # exclude_feature_types
+        # type
+
+
+        # construct the input directory where we stage files
+        input_directory =  os.path.join(self.sharedFolder, 'genome-upload-staging-'+str(uuid.uuid4()))
+        os.makedirs(input_directory)
+
+        # the staging directory goes whatever happens, so failed uploads don't fill scratch
+        staging_directory = input_directory
+        try:
+            # determine how to get the file: if it is from shock, download it.  If it
+            # is just sitting there, then use it.  Move the file to the staging input directory
+
+            genbank_file_path = None
+            staged_files = []
+
+            with timer.phase('stage_input'):
+                if 'file_path' not in params:
+                    if 'shock_id' not in params:
+                        if 'ftp_url' not in params:
+                            raise ValueError('No input file (either file_path, shock_id, or ftp_url) provided')
+                        else:
+                            # TODO handle ftp - this creates a directory for us, so update the input directory
+                            print('calling Transform download utility: script_utils.download');
+                            print('URL provided = '+params['ftp_url']);
+                            script_utils.download_from_urls(
+                                    working_directory = input_directory,
+                                    token = ctx['token'], # not sure why this requires a token to download from a url...
+                                    urls  = {
+                                                'ftpfiles': params['ftp_url']
+                                            }
+                                );
+                            input_directory = os.path.join(input_directory,'ftpfiles')
+                            # unpack everything in input directory
+                            dir_contents = os.listdir(input_directory)
+                            print('downloaded directory listing:')
+                            pprint(dir_contents)
+                            for f in dir_contents:
+                                if os.path.isfile(os.path.join(input_directory, f)):
+                                    staged_files.append(os.path.join(input_directory, f))
+
+                    else:
+                        # handle shock file
+                        dfUtil = self._data_file_util(ctx['token'])
+                        file_name = dfUtil.shock_to_file({
+                                            'file_path': input_directory,
+                                            'shock_id': params['shock_id']
+                                        })['node_file_name']
+                        genbank_file_path = os.path.join(input_directory, file_name)
+                else:
+                    # link the local file into the input staging directory, copying it only if it cannot
+                    # be linked or cloned (NOTE: could just move it, but then this method would have the
+                    # side effect of moving your file which another SDK module might have an open handle on)
+                    local_file_path = params['file_path']
+                    staging_start = time.time()
+                    genbank_file_path, staging_method = staging.stage_file(
+                        local_file_path, input_directory, self.staging_strategies)
+                    print('staged input file by {} in {:.3f}s ({} bytes)'.format(
+                        staging_method, time.time() - staging_start, os.path.getsize(local_file_path)))
+
+            if genbank_file_path is not None:
+                print("input genbank file =" + genbank_file_path)
+                staged_files.append(genbank_file_path)
+
+            # with dedup on, an input that was already saved with the same parameters is not
+            # parsed or saved again, as long as the object it was saved to still exists
+            dedup_key = None
+            if params.get('dedup') == 1:
+                with timer.phase('dedup_lookup'):
+                    dedup_key = (upload_index.hash_files(staged_files), upload_index.normalize_params(params))
+                    saved_ref = self.upload_index.lookup(dedup_key[0], dedup_key[1])
+                    saved_info = None
+                    if saved_ref is not None:
+                        saved_info = self.ref_resolver.get_info([saved_ref], fresh=True, ignore_errors=True)[0]
+                if saved_ref is not None:
+                    if saved_info is not None:
+                        print('input was already saved as ' + saved_ref + ', skipping the upload')
+                        return self._with_timings({'genome_annotation_ref': saved_ref}, params, timer)
+                    print('input was saved as ' + saved_ref + ' but that object is gone, uploading again')
+                    self.upload_index.forget(dedup_key[0], dedup_key[1])
+
+            # decompress the staged input, check there is something to upload and size it
+            with timer.phase('prepare_input'):
+                genome_stats = self._prepare_genbank_input(staged_files, input_directory)
+            print('input genbank stats = ')
+            pprint(genome_stats)
+            if usage is not None:
+                usage.sizes.update((k, genome_stats[k]) for k in ('bytes_in', 'contigs', 'features', 'bases'))
+
+            # refuse an input that is clearly too big for the memory left, before the upload takes it
+            if self.memory_per_input_byte > 0:
+                memory_usage.check_fits('genbank_to_genome_annotation',
+                                        int(self.memory_per_input_byte * genome_stats['bytes_in']))
+
+            # do the upload (doesn't seem to return any information)
+            with timer.phase('upload_genome'):
+                uploader.upload_genome(
+                        logger=None,
+
+                        shock_service_url = self.shockURL,
+                        handle_service_url = self.handleURL,
+                        workspace_service_url = self.workspaceURL,
+
+                        input_directory=input_directory,
+
+                        workspace_name   = workspace_name,
+                        core_genome_name = genome_name,
+                        source           = source,
+                        taxon_wsname     = taxon_wsname
+                    )
+
+            #### Code to convert to legacy type if requested
+            if 'convert_to_legacy' in params and params['convert_to_legacy']==1:
+                from doekbase.data_api.converters import genome as cvt
+                print('Converting to legacy type, object={}'.format(genome_name))
+                with timer.phase('convert_genome'):
+                    cvt.convert_genome(
+                            shock_url=self.shockURL,
+                            handle_url=self.handleURL,
+                            ws_url=self.workspaceURL,
+                            obj_name=genome_name,
+                            ws_name=workspace_name)
+        finally:
+            # clear the temp directory
+            with timer.phase('cleanup'):
+                shutil.rmtree(staging_directory, ignore_errors=True)
+
+        # get WS metadata to return the reference to the object (could be returned by the uploader method...)
+        # (fresh, as a cached answer for this name would be the version before this upload)
+        with timer.phase('get_object_info'):
+            info = self.ref_resolver.get_info([workspace_name + '/' + genome_name], fresh=True)[0]
+
+        details = {
+            'genome_annotation_ref':ref_resolver.versioned_ref(info)
+        }
+        if dedup_key is not None:
+            self.upload_index.store(dedup_key[0], dedup_key[1], details['genome_annotation_ref'])
+        return self._with_timings(details, params, timer)
+
+    def _with_timings(self, result, params, timer):
+        '''
+        Logs the phase timings of a call and adds them to its result if the
+        timings param is set.
+        '''
+        timer.log()
+        if params.get('timings') == 1:
+            result['timings'] = timer.as_dict()
+        return result
+
+    def _download_genbank(self, ctx, genome_ref, new_genbank_file_name, timer,
+                          output_directory=None, shared=False):
+        '''
+        Writes the GenBank file for genome_ref, a ws/obj/ver ref, into
+        output_directory, or a new working directory if that is not given,
+        and returns its path.  With the export cache on, a ref that was
+        exported before is handed out from the cache instead, once the
+        caller is seen to be able to read it; with shared, the file may be
+        the cache entry itself, so it must only be read and deleted by this
+        service and never returned to a caller.  Generating the file is
+        timed as download_as_gbk and, with the cache on, the whole cache
+        lookup as export_cache.
+        '''
+        # construct a working directory to hand off to the data_api
+        working_directory =  os.path.join(self.sharedFolder, 'genome-download-'+str(uuid.uuid4()))
+        os.makedirs(working_directory)
+        output_file_destination = os.path.join(output_directory or working_directory,
+                                               new_genbank_file_name)
+
+        def build(path):
+            print('calling: doekbase.data_api.downloaders.GenomeAnnotation.downloadAsGBK');
+            with timer.phase('download_as_gbk'):
+                GenomeAnnotation.downloadAsGBK(
+                                    genome_ref,
+                                    self.services,
+                                    ctx['token'],
+                                    path,
+                                    working_directory)
+
+        def check_access():
+            # the entry may have been built for another user, and the shared ref
+            # resolver does not look refs up as the caller, so ask as the caller
+            with timer.phase('check_access'):
+                Workspace(url=self.workspaceURL, token=ctx['token']).get_object_info_new(
+                    {'objects': [{'ref': genome_ref}]})
+
+        written = False
+        try:
+            if self.export_cache is None:
+                build(output_file_destination)
+            else:
+                with timer.phase('export_cache'):
+                    hit = self.export_cache.get(genome_ref, output_file_destination, build, shared,
+                                                check_access)
+                if hit:
+                    print('export of ' + genome_ref + ' found in the cache')
+            written = True
+        finally:
+            # unless it holds the file, only the data_api's intermediate files are left in here
+            if output_directory is not None or not written:
+                shutil.rmtree(working_directory, ignore_errors=True)
+        return output_file_destination
     #END_CLASS_HEADER
 
     # config contains contents of config file in a hash or None if it couldn't
@@ -54,6 +359,32 @@ class GenomeAnnotationFileUtil:
         self.handleURL = config['handle-service-url']
         self.sharedFolder = config['scratch']
         self.callback_url = os.environ['SDK_CALLBACK_URL']
+        self.mass_upload_workers = int(config.get('mass-upload-workers', 4))
+        self.mass_download_workers = int(config.get('mass-download-workers', 4))
+        self.staging_strategies = staging.STRATEGIES
+        if config.get('staging-strategies'):
+            self.staging_strategies = staging.parse_strategies(config['staging-strategies'])
+        self.upload_index = upload_index.UploadIndex(
+            os.path.join(self.sharedFolder, 'upload-index.sqlite'),
+            max_entries=int(config.get('upload-index-max-entries', 10000)))
+        self.export_cache = None
+        export_cache_bytes = int(config.get('export-cache-bytes', 0))
+        if export_cache_bytes > 0:
+            self.export_cache = export_cache.ExportCache(
+                os.path.join(self.sharedFolder, 'genbank-export-cache'), export_cache_bytes)
+        # clients and their connection pools are kept for reuse across requests
+        dfu_baseclient.set_default_pool_size(int(config.get('http-pool-size', 10)))
+        dfu_baseclient.set_service_url_ttl(float(config.get('service-url-ttl', 300)))
+        self.max_cached_clients = int(config.get('max-cached-clients', 100))
+        self.job_check_first_ms = int(config.get('job-check-first-ms', 20))
+        self.memory_trace_top = int(config.get('memory-trace-top', 0))
+        self.memory_per_input_byte = float(config.get('memory-bytes-per-input-byte', 0))
+        self._dfu_clients = OrderedDict()
+        self._client_lock = Lock()
+        # shared by every request this process handles
+        self.ref_resolver = ref_resolver.RefResolver(
+            lambda: Workspace(url=self.workspaceURL),
+            ttl=float(config.get('ref-cache-ttl', 60)))
         self.services = {
             "workspace_service_url": self.workspaceURL,
             "shock_service_url": self.shockURL,
@@ -77,142 +408,20 @@ class GenomeAnnotationFileUtil:
            parameter "genome_name" of String, parameter "workspace_name" of
            String, parameter "source" of String, parameter "taxon_wsname" of
            String, parameter "convert_to_legacy" of type "boolean" (A boolean
-           - 0 for false, 1 for true. @range (0, 1))
+           - 0 for false, 1 for true. @range (0, 1)), parameter "dedup" of
+           type "boolean" (A boolean - 0 for false, 1 for true. @range (0,
+           1)), parameter "timings" of type "boolean" (A boolean - 0 for
+           false, 1 for true. @range (0, 1))
         :returns: instance of type "GenomeAnnotationDetails" -> structure:
-           parameter "genome_annotation_ref" of String
+           parameter "genome_annotation_ref" of String, parameter "timings"
+           of mapping from String to Double
         """
         # ctx is the context object
         # return variables are: details
         #BEGIN genbank_to_genome_annotation
 
-        print('genbank_to_genome_annotation -- paramaters = ')
-        pprint(params)
-
-        # validate input and set defaults.  Note that because we don't call the uploader method
-        # as a stand alone script, we do the validation here.
-        if 'workspace_name' not in params:
-            raise ValueError('workspace_name field was not defined')
-        workspace_name = params['workspace_name']
-
-        if 'genome_name' not in params:
-            raise ValueError('genome_name field was not defined')
-        genome_name = params['genome_name']
-
-        source = 'Genbank'
-        if 'source' in params:
-            source = source;
-
-        taxon_wsname = 'ReferenceTaxons'
-        if 'taxon_wsname' in params:
-            taxon_wsname = params['taxon_wsname']
-
-        # other options to handle
-        # release
-        # taxon_reference
-        # exclude_feature_types
-        # type
-
-
-        # construct the input directory where we stage files
-        input_directory =  os.path.join(self.sharedFolder, 'genome-upload-staging-'+str(uuid.uuid4()))
-        os.makedirs(input_directory)
-
-        # determine how to get the file: if it is from shock, download it.  If it
-        # is just sitting there, then use it.  Move the file to the staging input directory
-
-        genbank_file_path = None
-
-        if 'file_path' not in params:
-            if 'shock_id' not in params:
-                if 'ftp_url' not in params:
-                    raise ValueError('No input file (either file_path, shock_id, or ftp_url) provided')
-                else:
-                    # TODO handle ftp - this creates a directory for us, so update the input directory
-                    print('calling Transform download utility: script_utils.download');
-                    print('URL provided = '+params['ftp_url']);
-                    script_utils.download_from_urls(
-                            working_directory = input_directory,
-                            token = ctx['token'], # not sure why this requires a token to download from a url...
-                            urls  = {
-                                        'ftpfiles': params['ftp_url']
-                                    }
-                        );
-                    input_directory = os.path.join(input_directory,'ftpfiles')
-                    # unpack everything in input directory
-                    dir_contents = os.listdir(input_directory)
-                    print('downloaded directory listing:')
-                    pprint(dir_contents)
-                    dir_files = []
-                    for f in dir_contents:
-                        if os.path.isfile(os.path.join(input_directory, f)):
-                            dir_files.append(f)
-
-                    print('processing files in directory...')
-                    for f in dir_files:
-                        # unpack if needed using the standard transform utility
-                        print('unpacking '+f)
-                        script_utils.extract_data(filePath=os.path.join(input_directory,f))
-
-            else:
-                # handle shock file
-                dfUtil = DataFileUtil(self.callback_url, token=ctx['token'])
-                file_name = dfUtil.shock_to_file({
-                                    'file_path': input_directory,
-                                    'shock_id': params['shock_id']
-                                })['node_file_name']
-                genbank_file_path = os.path.join(input_directory, file_name)
-        else:
-            # copy the local file to the input staging directory
-            # (NOTE: could just move it, but then this method would have the side effect of moving your
-            # file which another SDK module might have an open handle on)
-            local_file_path = params['file_path']
-            genbank_file_path = os.path.join(input_directory, os.path.basename(local_file_path))
-            shutil.copy2(local_file_path, genbank_file_path)
-
-        if genbank_file_path is not None:
-            print("input genbank file =" + genbank_file_path)
-
-            # unpack if needed using the standard transform utility
-            script_utils.extract_data(filePath=genbank_file_path)
-
-        # do the upload (doesn't seem to return any information)
-        uploader.upload_genome(
-                logger=None,
-
-                shock_service_url = self.shockURL,
-                handle_service_url = self.handleURL,
-                workspace_service_url = self.workspaceURL,
-
-                input_directory=input_directory,
-
-                workspace_name   = workspace_name,
-                core_genome_name = genome_name,
-                source           = source,
-                taxon_wsname     = taxon_wsname
-            )
-
-        #### Code to convert to legacy type if requested
-        if 'convert_to_legacy' in params and params['convert_to_legacy']==1:
-            from doekbase.data_api.converters import genome as cvt
-            print('Converting to legacy type, object={}'.format(genome_name))
-            cvt.convert_genome(
-                    shock_url=self.shockURL,
-                    handle_url=self.handleURL,
-                    ws_url=self.workspaceURL,
-                    obj_name=genome_name,
-                    ws_name=workspace_name)
-
-        # clear the temp directory
-        shutil.rmtree(input_directory)
-
-        # get WS metadata to return the reference to the object (could be returned by the uploader method...)
-        ws = Workspace(url=self.workspaceURL)
-        info = ws.get_object_info_new({'objects':[{'ref':workspace_name + '/' + genome_name}],'includeMetadata':0, 'ignoreErrors':0})[0]
-
-        details = {
-            'genome_annotation_ref':str(info[6]) + '/' + str(info[0]) + '/' + str(info[4])
-        }
-
+        with memory_usage.MemoryUsage('genbank_to_genome_annotation', self.memory_trace_top) as usage:
+            details = self._genbank_to_genome_annotation(ctx, params, usage)
 
         #END genbank_to_genome_annotation
 
@@ -223,6 +432,90 @@ class GenomeAnnotationFileUtil:
         # return the results
         return [details]
 
+    def genbank_to_genome_annotation_mass(self, ctx, params):
+        """
+        Upload many GenBank files at once.  The uploads run on a bounded
+        pool of workers that share their service clients, and a failed
+        upload is reported in its own entry without failing the batch.
+        :param params: instance of list of type
+           "GenbankToGenomeAnnotationParams" (file_path or shock_id -- Local
+           path or shock_id of the uploaded file with genome sequence in
+           GenBank format or zip-file with GenBank files. genome_name -- The
+           name you would like to use to reference this GenomeAnnotation. If
+           not supplied, will use the Taxon Id and the data source to
+           determine the name. taxon_wsname - name of the workspace
+           containing the Taxonomy data, defaults to 'ReferenceTaxons') ->
+           structure: parameter "file_path" of String, parameter "shock_id"
+           of String, parameter "ftp_url" of String, parameter "genome_name"
+           of String, parameter "workspace_name" of String, parameter
+           "source" of String, parameter "taxon_wsname" of String, parameter
+           "convert_to_legacy" of type "boolean" (A boolean - 0 for false, 1
+           for true. @range (0, 1)), parameter "dedup" of type "boolean" (A
+           boolean - 0 for false, 1 for true. @range (0, 1)), parameter
+           "timings" of type "boolean" (A boolean - 0 for false, 1 for true.
+           @range (0, 1))
+        :returns: instance of type "GenbankToGenomeAnnotationMassResults"
+           (details -- one entry per input, in input order succeeded, failed
+           -- the number of uploads that worked and that did not
+           elapsed_seconds -- wall time of the whole batch genomes_per_minute
+           -- aggregate throughput of the successful uploads) -> structure:
+           parameter "details" of list of type "GenomeAnnotationMassDetails"
+           (genome_annotation_ref -- reference to the new GenomeAnnotation,
+           set if the upload worked error -- why the upload failed, set if it
+           did not) -> structure: parameter "genome_annotation_ref" of
+           String, parameter "error" of String, parameter "timings" of
+           mapping from String to Double, parameter "succeeded" of Long,
+           parameter "failed" of Long, parameter "elapsed_seconds" of Double,
+           parameter "genomes_per_minute" of Double
+        """
+        # ctx is the context object
+        # return variables are: results
+        #BEGIN genbank_to_genome_annotation_mass
+
+        print('genbank_to_genome_annotation_mass -- {} uploads'.format(len(params)))
+
+        def upload(numbered_params):
+            i, upload_params = numbered_params
+            try:
+                if not isinstance(upload_params, dict):
+                    raise ValueError('upload parameters must be a structure, not ' +
+                                     type(upload_params).__name__)
+                return self._genbank_to_genome_annotation(ctx, upload_params)
+            except Exception as e:
+                # the label must not fail, or the error would fail the whole batch
+                print('upload {} of {} failed:'.format(i + 1, len(params)))
+                traceback.print_exc()
+                return {'error': str(e)}
+
+        start = time.time()
+        pool = ThreadPool(max(1, min(self.mass_upload_workers, len(params))))
+        try:
+            details = pool.map(upload, list(enumerate(params)), chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        elapsed = time.time() - start
+
+        succeeded = len([d for d in details if 'error' not in d])
+        results = {
+            'details': details,
+            'succeeded': succeeded,
+            'failed': len(details) - succeeded,
+            'elapsed_seconds': elapsed,
+            'genomes_per_minute': succeeded * 60.0 / elapsed if elapsed > 0 else 0.0
+        }
+        print('uploaded {} of {} genomes in {:.1f}s ({:.2f} genomes/minute)'.format(
+            succeeded, len(details), elapsed, results['genomes_per_minute']))
+
+        #END genbank_to_genome_annotation_mass
+
+        # At some point might do deeper type checking...
+        if not isinstance(results, dict):
+            raise ValueError('Method genbank_to_genome_annotation_mass return value ' +
+                             'results is not type dict as required.')
+        # return the results
+        return [results]
+
     def genome_annotation_to_genbank(self, ctx, params):
         """
         :param params: instance of type "GenomeAnnotationToGenbankParams"
@@ -232,13 +525,17 @@ class GenomeAnnotationFileUtil:
            what you want.  If genome_ref is defined, these args are ignored.
            new_genbank_file_name -- specify the output name of the genbank
            file, optional save_to_shock -- set to 1 or 0, if 1 then output is
-           saved to shock. default is zero) -> structure: parameter
-           "genome_ref" of String, parameter "genome_name" of String,
-           parameter "workspace_name" of String, parameter
-           "new_genbank_file_name" of String, parameter "save_to_shock" of
-           type "boolean" (A boolean - 0 for false, 1 for true. @range (0, 1))
+           saved to shock. default is zero timings -- if 1, the result also
+           gives the seconds spent in each phase of the export, and in total)
+           -> structure: parameter "genome_ref" of String, parameter
+           "genome_name" of String, parameter "workspace_name" of String,
+           parameter "new_genbank_file_name" of String, parameter
+           "save_to_shock" of type "boolean" (A boolean - 0 for false, 1 for
+           true. @range (0, 1)), parameter "timings" of type "boolean" (A
+           boolean - 0 for false, 1 for true. @range (0, 1))
         :returns: instance of type "GenbankFile" -> structure: parameter
-           "path" of String, parameter "shock_id" of String
+           "path" of String, parameter "shock_id" of String, parameter
+           "timings" of mapping from String to Double
         """
         # ctx is the context object
         # return variables are: file
@@ -246,65 +543,55 @@ class GenomeAnnotationFileUtil:
 
         print('genome_annotation_to_genbank -- paramaters = ')
         pprint(params)
+        timer = timings.PhaseTimer('genome_annotation_to_genbank')
 
-        service_endpoints = {
-            "workspace_service_url": self.workspaceURL, 
-            "shock_service_url": self.shockURL,
-            "handle_service_url": self.handleURL
-        }
-
-        # parse/validate parameters.  could do a better job here.
-        genome_ref = None
-        if 'genome_ref' in params and params['genome_ref'] is not None:
-            genome_ref = params['genome_ref']
-        else:
-            if 'genome_name' not in params:
-                raise ValueError('genome_ref and genome_name are not defined.  One of those is required.')
-            if 'workspace_name' not in params:
-                raise ValueError('workspace_name is not defined.  This is required if genome_name is specified' +
-                    ' without a genome_ref')
-            genome_ref = params['workspace_name'] + '/' + params['genome_name']
-
-        # do a quick lookup of object info- could use this to do some validation.  Here we need it to provide
-        # a nice output file name if it is not set...  We should probably catch errors here and print out a nice
-        # message - usually this would mean the ref was bad.
-        ws = Workspace(url=self.workspaceURL)
-        info = ws.get_object_info_new({'objects':[{'ref':genome_ref}],'includeMetadata':0, 'ignoreErrors':0})[0]
-        print('resolved object to:');
-        pprint(info)
-
-        if 'new_genbank_file_name' not in params or params['new_genbank_file_name'] is None:
-            new_genbank_file_name = info[1] + ".gbk"
-        else:
-            new_genbank_file_name = params['new_genbank_file_name']
-
-
-        # construct a working directory to hand off to the data_api
-        working_directory =  os.path.join(self.sharedFolder, 'genome-download-'+str(uuid.uuid4()))
-        os.makedirs(working_directory)
-        output_file_destination = os.path.join(working_directory,new_genbank_file_name)
-
-        # do it
-        print('calling: doekbase.data_api.downloaders.GenomeAnnotation.downloadAsGBK');
-        GenomeAnnotation.downloadAsGBK(
-                            genome_ref,
-                            service_endpoints,
-                            ctx['token'],
-                            output_file_destination,
-                            working_directory)
-
-        # if we need to upload to shock, well then do that too.
-        file = {}
-        if 'save_to_shock' in params and params['save_to_shock'] == 1:
-            dfUtil = DataFileUtil(self.callback_url, token=ctx['token'])
-            file['shock_id'] =dfUtil.file_to_shock({
-                                    'file_path':output_file_destination,
-                                    'gzip':0,
-                                    'make_handle':0
-                                    #attributes: {} #we can set shock attributes if we want
-                                })['shock_id']
-        else:
-            file['path'] = output_file_destination
+        with memory_usage.MemoryUsage('genome_annotation_to_genbank', self.memory_trace_top) as usage:
+            # parse/validate parameters.  could do a better job here.
+            genome_ref = None
+            if 'genome_ref' in params and params['genome_ref'] is not None:
+                genome_ref = params['genome_ref']
+            else:
+                if 'genome_name' not in params:
+                    raise ValueError('genome_ref and genome_name are not defined.  One of those is required.')
+                if 'workspace_name' not in params:
+                    raise ValueError('workspace_name is not defined.  This is required if genome_name is specified' +
+                        ' without a genome_ref')
+                genome_ref = params['workspace_name'] + '/' + params['genome_name']
+
+            # do a quick lookup of object info- could use this to do some validation.  Here we need it to provide
+            # a nice output file name if it is not set...  We should probably catch errors here and print out a nice
+            # message - usually this would mean the ref was bad.
+            with timer.phase('resolve_ref'):
+                info = self.ref_resolver.get_info([genome_ref])[0]
+            print('resolved object to:');
+            pprint(info)
+
+            if 'new_genbank_file_name' not in params or params['new_genbank_file_name'] is None:
+                new_genbank_file_name = info[1] + ".gbk"
+            else:
+                new_genbank_file_name = params['new_genbank_file_name']
+
+
+            # export exactly the version that was resolved above
+            versioned_ref = ref_resolver.versioned_ref(info)
+            output_file_destination = self._download_genbank(ctx, versioned_ref, new_genbank_file_name,
+                                                             timer)
+            usage.sizes.update(object_bytes=info[9], bytes_out=os.path.getsize(output_file_destination))
+
+            # if we need to upload to shock, well then do that too.
+            file = {}
+            if 'save_to_shock' in params and params['save_to_shock'] == 1:
+                dfUtil = self._data_file_util(ctx['token'])
+                with timer.phase('file_to_shock'):
+                    file['shock_id'] =dfUtil.file_to_shock({
+                                            'file_path':output_file_destination,
+                                            'gzip':0,
+                                            'make_handle':0
+                                            #attributes: {} #we can set shock attributes if we want
+                                        })['shock_id']
+            else:
+                file['path'] = output_file_destination
+            file = self._with_timings(file, params, timer)
 
         #END genome_annotation_to_genbank
 
@@ -315,15 +602,108 @@ class GenomeAnnotationFileUtil:
         # return the results
         return [file]
 
+    def genome_annotation_to_genbank_mass(self, ctx, params):
+        """
+        Export many GenomeAnnotations as GenBank files.  All refs are
+        resolved with a single workspace call and the files are generated
+        concurrently.  If save_to_shock is set, all of the files are loaded
+        to shock in one bulk step.
+        :param params: instance of type "GenomeAnnotationToGenbankMassParams"
+           (genome_refs -- References to the GenomeAnnotation or Genome
+           objects in KBase in any ws supported format save_to_shock -- set
+           to 1 or 0, if 1 then all outputs are saved to shock. default is
+           zero parallelism -- how many GenBank files to generate at the same
+           time, optional; defaults to the service configuration) ->
+           structure: parameter "genome_refs" of list of String, parameter
+           "save_to_shock" of type "boolean" (A boolean - 0 for false, 1 for
+           true. @range (0, 1)), parameter "parallelism" of Long
+        :returns: instance of type "GenomeAnnotationToGenbankMassOutput"
+           (files -- one GenbankFile per genome_ref, in the same order) ->
+           structure: parameter "files" of list of type "GenbankFile" ->
+           structure: parameter "path" of String, parameter "shock_id" of
+           String, parameter "timings" of mapping from String to Double
+        """
+        # ctx is the context object
+        # return variables are: output
+        #BEGIN genome_annotation_to_genbank_mass
+
+        print('genome_annotation_to_genbank_mass -- paramaters = ')
+        pprint(params)
+
+        if 'genome_refs' not in params or not params['genome_refs']:
+            raise ValueError('genome_refs is not defined.  At least one reference is required.')
+        genome_refs = params['genome_refs']
+
+        parallelism = self.mass_download_workers
+        if 'parallelism' in params and params['parallelism'] is not None:
+            parallelism = int(params['parallelism'])
+        if parallelism < 1:
+            raise ValueError('parallelism must be at least 1')
+
+        # the downloads run side by side, so their phases add up to more than the total
+        timer = timings.PhaseTimer('genome_annotation_to_genbank_mass')
+
+        # resolve every ref with at most one lookup; this fails fast on any bad ref
+        with timer.phase('resolve_ref'):
+            infos = self.ref_resolver.get_info(genome_refs)
+
+        def download(info):
+            # export exactly the version that was resolved above
+            versioned_ref = ref_resolver.versioned_ref(info)
+            try:
+                return self._download_genbank(ctx, versioned_ref, info[1] + '.gbk', timer), None
+            except Exception as e:
+                print('download of {} failed:'.format(versioned_ref))
+                traceback.print_exc()
+                return None, e
+
+        pool = ThreadPool(min(parallelism, len(infos)))
+        try:
+            downloads = pool.map(download, infos, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        paths = [path for path, _ in downloads]
+        errors = [e for _, e in downloads if e is not None]
+        if errors:
+            # the call fails, so the files of the downloads that worked are not handed out
+            for path in paths:
+                if path is not None:
+                    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            raise errors[0]
+
+        if 'save_to_shock' in params and params['save_to_shock'] == 1:
+            dfUtil = self._data_file_util(ctx['token'])
+            with timer.phase('file_to_shock'):
+                shock_nodes = dfUtil.file_to_shock_mass([{'file_path': p, 'make_handle': 0}
+                                                         for p in paths])
+            files = [{'shock_id': n['shock_id']} for n in shock_nodes]
+        else:
+            files = [{'path': p} for p in paths]
+
+        output = {'files': files}
+        timer.log()
+
+        #END genome_annotation_to_genbank_mass
+
+        # At some point might do deeper type checking...
+        if not isinstance(output, dict):
+            raise ValueError('Method genome_annotation_to_genbank_mass return value ' +
+                             'output is not type dict as required.')
+        # return the results
+        return [output]
+
     def export_genome_annotation_as_genbank(self, ctx, params):
         """
         A method designed especially for download, this calls 'genome_annotation_to_genbank' to do
         the work, but then packages the output with WS provenance and object info into
         a zip file and saves to shock.
         :param params: instance of type "ExportParams" -> structure:
-           parameter "input_ref" of String
+           parameter "input_ref" of String, parameter "timings" of type
+           "boolean" (A boolean - 0 for false, 1 for true. @range (0, 1))
         :returns: instance of type "ExportOutput" -> structure: parameter
-           "shock_id" of String
+           "shock_id" of String, parameter "timings" of mapping from String
+           to Double
         """
         # ctx is the context object
         # return variables are: output
@@ -333,28 +713,37 @@ class GenomeAnnotationFileUtil:
         if 'input_ref' not in params:
             raise ValueError('Cannot export GenomeAnnotation- not input_ref field defined.')
 
-        # get WS metadata to get ws_name and obj_name
-        ws = Workspace(url=self.workspaceURL)
-        info = ws.get_object_info_new({'objects':[{'ref': params['input_ref'] }],'includeMetadata':0, 'ignoreErrors':0})[0]
-
-        # export to a file
-        file = self.genome_annotation_to_genbank(ctx, { 
-                            'genome_ref': params['input_ref'], 
-                            'new_genbank_file_name': info[1]+'.gbk' })[0]
-
-        # create the output directory and move the file there
-        export_package_dir = os.path.join(self.sharedFolder, info[1])
-        os.makedirs(export_package_dir)
-        shutil.move(file['path'], os.path.join(export_package_dir, os.path.basename(file['path'])))
-
-        # package it up and be done
-        dfUtil = DataFileUtil(self.callback_url)
-        package_details = dfUtil.package_for_download({
-                                    'file_path': export_package_dir,
-                                    'ws_refs': [ params['input_ref'] ]
-                                })
-
-        output = { 'shock_id': package_details['shock_id'] }
+        timer = timings.PhaseTimer('export_genome_annotation_as_genbank')
+
+        with memory_usage.MemoryUsage('export_genome_annotation_as_genbank', self.memory_trace_top) as usage:
+            # get WS metadata to get ws_name and obj_name; this is the only lookup of the ref
+            with timer.phase('resolve_ref'):
+                info = self.ref_resolver.get_info([params['input_ref']])[0]
+            versioned_ref = ref_resolver.versioned_ref(info)
+
+            # write the file straight into the package directory.  The directory keeps the object
+            # name, which names the archive, under a unique parent so repeated exports don't collide.
+            export_dir = os.path.join(self.sharedFolder, 'genome-export-' + str(uuid.uuid4()))
+            export_package_dir = os.path.join(export_dir, info[1])
+            os.makedirs(export_package_dir)
+            try:
+                # only packaged and uploaded here, so it can share the cache entry
+                genbank_file = self._download_genbank(ctx, versioned_ref, info[1] + '.gbk', timer,
+                                                      export_package_dir, shared=True)
+                usage.sizes.update(object_bytes=info[9], bytes_out=os.path.getsize(genbank_file))
+
+                # package it up and be done
+                dfUtil = self._data_file_util(None)
+                with timer.phase('package_for_download'):
+                    package_details = dfUtil.package_for_download({
+                                                'file_path': export_package_dir,
+                                                'ws_refs': [ versioned_ref ]
+                                            })
+            finally:
+                # also on failure, as the file may be a link to the cache entry
+                shutil.rmtree(export_dir, ignore_errors=True)
+
+            output = self._with_timings({ 'shock_id': package_details['shock_id'] }, params, timer)
 
         #END export_genome_annotation_as_genbank
 
@@ -369,5 +758,9 @@ class GenomeAnnotationFileUtil:
         #BEGIN_STATUS
         returnVal = {'state': "OK", 'message': "", 'version': self.VERSION, 
                      'git_url': self.GIT_URL, 'git_commit_hash': self.GIT_COMMIT_HASH}
+        returnVal['ref_cache'] = self.ref_resolver.stats()
+        returnVal['service_url_cache'] = dfu_baseclient.service_url_cache_stats()
+        if self.export_cache is not None:
+            returnVal['export_cache'] = self.export_cache.stats()
         #END_STATUS
         return [returnVal]
@@ -5,7 +5,10 @@ import sys
 import json
 import traceback
 import datetime
+import copy
 from multiprocessing import Process
+from multiprocessing.pool import ThreadPool
+from threading import Lock
 from getopt import getopt, GetoptError
 from jsonrpcbase import JSONRPCService, InvalidParamsError, KeywordError,\
     JSONRPCError, InvalidRequestError
@@ -17,10 +20,14 @@ import requests as _requests
 import random as _random
 import os
 from GenomeAnnotationFileUtil.authclient import KBaseAuth as _KBaseAuth
+from GenomeAnnotationFileUtil.authclient import SharedTokenCache as _SharedTokenCache
+from GenomeAnnotationFileUtil.metrics import Metrics as _Metrics
+from GenomeAnnotationFileUtil.profiling import Profiler as _Profiler
 
 DEPLOY = 'KB_DEPLOYMENT_CONFIG'
 SERVICE = 'KB_SERVICE_NAME'
 AUTH = 'auth-server-url'
+TOKEN_CACHE = 'auth-token-cache-file'
 
 # Note that the error fields do not match the 2.0 JSONRPC spec
 
@@ -61,9 +68,59 @@ class JSONObjectEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+def fill_error(error, request, trace=None):
+    '''
+    Adds the id, version and trace of the request to an error response, in
+    the form the request's JSON-RPC version expects.
+    '''
+    if 'id' in request:
+        error['id'] = request['id']
+    if 'version' in request:
+        error['version'] = request['version']
+        e = error['error'].get('error')
+        if not e:
+            error['error']['error'] = trace
+    elif 'jsonrpc' in request:
+        error['jsonrpc'] = request['jsonrpc']
+        error['error']['data'] = trace
+    else:
+        error['version'] = '1.0'
+        error['error']['error'] = trace
+    return error
+
+
 class JSONRPCServiceCustom(JSONRPCService):
 
-    def call(self, ctx, jsondata):
+    def __init__(self, batch_workers=1, profiler=None):
+        '''
+        batch_workers is the most members of JSON-RPC batches run at the
+        same time, over all batches in the process.  1 runs each batch's
+        members one after another.
+        profiler, a profiling.Profiler, profiles the calls it wants; None
+        profiles nothing.
+        '''
+        JSONRPCService.__init__(self)
+        if batch_workers < 1:
+            raise ValueError('batch_workers must be at least 1')
+        self.batch_workers = batch_workers
+        self.profiler = profiler
+        self._batch_pool = None
+        self._batch_pool_pid = None
+        self._batch_pool_lock = Lock()
+
+    def _map_batch(self, func, items):
+        '''Calls func on each item and returns the results in order.'''
+        if self.batch_workers == 1 or len(items) == 1:
+            return [func(item) for item in items]
+        with self._batch_pool_lock:
+            # a pool made before uwsgi forked has no threads in this process
+            if self._batch_pool is None or self._batch_pool_pid != os.getpid():
+                self._batch_pool = ThreadPool(self.batch_workers)
+                self._batch_pool_pid = os.getpid()
+            pool = self._batch_pool
+        return pool.map(func, items, chunksize=1)
+
+    def call(self, ctx, jsondata, prepare=None):
         """
         Calls jsonrpc service's method and returns its return value in a JSON
         string or None if there is none.
@@ -71,7 +128,7 @@ class JSONRPCServiceCustom(JSONRPCService):
         Arguments:
         jsondata -- remote method call in jsonrpc format
         """
-        result = self.call_py(ctx, jsondata)
+        result = self.call_py(ctx, jsondata, prepare)
         if result is not None:
             return json.dumps(result, cls=JSONObjectEncoder)
 
@@ -82,6 +139,9 @@ class JSONRPCServiceCustom(JSONRPCService):
         method = self.method_data[request['method']]['method']
         params = request['params']
         result = None
+        call = method
+        if self.profiler is not None and self.profiler.wanted(ctx):
+            call = self.profiler.wrap(ctx, method)
         try:
             if isinstance(params, list):
                 # Does it have enough arguments?
@@ -92,16 +152,16 @@ class JSONRPCServiceCustom(JSONRPCService):
                         self._max_args(method) - 1):
                     raise InvalidParamsError('too many arguments')
 
-                result = method(ctx, *params)
+                result = call(ctx, *params)
             elif isinstance(params, dict):
                 # Do not accept keyword arguments if the jsonrpc version is
                 # not >=1.1.
                 if request['jsonrpc'] < 11:
                     raise KeywordError
 
-                result = method(ctx, **params)
+                result = call(ctx, **params)
             else:  # No params
-                result = method(ctx)
+                result = call(ctx)
         except JSONRPCError:
             raise
         except Exception as e:
@@ -113,7 +173,7 @@ class JSONRPCServiceCustom(JSONRPCService):
             raise newerr
         return result
 
-    def call_py(self, ctx, jsondata):
+    def call_py(self, ctx, jsondata, prepare=None):
         """
         Calls jsonrpc service's method and returns its return value in python
         object format or None if there is none.
@@ -121,6 +181,11 @@ class JSONRPCServiceCustom(JSONRPCService):
         This method is same as call() except the return value is a python
         object instead of JSON string. This method is mainly only useful for
         debugging purposes.
+
+        Each member of a batch runs with its own copy of ctx, made with
+        ctx.copy() and then passed with the member to prepare, if given, to
+        fill in.  An error in one member becomes that member's error
+        response and doesn't stop the rest of the batch.
         """
         rdata = jsondata
         # we already deserialize the json string earlier in the server code, no
@@ -145,20 +210,13 @@ class JSONRPCServiceCustom(JSONRPCService):
             return respond
         elif isinstance(rdata, list) and rdata:
             # It's a batch.
-            requests = []
-            responds = []
-
-            for rdata_ in rdata:
-                # set some default values for error handling
-                request_ = self._get_default_vals()
-                self._fill_request(request_, rdata_)
-                requests.append(request_)
+            def call_member(rdata_):
+                return self._handle_batch_member(ctx.copy(), rdata_, prepare)
 
-            for request_ in requests:
-                respond = self._handle_request(ctx, request_)
-                # Don't respond to notifications
-                if respond is not None:
-                    responds.append(respond)
+            responds = [respond for respond in
+                        self._map_batch(call_member, rdata)
+                        # Don't respond to notifications
+                        if respond is not None]
 
             if responds:
                 return responds
@@ -169,6 +227,32 @@ class JSONRPCServiceCustom(JSONRPCService):
             # empty dict, list or wrong type
             raise InvalidRequestError
 
+    def _handle_batch_member(self, ctx, rdata, prepare):
+        """Handles one member of a batch, returning any error as its response."""
+        error_request = rdata if isinstance(rdata, dict) else {}
+        try:
+            # set some default values for error handling
+            request = self._get_default_vals()
+            self._fill_request(request, rdata)
+            if prepare is not None:
+                prepare(ctx, rdata)
+            return self._handle_request(ctx, request)
+        except JSONRPCError as jre:
+            err = {'error': {'code': jre.code,
+                             'name': jre.message,
+                             'message': jre.data
+                             }
+                   }
+            trace = jre.trace if hasattr(jre, 'trace') else None
+            return fill_error(err, error_request, trace)
+        except Exception:
+            err = {'error': {'code': 0,
+                             'name': 'Unexpected Server Error',
+                             'message': 'An unexpected server error occurred',
+                             }
+                   }
+            return fill_error(err, error_request, traceback.format_exc())
+
     def _handle_request(self, ctx, request):
         """Handles given request and returns its response."""
         if self.method_data[request['method']].has_key('types'): # @IgnorePep8
@@ -203,6 +287,16 @@ class MethodContext(dict):
         self._debug_levels = set([7, 8, 9, 'DEBUG', 'DEBUG2', 'DEBUG3'])
         self._logger = logger
 
+    def copy(self):
+        '''
+        Returns a MethodContext with the same logger and a deep copy of
+        the fields, so a change to one doesn't show in the other.
+        '''
+        ctx = MethodContext(self._logger)
+        for key, value in self.items():
+            ctx[key] = copy.deepcopy(value)
+        return ctx
+
     def log_err(self, message):
         self._log(log.ERR, message)
 
@@ -327,16 +421,30 @@ class Application(object):
             submod, ip_address=True, authuser=True, module=True, method=True,
             call_id=True, logfile=self.userlog.get_log_file())
         self.serverlog.set_log_level(6)
-        self.rpc_service = JSONRPCServiceCustom()
+        batch_workers = int(config.get('batch-workers', 1)) if config else 1
+        profile_dir = config.get('profile-directory') if config else None
+        profiler = None
+        if profile_dir:
+            profiler = _Profiler(profile_dir,
+                                 float(config.get('profile-sample-rate') or 0))
+        self.rpc_service = JSONRPCServiceCustom(batch_workers, profiler)
         self.method_authentication = dict()
         self.rpc_service.add(impl_GenomeAnnotationFileUtil.genbank_to_genome_annotation,
                              name='GenomeAnnotationFileUtil.genbank_to_genome_annotation',
                              types=[dict])
         self.method_authentication['GenomeAnnotationFileUtil.genbank_to_genome_annotation'] = 'required'
+        self.rpc_service.add(impl_GenomeAnnotationFileUtil.genbank_to_genome_annotation_mass,
+                             name='GenomeAnnotationFileUtil.genbank_to_genome_annotation_mass',
+                             types=[list])
+        self.method_authentication['GenomeAnnotationFileUtil.genbank_to_genome_annotation_mass'] = 'required'
         self.rpc_service.add(impl_GenomeAnnotationFileUtil.genome_annotation_to_genbank,
                              name='GenomeAnnotationFileUtil.genome_annotation_to_genbank',
                              types=[dict])
         self.method_authentication['GenomeAnnotationFileUtil.genome_annotation_to_genbank'] = 'required'
+        self.rpc_service.add(impl_GenomeAnnotationFileUtil.genome_annotation_to_genbank_mass,
+                             name='GenomeAnnotationFileUtil.genome_annotation_to_genbank_mass',
+                             types=[dict])
+        self.method_authentication['GenomeAnnotationFileUtil.genome_annotation_to_genbank_mass'] = 'required'
         self.rpc_service.add(impl_GenomeAnnotationFileUtil.export_genome_annotation_as_genbank,
                              name='GenomeAnnotationFileUtil.export_genome_annotation_as_genbank',
                              types=[dict])
@@ -345,7 +453,13 @@ class Application(object):
                              name='GenomeAnnotationFileUtil.status',
                              types=[dict])
         authurl = config.get(AUTH) if config else None
-        self.auth_client = _KBaseAuth(authurl)
+        token_cache_file = config.get(TOKEN_CACHE) if config else None
+        token_cache = None
+        if token_cache_file:
+            token_cache = _SharedTokenCache(token_cache_file)
+        self.auth_client = _KBaseAuth(authurl, cache=token_cache)
+        metrics_dir = config.get('metrics-directory') if config else None
+        self.metrics = _Metrics(metrics_dir or None)
 
     def __call__(self, environ, start_response):
         # Context object, equivalent to the perl impl CallContext
@@ -357,15 +471,25 @@ class Application(object):
             body_size = int(environ.get('CONTENT_LENGTH', 0))
         except (ValueError):
             body_size = 0
+        metric = None
         if environ['REQUEST_METHOD'] == 'OPTIONS':
             # we basically do nothing and just return headers
             status = '200 OK'
             rpc_result = ""
+        elif (environ['REQUEST_METHOD'] == 'GET' and
+                environ.get('PATH_INFO', '').rstrip('/') == '/metrics'):
+            # not a JSON-RPC call, and open to the scraper without a token
+            body = self.metrics.render()
+            start_response('200 OK', [
+                ('content-type', 'text/plain; version=0.0.4'),
+                ('content-length', str(len(body)))])
+            return [body]
         else:
             request_body = environ['wsgi.input'].read(body_size)
             try:
                 req = json.loads(request_body)
             except ValueError as ve:
+                metric = ('unknown', self.metrics.start('unknown'))
                 err = {'error': {'code': -32700,
                                  'name': "Parse error",
                                  'message': str(ve),
@@ -373,52 +497,20 @@ class Application(object):
                        }
                 rpc_result = self.process_error(err, ctx, {'version': '1.1'})
             else:
-                ctx['module'], ctx['method'] = req['method'].split('.')
-                ctx['call_id'] = req['id']
-                ctx['rpc_context'] = {
-                    'call_stack': [{'time': self.now_in_utc(),
-                                    'method': req['method']}
-                                   ]
-                }
-                prov_action = {'service': ctx['module'],
-                               'method': ctx['method'],
-                               'method_params': req['params']
-                               }
-                ctx['provenance'] = [prov_action]
+                metric = self.metric_name(req)
+                metric = (metric, self.metrics.start(metric))
                 try:
-                    token = environ.get('HTTP_AUTHORIZATION')
-                    # parse out the method being requested and check if it
-                    # has an authentication requirement
-                    method_name = req['method']
-                    auth_req = self.method_authentication.get(
-                        method_name, 'none')
-                    if auth_req != 'none':
-                        if token is None and auth_req == 'required':
-                            err = JSONServerError()
-                            err.data = (
-                                'Authentication required for GenomeAnnotationFileUtil ' +
-                                'but no authentication header was passed')
-                            raise err
-                        elif token is None and auth_req == 'optional':
-                            pass
-                        else:
-                            try:
-                                user = self.auth_client.get_user(token)
-                                ctx['user_id'] = user
-                                ctx['authenticated'] = 1
-                                ctx['token'] = token
-                            except Exception, e:
-                                if auth_req == 'required':
-                                    err = JSONServerError()
-                                    err.data = \
-                                        "Token validation failed: %s" % e
-                                    raise err
-                    if (environ.get('HTTP_X_FORWARDED_FOR')):
-                        self.log(log.INFO, ctx, 'X-Forwarded-For: ' +
-                                 environ.get('HTTP_X_FORWARDED_FOR'))
-                    self.log(log.INFO, ctx, 'start method')
-                    rpc_result = self.rpc_service.call(ctx, req)
-                    self.log(log.INFO, ctx, 'end method')
+                    if isinstance(req, list):
+                        # a batch; each member gets its own copy of ctx
+                        rpc_result = self.rpc_service.call(
+                            ctx, req,
+                            lambda ctx_, req_: self.prepare_context(
+                                ctx_, req_, environ))
+                        self.log(log.INFO, ctx, 'end batch')
+                    else:
+                        self.prepare_context(ctx, req, environ)
+                        rpc_result = self.rpc_service.call(ctx, req)
+                        self.log(log.INFO, ctx, 'end method')
                     status = '200 OK'
                 except JSONRPCError as jre:
                     err = {'error': {'code': jre.code,
@@ -456,25 +548,75 @@ class Application(object):
             ('content-type', 'application/json'),
             ('content-length', str(len(response_body)))]
         start_response(status, response_headers)
+        if metric is not None:
+            self.metrics.finish(metric[0], metric[1], status == '200 OK',
+                                len(request_body), len(response_body))
         return [response_body]
 
+    def metric_name(self, req):
+        '''The method label of req in the metrics; only known methods get their own.'''
+        if isinstance(req, list):
+            return 'batch'
+        if isinstance(req, dict) and req.get('method') in self.rpc_service.method_data:
+            return req['method'].split('.')[-1]
+        return 'unknown'
+
+    def prepare_context(self, ctx, req, environ):
+        '''
+        Fills in ctx for the call req and authenticates it, raising a
+        JSONRPCError if the call needs a token it doesn't have.
+        '''
+        ctx['module'], ctx['method'] = req['method'].split('.')
+        ctx['call_id'] = req.get('id')
+        ctx['rpc_context'] = {
+            'call_stack': [{'time': self.now_in_utc(),
+                            'method': req['method']}
+                           ]
+        }
+        client_context = req.get('context')
+        if isinstance(client_context, dict) and client_context.get('profile'):
+            ctx['rpc_context']['profile'] = 1
+        prov_action = {'service': ctx['module'],
+                       'method': ctx['method'],
+                       'method_params': req.get('params')
+                       }
+        ctx['provenance'] = [prov_action]
+        token = environ.get('HTTP_AUTHORIZATION')
+        # parse out the method being requested and check if it
+        # has an authentication requirement
+        method_name = req['method']
+        auth_req = self.method_authentication.get(
+            method_name, 'none')
+        if auth_req != 'none':
+            if token is None and auth_req == 'required':
+                err = JSONServerError()
+                err.data = (
+                    'Authentication required for GenomeAnnotationFileUtil ' +
+                    'but no authentication header was passed')
+                raise err
+            elif token is None and auth_req == 'optional':
+                pass
+            else:
+                try:
+                    user = self.auth_client.get_user(token)
+                    ctx['user_id'] = user
+                    ctx['authenticated'] = 1
+                    ctx['token'] = token
+                except Exception, e:
+                    if auth_req == 'required':
+                        err = JSONServerError()
+                        err.data = \
+                            "Token validation failed: %s" % e
+                        raise err
+        if (environ.get('HTTP_X_FORWARDED_FOR')):
+            self.log(log.INFO, ctx, 'X-Forwarded-For: ' +
+                     environ.get('HTTP_X_FORWARDED_FOR'))
+        self.log(log.INFO, ctx, 'start method')
+
     def process_error(self, error, context, request, trace=None):
         if trace:
             self.log(log.ERR, context, trace.split('\n')[0:-1])
-        if 'id' in request:
-            error['id'] = request['id']
-        if 'version' in request:
-            error['version'] = request['version']
-            e = error['error'].get('error')
-            if not e:
-                error['error']['error'] = trace
-        elif 'jsonrpc' in request:
-            error['jsonrpc'] = request['jsonrpc']
-            error['error']['data'] = trace
-        else:
-            error['version'] = '1.0'
-            error['error']['error'] = trace
-        return json.dumps(error)
+        return json.dumps(fill_error(error, request, trace))
 
     def now_in_utc(self):
         # Taken from http://stackoverflow.com/questions/3401428/how-to-get-an-isoformat-datetime-string-including-the-default-timezone @IgnorePep8
@@ -566,6 +708,7 @@ def process_async_cli(input_file_path, output_file_path, token):
     if 'context' in req:
         ctx['rpc_context'] = req['context']
     ctx['CLI'] = 1
+    ctx['call_id'] = req['id']
     ctx['module'], ctx['method'] = req['method'].split('.')
     prov_action = {'service': ctx['module'], 'method': ctx['method'],
                    'method_params': req['params']}
@@ -5,86 +5,332 @@ A very basic KBase auth client for the Python server.
 
 @author: gaprice@lbl.gov
 '''
+import fcntl as _fcntl
+import mmap as _mmap
+import os as _os
+import struct as _struct
 import time as _time
 import requests as _requests
 import threading as _threading
 import hashlib
+from collections import OrderedDict as _OrderedDict
+from requests.adapters import HTTPAdapter as _HTTPAdapter
+
+
+def _sha256(token):
+    if not isinstance(token, bytes):
+        token = token.encode('utf-8')
+    return hashlib.sha256(token)
+
+
+def _hash(token):
+    return _sha256(token).hexdigest()
+
+
+def _digest(token):
+    return _sha256(token).digest()
 
 
 class TokenCache(object):
-    ''' A basic cache for tokens. '''
+    '''
+    A least recently used cache for tokens.  Valid tokens are kept for
+    _MAX_TIME_SEC, tokens the auth service rejected for _INVALID_TIME_SEC.
+    Every operation is O(1).
+    '''
 
     _MAX_TIME_SEC = 5 * 60  # 5 min
-
-    _lock = _threading.RLock()
+    _INVALID_TIME_SEC = 30
 
     def __init__(self, maxsize=2000):
-        self._cache = {}
+        self._cache = _OrderedDict()
         self._maxsize = maxsize
-        self._halfmax = maxsize / 2  # int division to round down
+        self._lock = _threading.Lock()
+
+    def get(self, token):
+        '''
+        Returns (user, None) for a valid token, (None, error message) for a
+        rejected one, or None if the token isn't cached.
+        '''
+        token = _hash(token)
+        with self._lock:
+            entry = self._cache.pop(token, None)
+            if entry is None:
+                return None
+            user, error, expires = entry
+            if expires < _time.time():
+                return None
+            # back in at the end, so the front holds the least recently used
+            self._cache[token] = entry
+        return user, error
 
     def get_user(self, token):
-        token = hashlib.sha256(token).hexdigest();
+        entry = self.get(token)
+        return entry[0] if entry else None
+
+    def _add(self, token, user, error, ttl):
+        token = _hash(token)
         with self._lock:
-            usertime = self._cache.get(token)
-        if not usertime:
-            return None
+            self._cache.pop(token, None)
+            self._cache[token] = (user, error, _time.time() + ttl)
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+
+    def add_valid_token(self, token, user):
+        if not token:
+            raise ValueError('Must supply token')
+        if not user:
+            raise ValueError('Must supply user')
+        self._add(token, user, None, self._MAX_TIME_SEC)
+
+    def add_invalid_token(self, token, error):
+        if not token:
+            raise ValueError('Must supply token')
+        self._add(token, None, error, self._INVALID_TIME_SEC)
+
+
+class SharedTokenCache(object):
+    '''
+    A token cache in a memory mapped file, shared by every process on the
+    host that opens the same path, e.g. all the uwsgi workers.  It has the
+    interface of TokenCache and, like it, stores only the sha256 of each
+    token.
+
+    The file is a fixed size hash table of 2 * maxsize slots.  A token can
+    be in any of _PROBES slots from its home slot; adding one takes a free
+    or expired slot there or else the least recently used.  Changes are
+    made under an flock on the file (and a thread lock, as flock doesn't
+    separate threads sharing a descriptor).  Every process using the file
+    must give the same maxsize, or the file is reset when it's opened.
+    '''
+
+    _MAX_TIME_SEC = TokenCache._MAX_TIME_SEC
+    _INVALID_TIME_SEC = TokenCache._INVALID_TIME_SEC
+    _PROBES = 8
+    _MAGIC = b'KBTOKEN1'
+    _HEADER = _struct.Struct('<8sI')
+    _TEXT_BYTES = 256
+    # digest, expires, last used, kind, text length, user or error message
+    _SLOT = _struct.Struct('<32sddBH{}s'.format(_TEXT_BYTES))
+    _EMPTY, _VALID, _INVALID = 0, 1, 2
+
+    def __init__(self, path, maxsize=2000):
+        self.path = path
+        self._slots = max(2 * maxsize, self._PROBES)
+        self._size = self._HEADER.size + self._slots * self._SLOT.size
+        self._lock = _threading.Lock()
+        self._pid = None
+        self._file = None
+        self._map = None
 
-        user, intime = usertime
-        if _time.time() - intime > self._MAX_TIME_SEC:
+    def _open(self):
+        # flock is shared with a parent that opened the file before forking
+        if self._pid == _os.getpid():
+            return
+        fd = _os.open(self.path, _os.O_RDWR | _os.O_CREAT, 0o600)
+        f = _os.fdopen(fd, 'r+b')
+        _fcntl.flock(fd, _fcntl.LOCK_EX)
+        try:
+            header = self._HEADER.pack(self._MAGIC, self._slots)
+            f.seek(0)
+            if (_os.fstat(fd).st_size != self._size or
+                    f.read(self._HEADER.size) != header):
+                f.truncate(0)
+                f.truncate(self._size)
+                f.seek(0)
+                f.write(header)
+                f.flush()
+        finally:
+            _fcntl.flock(fd, _fcntl.LOCK_UN)
+        self._file = f
+        self._map = _mmap.mmap(fd, self._size)
+        self._pid = _os.getpid()
+
+    def _locked(self, func, *args):
+        with self._lock:
+            self._open()
+            fd = self._file.fileno()
+            _fcntl.flock(fd, _fcntl.LOCK_EX)
+            try:
+                return func(self._map, *args)
+            finally:
+                _fcntl.flock(fd, _fcntl.LOCK_UN)
+
+    def _offsets(self, digest):
+        home = _struct.unpack('<Q', digest[:8])[0] % self._slots
+        for i in range(self._PROBES):
+            yield self._HEADER.size + ((home + i) % self._slots) * self._SLOT.size
+
+    def _read(self, m, offset):
+        return self._SLOT.unpack(m[offset:offset + self._SLOT.size])
+
+    def _write(self, m, offset, digest, expires, last_used, kind, text):
+        m[offset:offset + self._SLOT.size] = self._SLOT.pack(
+            digest, expires, last_used, kind, len(text), text)
+
+    def _get(self, m, digest, now):
+        for offset in self._offsets(digest):
+            slot = self._read(m, offset)
+            if slot[3] != self._EMPTY and slot[0] == digest:
+                if slot[1] < now:
+                    return None
+                self._write(m, offset, slot[0], slot[1], now, slot[3],
+                            slot[5][:slot[4]])
+                return slot[3], slot[5][:slot[4]].decode('utf-8')
+        return None
+
+    def _add(self, m, digest, kind, text, expires, now):
+        victim = None
+        for offset in self._offsets(digest):
+            slot = self._read(m, offset)
+            if slot[3] == self._EMPTY or slot[0] == digest or slot[1] < now:
+                victim = offset
+                break
+            if victim is None or slot[2] < victim_used:
+                victim, victim_used = offset, slot[2]
+        self._write(m, victim, digest, expires, now, kind, text)
+
+    def get(self, token):
+        '''
+        Returns (user, None) for a valid token, (None, error message) for a
+        rejected one, or None if the token isn't cached.
+        '''
+        entry = self._locked(self._get, _digest(token), _time.time())
+        if entry is None:
             return None
-        return user
+        kind, text = entry
+        return (text, None) if kind == self._VALID else (None, text)
+
+    def get_user(self, token):
+        entry = self.get(token)
+        return entry[0] if entry else None
+
+    def _put(self, token, kind, text, ttl):
+        # the text field is fixed size; cut it on a character boundary
+        text = text.encode('utf-8')[:self._TEXT_BYTES]
+        text = text.decode('utf-8', 'ignore').encode('utf-8')
+        now = _time.time()
+        self._locked(self._add, _digest(token), kind, text, now + ttl, now)
 
     def add_valid_token(self, token, user):
         if not token:
             raise ValueError('Must supply token')
         if not user:
             raise ValueError('Must supply user')
-        token = hashlib.sha256(token).hexdigest();
-        with self._lock:
-            self._cache[token] = [user, _time.time()]
-            if len(self._cache) > self._maxsize:
-                for i, (t, _) in enumerate(sorted(self._cache.items(),
-                                                  key=lambda (_, v): v[1])):
-                    if i <= self._halfmax:
-                        del self._cache[t]
-                    else:
-                        break
+        self._put(token, self._VALID, user, self._MAX_TIME_SEC)
+
+    def add_invalid_token(self, token, error):
+        if not token:
+            raise ValueError('Must supply token')
+        self._put(token, self._INVALID, error, self._INVALID_TIME_SEC)
+
+
+class _Validation(object):
+    ''' A token validation in progress, which other threads can wait on. '''
+
+    def __init__(self):
+        self.done = _threading.Event()
+        self.user = None
+        self.error = None
 
 
 class KBaseAuth(object):
     '''
     A very basic KBase auth client for the Python server.
+
+    Concurrent requests to validate the same token share one call to the
+    auth service, which is made over a pooled keep-alive connection and
+    fails after timeout seconds.
     '''
 
     _LOGIN_URL = 'https://kbase.us/services/authorization/Sessions/Login'
 
-    def __init__(self, auth_url=None):
+    def __init__(self, auth_url=None, timeout=60, pool_size=10, cache=None):
         '''
         Constructor
+        cache - the token cache to use, e.g. a SharedTokenCache; a new
+            TokenCache by default.
         '''
         self._authurl = auth_url
         if not self._authurl:
             self._authurl = self._LOGIN_URL
-        self._cache = TokenCache()
+        self._timeout = timeout
+        self._pool_size = pool_size
+        self._cache = cache if cache is not None else TokenCache()
+        self._lock = _threading.Lock()
+        self._in_flight = {}
+        self._session = None
+        self._session_pid = None
+
+    def _get_session(self):
+        # a session made before uwsgi forked would share its sockets with
+        # the other workers
+        with self._lock:
+            if self._session is None or self._session_pid != _os.getpid():
+                session = _requests.Session()
+                adapter = _HTTPAdapter(pool_connections=1,
+                                       pool_maxsize=self._pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._session_pid = _os.getpid()
+            return self._session
+
+    def _cached_user(self, token):
+        cached = self._cache.get(token)
+        if cached is None:
+            return None
+        user, error = cached
+        if error is not None:
+            raise ValueError(error)
+        return user
 
     def get_user(self, token):
         if not token:
             raise ValueError('Must supply token')
-        user = self._cache.get_user(token)
+        user = self._cached_user(token)
         if user:
             return user
 
+        key = _hash(token)
+        with self._lock:
+            validation = self._in_flight.get(key)
+            mine = validation is None
+            if mine:
+                # another validation may have finished since the cache was checked
+                user = self._cached_user(token)
+                if user:
+                    return user
+                validation = self._in_flight[key] = _Validation()
+        if mine:
+            try:
+                validation.user = self._validate(token)
+            except Exception as e:
+                validation.error = e
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                validation.done.set()
+        else:
+            validation.done.wait()
+        if validation.error is not None:
+            raise validation.error
+        return validation.user
+
+    def _validate(self, token):
         d = {'token': token, 'fields': 'user_id'}
-        ret = _requests.post(self._authurl, data=d)
+        ret = self._get_session().post(self._authurl, data=d,
+                                       timeout=self._timeout)
         if not ret.ok:
             try:
                 err = ret.json()
             except:
                 ret.raise_for_status()
-            raise ValueError('Error connecting to auth service: {} {}\n{}'
-                             .format(ret.status_code, ret.reason,
-                                     err['error_msg']))
+            msg = ('Error connecting to auth service: {} {}\n{}'
+                   .format(ret.status_code, ret.reason, err['error_msg']))
+            if 400 <= ret.status_code < 500:
+                # the token was rejected; the service itself is fine
+                self._cache.add_invalid_token(token, msg)
+            raise ValueError(msg)
 
         user = ret.json()['user_id']
         self._cache.add_valid_token(token, user)
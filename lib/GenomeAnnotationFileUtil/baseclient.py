@@ -7,10 +7,14 @@
 
 from __future__ import print_function
 
+import heapq as _heapq
+import itertools as _itertools
 import json as _json
 import requests as _requests
 import random as _random
 import os as _os
+import threading as _threading
+from requests.adapters import HTTPAdapter as _HTTPAdapter
 
 try:
     from configparser import ConfigParser as _ConfigParser  # py 3
@@ -21,12 +25,80 @@ try:
     from urllib.parse import urlparse as _urlparse  # py3
 except ImportError:
     from urlparse import urlparse as _urlparse  # py2
+
+try:
+    from http.cookiejar import DefaultCookiePolicy as _CookiePolicy  # py3
+except ImportError:
+    from cookielib import DefaultCookiePolicy as _CookiePolicy  # py2
 import time
 
 _CT = 'content-type'
 _AJ = 'application/json'
 _URL_SCHEME = frozenset(['http', 'https'])
 
+_default_pool_size = 10
+_sessions = {}
+_sessions_lock = _threading.Lock()
+
+
+def set_default_pool_size(pool_size):
+    '''
+    Sets how many connections per host clients created after this call keep
+    open, unless they are given their own pool_size.
+    '''
+    global _default_pool_size
+    if pool_size < 1:
+        raise ValueError('The pool size must be at least 1')
+    _default_pool_size = int(pool_size)
+
+
+def _get_session(pool_size):
+    # One session per process and pool size, shared by every client and
+    # thread, keeps connections alive between calls.  Sessions are never
+    # carried across a fork, which would share their sockets.
+    key = (_os.getpid(), pool_size)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _requests.Session()
+            # clients with different tokens share the session, so it must
+            # not carry state such as cookies from one call to the next
+            session.cookies.set_policy(_CookiePolicy(allowed_domains=[]))
+            adapter = _HTTPAdapter(pool_connections=pool_size,
+                                   pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+        return session
+
+
+_service_url_ttl = 300.0
+_service_urls = {}
+_service_url_counts = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_service_urls_lock = _threading.Lock()
+
+
+def set_service_url_ttl(seconds):
+    '''
+    Sets how long a dynamic service URL from the Service Wizard is reused
+    before it is looked up again. 0 looks it up for every call.
+    '''
+    global _service_url_ttl
+    _service_url_ttl = float(seconds)
+
+
+def service_url_cache_stats():
+    ''' Returns the hit, miss and invalidation counts of the service URL cache. '''
+    with _service_urls_lock:
+        stats = dict(_service_url_counts)
+        stats['entries'] = len(_service_urls)
+    return stats
+
+
+def clear_service_url_cache():
+    with _service_urls_lock:
+        _service_urls.clear()
+
 
 def _get_token(user_id, password, auth_svc):
     # This is bandaid helper function until we get a full
@@ -93,6 +165,281 @@ class _JSONObjectEncoder(_json.JSONEncoder):
         return _json.JSONEncoder.default(self, obj)
 
 
+class JobTimeoutError(Exception):
+    pass
+
+
+class JobFuture(object):
+    '''
+    The eventual result of an SDK job submitted with BaseClient.submit_job.
+    '''
+
+    def __init__(self, service_method, job_id):
+        self.service_method = service_method
+        self.job_id = job_id
+        self._done = _threading.Event()
+        self._result = None
+        self._error = None
+
+    def _finish(self, result=None, error=None):
+        self._result = result
+        self._error = error
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def exception(self, timeout=None):
+        ''' Waits for the job and returns the error it failed with, or None. '''
+        if not self._done.wait(timeout):
+            raise JobTimeoutError('Job {} of {} is still running'.format(
+                self.job_id, self.service_method))
+        return self._error
+
+    def result(self, timeout=None):
+        ''' Waits for the job and returns its result, or raises its error. '''
+        error = self.exception(timeout)
+        if error is not None:
+            raise error
+        return self._result
+
+
+def _unpack_result(resp):
+    if 'result' not in resp:
+        raise ServerError('Unknown', 0, 'An unknown server error occurred')
+    if not resp['result']:
+        return
+    if len(resp['result']) == 1:
+        return resp['result'][0]
+    return resp['result']
+
+
+class BatchCall(object):
+    '''
+    The eventual result of a call added to a Batch.
+    '''
+
+    def __init__(self, service_method):
+        self.service_method = service_method
+        self._done = False
+        self._result = None
+        self._error = None
+
+    def _finish(self, result=None, error=None):
+        self._result = result
+        self._error = error
+        self._done = True
+
+    def done(self):
+        return self._done
+
+    def exception(self):
+        ''' Returns the error the call failed with, or None. '''
+        if not self._done:
+            raise RuntimeError('The batch with this call of {} has not been sent'
+                               .format(self.service_method))
+        return self._error
+
+    def result(self):
+        ''' Returns the result of the call, or raises its error. '''
+        error = self.exception()
+        if error is not None:
+            raise error
+        return self._result
+
+
+class Batch(object):
+    '''
+    Calls collected with call_method and sent together by send, or at the
+    end of a with block, in one request to each service URL. An error in
+    one call is raised only by that call's result; if the request itself
+    fails, every call in it fails with that error. Made with
+    BaseClient.batch.
+    '''
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def call_method(self, service_method, args, service_ver=None,
+                    context=None):
+        '''
+        Adds a call to the batch and returns its BatchCall. The arguments
+        are those of BaseClient.call_method.
+        '''
+        call = BatchCall(service_method)
+        self._calls.append((call, service_method, args, service_ver,
+                            self._client._set_up_context(service_ver, context)))
+        return call
+
+    def send(self):
+        ''' Sends the calls added since the last send. '''
+        calls, self._calls = self._calls, []
+        client = self._client
+        by_url = {}
+        for c in calls:
+            try:
+                url = client._get_service_url(c[1], c[3])
+            except Exception as e:
+                c[0]._finish(error=e)
+                continue
+            by_url.setdefault(url, []).append(c)
+        for url, group in by_url.items():
+            request = []
+            for i, (_, service_method, args, _, context) in enumerate(group):
+                arg_hash = client._arg_hash(service_method, args, context)
+                arg_hash['id'] += '-' + str(i)
+                request.append(arg_hash)
+            try:
+                resp = client._post(url, request)
+                if not isinstance(resp, list):
+                    raise ServerError('Unknown', 0,
+                                      'The server did not answer with a batch response')
+            except Exception as e:
+                for call, service_method, _, service_ver, _ in group:
+                    if client.lookup_url:
+                        client._check_service_url(e, service_method, service_ver, url)
+                    call._finish(error=e)
+                continue
+            by_id = dict((r.get('id'), r) for r in resp if isinstance(r, dict))
+            for arg_hash, (call, _, _, _, _) in zip(request, group):
+                r = by_id.get(arg_hash['id'])
+                try:
+                    if r is None:
+                        raise ServerError('Unknown', 0,
+                                          'The server did not answer the call')
+                    if r.get('error'):
+                        raise ServerError(**r['error'])
+                    call._finish(_unpack_result(r))
+                except ServerError as e:
+                    call._finish(error=e)
+
+
+class _ScheduledJob(object):
+
+    def __init__(self, module, future, wait):
+        self.module = module
+        self.future = future
+        self.wait = wait
+
+
+class JobScheduler(object):
+    '''
+    Polls the state of all the jobs a client has submitted from a single
+    thread. Each job is first checked after the client's
+    async_job_check_time, and the wait before each following check grows by
+    async_job_check_time_scale_percent up to async_job_check_max_time, so
+    short jobs are noticed quickly and long ones don't flood the server.
+    The thread only runs while there are jobs to poll.
+    '''
+
+    def __init__(self, client):
+        self._client = client
+        self._cond = _threading.Condition()
+        self._queue = []
+        self._order = _itertools.count()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, service_method, args, service_ver=None, context=None):
+        mod, _ = service_method.split('.')
+        job_id = self._client._submit_job(service_method, args, service_ver,
+                                          context)
+        future = JobFuture(service_method, job_id)
+        self._schedule(_ScheduledJob(mod, future,
+                                     self._client.async_job_check_time))
+        return future
+
+    def cancel(self, future, error):
+        ''' Stops polling a job, finishing its future with error. '''
+        with self._cond:
+            if future.done():
+                return
+            future._finish(error=error)
+            self._queue = [e for e in self._queue if e[2].future is not future]
+            _heapq.heapify(self._queue)
+            self._cond.notify()
+
+    def _schedule(self, job):
+        with self._cond:
+            if self._pid != _os.getpid():
+                # a forked child doesn't get the parent's thread
+                self._pid = _os.getpid()
+                self._queue = []
+                self._thread = None
+            if job.future.done():
+                # cancelled while it was being checked
+                return
+            _heapq.heappush(self._queue,
+                            (time.time() + job.wait, next(self._order), job))
+            if self._thread is None:
+                self._start_thread()
+            self._cond.notify()
+
+    def _start_thread(self):
+        # call with self._cond held
+        self._thread = _threading.Thread(target=self._poll,
+                                        name='JobScheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _poll(self):
+        try:
+            while True:
+                with self._cond:
+                    while True:
+                        if not self._queue:
+                            self._thread = None
+                            return
+                        wait = self._queue[0][0] - time.time()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    now = time.time()
+                    due = []
+                    while self._queue and self._queue[0][0] <= now:
+                        due.append(_heapq.heappop(self._queue)[2])
+                for job in due:
+                    self._check(job)
+        finally:
+            with self._cond:
+                # if this thread died, the jobs left get a new one
+                if self._thread is _threading.current_thread():
+                    self._thread = None
+                    if self._queue:
+                        self._start_thread()
+
+    def _check(self, job):
+        client = self._client
+        if job.future.done():
+            return
+        try:
+            job_state = client._check_job(job.module, job.future.job_id)
+            if not job_state['finished']:
+                job.wait = min(job.wait *
+                               client.async_job_check_time_scale_percent /
+                               100.0, client.async_job_check_max_time)
+                self._schedule(job)
+            elif job_state.get('error'):
+                job.future._finish(error=ServerError(**job_state['error']))
+            elif not job_state['result']:
+                job.future._finish()
+            elif len(job_state['result']) == 1:
+                job.future._finish(job_state['result'][0])
+            else:
+                job.future._finish(job_state['result'])
+        except Exception as e:
+            # a failed check or a malformed job state fails only this job
+            job.future._finish(error=e)
+
+
 class BaseClient(object):
     '''
     The KBase base client.
@@ -116,6 +463,9 @@ class BaseClient(object):
     lookup_url - set to true when contacting KBase dynamic services.
     async_job_check_time_ms - the wait time between checking job state for
         asynchronous jobs run with the run_job method.
+    pool_size - the number of keep-alive connections to each host shared by
+        the clients in this process with the same pool_size. Defaults to the
+        value of set_default_pool_size, 10 unless changed.
     '''
     def __init__(
             self, url=None, timeout=30 * 60, user_id=None,
@@ -125,7 +475,8 @@ class BaseClient(object):
             lookup_url=False,
             async_job_check_time_ms=100,
             async_job_check_time_scale_percent=150,
-            async_job_check_max_time_ms=300000):
+            async_job_check_max_time_ms=300000,
+            pool_size=None):
         if url is None:
             raise ValueError('A url is required')
         scheme, _, _, _, _, _ = _urlparse(url)
@@ -136,6 +487,9 @@ class BaseClient(object):
         self._headers = dict()
         self.trust_all_ssl_certificates = trust_all_ssl_certificates
         self.lookup_url = lookup_url
+        self.pool_size = pool_size or _default_pool_size
+        self._job_scheduler = None
+        self._job_scheduler_lock = _threading.Lock()
         self.async_job_check_time = async_job_check_time_ms / 1000.0
         self.async_job_check_time_scale_percent = (
             async_job_check_time_scale_percent)
@@ -160,7 +514,7 @@ class BaseClient(object):
         if self.timeout < 1:
             raise ValueError('Timeout value must be at least 1 second')
 
-    def _call(self, url, method, params, context=None):
+    def _arg_hash(self, method, params, context=None):
         arg_hash = {'method': method,
                     'params': params,
                     'version': '1.1',
@@ -170,11 +524,13 @@ class BaseClient(object):
             if type(context) is not dict:
                 raise ValueError('context is not type dict as required.')
             arg_hash['context'] = context
+        return arg_hash
 
-        body = _json.dumps(arg_hash, cls=_JSONObjectEncoder)
-        ret = _requests.post(url, data=body, headers=self._headers,
-                             timeout=self.timeout,
-                             verify=not self.trust_all_ssl_certificates)
+    def _post(self, url, request):
+        body = _json.dumps(request, cls=_JSONObjectEncoder)
+        ret = _get_session(self.pool_size).post(
+            url, data=body, headers=self._headers, timeout=self.timeout,
+            verify=not self.trust_all_ssl_certificates)
         ret.encoding = 'utf-8'
         if ret.status_code == 500:
             if ret.headers.get(_CT) == _AJ:
@@ -187,23 +543,41 @@ class BaseClient(object):
                 raise ServerError('Unknown', 0, ret.text)
         if not ret.ok:
             ret.raise_for_status()
-        resp = ret.json()
-        if 'result' not in resp:
-            raise ServerError('Unknown', 0, 'An unknown server error occurred')
-        if not resp['result']:
-            return
-        if len(resp['result']) == 1:
-            return resp['result'][0]
-        return resp['result']
+        return ret.json()
+
+    def _call(self, url, method, params, context=None):
+        return _unpack_result(self._post(
+            url, self._arg_hash(method, params, context)))
 
     def _get_service_url(self, service_method, service_version):
         if not self.lookup_url:
             return self.url
         service, _ = service_method.split('.')
+        key = (self.url, service, service_version)
+        now = time.time()
+        with _service_urls_lock:
+            cached = _service_urls.get(key)
+            if cached is not None and cached[1] > now:
+                _service_url_counts['hits'] += 1
+                return cached[0]
+            _service_url_counts['misses'] += 1
         service_status_ret = self._call(
             self.url, 'ServiceWizard.get_service_status',
             [{'module_name': service, 'version': service_version}])
-        return service_status_ret['url']
+        url = service_status_ret['url']
+        with _service_urls_lock:
+            _service_urls[key] = (url, time.time() + _service_url_ttl)
+        return url
+
+    def _invalidate_service_url(self, service_method, service_version, url):
+        # the service may have moved, so look it up again on the next call
+        service, _ = service_method.split('.')
+        key = (self.url, service, service_version)
+        with _service_urls_lock:
+            cached = _service_urls.get(key)
+            if cached is not None and cached[0] == url:
+                del _service_urls[key]
+                _service_url_counts['invalidations'] += 1
 
     def _set_up_context(self, service_ver=None, context=None):
         if service_ver:
@@ -222,7 +596,28 @@ class BaseClient(object):
         return self._call(self.url, mod + '._' + meth + '_submit',
                           args, context)
 
-    def run_job(self, service_method, args, service_ver=None, context=None):
+    def submit_job(self, service_method, args, service_ver=None,
+                   context=None):
+        '''
+        Start a SDK method asynchronously and return a JobFuture for its
+        result. Many jobs can be in flight at once; their state is polled
+        from one thread.
+        Required arguments:
+        service_method - the service and method to run, e.g. myserv.mymeth.
+        args - a list of arguments to the method.
+        Optional arguments:
+        service_ver - the version of the service to run, e.g. a git hash
+            or dev/beta/release.
+        context - the rpc context dict.
+        '''
+        with self._job_scheduler_lock:
+            if self._job_scheduler is None:
+                self._job_scheduler = JobScheduler(self)
+        return self._job_scheduler.submit(service_method, args, service_ver,
+                                          context)
+
+    def run_job(self, service_method, args, service_ver=None, context=None,
+                timeout=None):
         '''
         Run a SDK method asynchronously.
         Required arguments:
@@ -232,24 +627,17 @@ class BaseClient(object):
         service_ver - the version of the service to run, e.g. a git hash
             or dev/beta/release.
         context - the rpc context dict.
+        timeout - seconds to wait for the job before raising a
+            JobTimeoutError and no longer polling it; by default there is
+            no limit.
         '''
-        mod, _ = service_method.split('.')
-        job_id = self._submit_job(service_method, args, service_ver, context)
-        async_job_check_time = self.async_job_check_time
-        while True:
-            time.sleep(async_job_check_time)
-            async_job_check_time = (async_job_check_time *
-                                    self.async_job_check_time_scale_percent /
-                                    100.0)
-            if async_job_check_time > self.async_job_check_max_time:
-                async_job_check_time = self.async_job_check_max_time
-            job_state = self._check_job(mod, job_id)
-            if job_state['finished']:
-                if not job_state['result']:
-                    return
-                if len(job_state['result']) == 1:
-                    return job_state['result'][0]
-                return job_state['result']
+        future = self.submit_job(service_method, args, service_ver, context)
+        try:
+            return future.result(timeout)
+        except JobTimeoutError as e:
+            if not future.done():
+                self._job_scheduler.cancel(future, e)
+            raise
 
     def call_method(self, service_method, args, service_ver=None,
                     context=None):
@@ -265,4 +653,33 @@ class BaseClient(object):
         '''
         url = self._get_service_url(service_method, service_ver)
         context = self._set_up_context(service_ver, context)
-        return self._call(url, service_method, args, context)
+        if not self.lookup_url:
+            return self._call(url, service_method, args, context)
+        try:
+            return self._call(url, service_method, args, context)
+        except Exception as e:
+            self._check_service_url(e, service_method, service_ver, url)
+            raise
+
+    def _check_service_url(self, error, service_method, service_version, url):
+        # drops the cached URL if the error says the service isn't there
+        if isinstance(error, (_requests.ConnectionError, _requests.Timeout)):
+            self._invalidate_service_url(service_method, service_version, url)
+        elif isinstance(error, _requests.HTTPError):
+            if error.response is not None and error.response.status_code >= 500:
+                self._invalidate_service_url(service_method, service_version, url)
+        elif isinstance(error, ServerError):
+            # a 500 that isn't a JSON-RPC error didn't come from the service
+            if error.name == 'Unknown':
+                self._invalidate_service_url(service_method, service_version, url)
+
+    def batch(self):
+        '''
+        Returns a Batch, which collects calls and sends them to the server
+        as one JSON-RPC batch request, e.g.
+            with client.batch() as batch:
+                a = batch.call_method('myserv.status', [])
+                b = batch.call_method('myserv.mymeth', [params])
+            print(a.result(), b.result())
+        '''
+        return Batch(self)
@@ -0,0 +1,182 @@
+'''
+A scratch directory of generated GenBank exports keyed by versioned
+workspace ref (ws/obj/ver).  A versioned object never changes, so its
+export can be handed out again instead of being regenerated.
+
+Each entry is built under an flock on a per-ref lock file, so concurrent
+requests for the same ref, in any uwsgi process, wait for one build
+rather than doing their own.  An entry is written to a temporary name and
+renamed into place, so readers never see a partial file.  Once the entries
+add up to more than max_bytes the least recently used ones are deleted,
+with their lock files.
+'''
+import errno as _errno
+import fcntl as _fcntl
+import json as _json
+import os as _os
+import uuid as _uuid
+from contextlib import contextmanager as _contextmanager
+
+from GenomeAnnotationFileUtil import staging as _staging
+
+_SUFFIX = '.gbk'
+
+# a symlink would dangle once its entry is evicted, and a hard link is the
+# entry itself, so only files that are read and deleted by this service may
+# be hard links; a file handed to a caller could be written to
+_HAND_OUT_STRATEGIES = (_staging.REFLINK, _staging.COPY)
+_SHARED_STRATEGIES = (_staging.HARDLINK, _staging.REFLINK, _staging.COPY)
+
+
+class ExportCache(object):
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        try:
+            _os.makedirs(directory)
+        except OSError as e:
+            if e.errno != _errno.EEXIST:
+                raise
+
+    def _lock_path(self, name):
+        return _os.path.join(self.directory, name + '.lock')
+
+    @_contextmanager
+    def _lock(self, name, blocking=True):
+        path = self._lock_path(name)
+        flags = _fcntl.LOCK_EX
+        if not blocking:
+            flags |= _fcntl.LOCK_NB
+        while True:
+            f = open(path, 'a')
+            try:
+                _fcntl.flock(f.fileno(), flags)
+            except (IOError, OSError) as e:
+                f.close()
+                if blocking or e.errno not in (_errno.EAGAIN, _errno.EACCES):
+                    raise
+                yield False
+                return
+            # the holder before us may have removed the lock file with its entry,
+            # so the lock only counts if it is on the file that is there now
+            try:
+                current = _os.path.samestat(_os.fstat(f.fileno()), _os.stat(path))
+            except OSError:
+                current = False
+            if current:
+                break
+            f.close()
+        try:
+            yield True
+        finally:
+            _fcntl.flock(f.fileno(), _fcntl.LOCK_UN)
+            f.close()
+
+    def _remove_lock_file(self, name):
+        # call with the lock held; later lockers open a new file
+        try:
+            _os.remove(self._lock_path(name))
+        except OSError as e:
+            if e.errno != _errno.ENOENT:
+                raise
+
+    def _entry_name(self, ref):
+        parts = ref.split('/')
+        if len(parts) != 3 or not all(p.isdigit() for p in parts):
+            raise ValueError('Export cache entries need a ws/obj/ver ref, got ' + ref)
+        return '_'.join(parts) + _SUFFIX
+
+    def get(self, ref, dest, build, shared=False, check=None):
+        '''
+        Puts the export of versioned ref at dest, a path that must not exist
+        yet.  On a miss build(path) is called to write the export to path.
+        On a hit check(), if given, is called first and may raise to refuse
+        the caller the entry.  Returns True on a hit.  The file at dest is a
+        writable clone or copy of the cache entry, or with shared may be the
+        entry itself, a hard link that must only be read or unlinked.
+        '''
+        name = self._entry_name(ref)
+        entry = _os.path.join(self.directory, name)
+        with self._lock(name):
+            hit = _os.path.exists(entry)
+            if hit:
+                if check is not None:
+                    check()
+                # the modification time is the LRU clock
+                _os.utime(entry, None)
+            else:
+                tmp = entry + '.' + str(_uuid.uuid4()) + '.tmp'
+                try:
+                    build(tmp)
+                    _os.chmod(tmp, 0o444)
+                    _os.rename(tmp, entry)
+                except Exception:
+                    if _os.path.exists(tmp):
+                        _os.remove(tmp)
+                    self._remove_lock_file(name)
+                    raise
+            _staging.stage_file(entry, _os.path.dirname(dest),
+                                _SHARED_STRATEGIES if shared else _HAND_OUT_STRATEGIES,
+                                name=_os.path.basename(dest))
+        if not shared:
+            # a copy keeps the entry's read only mode
+            _os.chmod(dest, 0o644)
+        self._count('hits' if hit else 'misses')
+        if not hit:
+            self.evict()
+        return hit
+
+    def _entries(self):
+        entries = []
+        for f in _os.listdir(self.directory):
+            if not f.endswith(_SUFFIX):
+                continue
+            try:
+                st = _os.stat(_os.path.join(self.directory, f))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+        return entries
+
+    def evict(self):
+        ''' Deletes the least recently used entries until the rest fit in max_bytes. '''
+        with self._lock('.evict'):
+            entries = sorted(self._entries())
+            total = sum(e[1] for e in entries)
+            for _, size, f in entries:
+                if total <= self.max_bytes:
+                    break
+                # an entry being built or handed out right now is skipped
+                with self._lock(f, blocking=False) as locked:
+                    if locked:
+                        _os.remove(_os.path.join(self.directory, f))
+                        self._remove_lock_file(f)
+                        total -= size
+
+    def _count(self, counter):
+        path = _os.path.join(self.directory, 'stats.json')
+        with self._lock('.stats'):
+            counts = self._read_counts(path)
+            counts[counter] = counts.get(counter, 0) + 1
+            tmp = path + '.tmp'
+            with open(tmp, 'w') as f:
+                _json.dump(counts, f)
+            _os.rename(tmp, path)
+
+    def _read_counts(self, path):
+        try:
+            with open(path) as f:
+                return _json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def stats(self):
+        ''' Returns the hit and miss counts of all processes and the current size. '''
+        counts = self._read_counts(_os.path.join(self.directory, 'stats.json'))
+        entries = self._entries()
+        return {'hits': counts.get('hits', 0),
+                'misses': counts.get('misses', 0),
+                'entries': len(entries),
+                'bytes': sum(e[1] for e in entries),
+                'max_bytes': self.max_bytes}
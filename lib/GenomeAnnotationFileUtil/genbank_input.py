@@ -0,0 +1,140 @@
+'''
+Reads the GenBank files given to an upload: tells plain files from
+compressed ones and archives by their content, and streams the
+decompressed data of each without writing anything, so the Impl can put
+it in the staging directory for the uploader.  The records and features
+of a file can be counted from its lines, without parsing it, to log the
+size of the genome with the memory the upload took.
+'''
+import bz2 as _bz2
+import gzip as _gzip
+import os as _os
+import re as _re
+import tarfile as _tarfile
+import zipfile as _zipfile
+
+_LOCUS_LENGTH = _re.compile(br'\s(\d+) (?:bp|aa)\b')
+
+_MAGIC = ((b'\x1f\x8b', 'gzip'),
+          (b'BZh', 'bzip2'),
+          (b'PK\x03\x04', 'zip'))
+
+_SUFFIXES = {'gzip': ('.gz', '.gzip'),
+             'bzip2': ('.bz2', '.bzip2'),
+             'zip': ('.zip',)}
+
+
+def detect_compression(path):
+    '''
+    Returns 'tar' (plain or compressed), 'gzip', 'bzip2', 'zip' or None for
+    a plain file, going by the file's content.
+    '''
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    fmt = None
+    for magic, f in _MAGIC:
+        if head.startswith(magic):
+            fmt = f
+    if fmt != 'zip' and _tarfile.is_tarfile(path):
+        return 'tar'
+    return fmt
+
+
+def _decompressed_name(path, fmt):
+    name = _os.path.basename(path)
+    for suffix in _SUFFIXES[fmt]:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name + '.gbk'
+
+
+class _MemberStream(object):
+    ''' Gives a tar member (not a context manager on python 2) a with block. '''
+
+    def __init__(self, f):
+        self._f = f
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def read(self, size=-1):
+        if size < 0:
+            # python 2's tar members read nothing sensible for -1
+            return self._f.read()
+        return self._f.read(size)
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_input_streams(path):
+    '''
+    Yields (name, binary file object) for every stream of decompressed data
+    in path: the file itself if it is not compressed, its content if it is
+    gzip or bzip2 compressed, or each member of a zip or tar archive.  name
+    is the file name the decompressed data would have.  Each stream must be
+    read before the next one is requested.  Nothing is written to disk.
+    '''
+    fmt = detect_compression(path)
+    if fmt is None:
+        yield _os.path.basename(path), open(path, 'rb')
+    elif fmt == 'tar':
+        # stream mode reads the archive front to back without seeking
+        with _tarfile.open(path, 'r|*') as tf:
+            for member in tf:
+                if member.isfile():
+                    yield (_os.path.basename(member.name),
+                           _MemberStream(tf.extractfile(member)))
+    elif fmt == 'gzip':
+        yield _decompressed_name(path, fmt), _gzip.open(path, 'rb')
+    elif fmt == 'bzip2':
+        yield _decompressed_name(path, fmt), _bz2.BZ2File(path, 'rb')
+    else:
+        with _zipfile.ZipFile(path) as zf:
+            for member in zf.infolist():
+                name = _os.path.basename(member.filename)
+                if not name:
+                    continue
+                yield name, zf.open(member)
+
+
+def is_genbank_file(path):
+    ''' True if a LOCUS line starts within the first 64k of the file. '''
+    if not _os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        head = f.read(64 * 1024)
+    return head.lstrip().startswith(b'LOCUS') or b'\nLOCUS ' in head
+
+
+def count_records(lines):
+    '''
+    Returns the contigs, bases and features of the GenBank lines, read as
+    bytes, e.g. from a file opened with 'rb'.  Only the LOCUS lines, with
+    the length they give, and the feature keys are looked at, so a
+    malformed file is counted as far as it goes rather than rejected.
+    '''
+    contigs = bases = features = 0
+    in_features = False
+    for line in lines:
+        if line.startswith(b'LOCUS '):
+            contigs += 1
+            length = _LOCUS_LENGTH.search(line)
+            if length is not None:
+                bases += int(length.group(1))
+            in_features = False
+        elif line.startswith(b'FEATURES '):
+            in_features = True
+        elif in_features:
+            if not line.startswith(b' '):
+                # ORIGIN, CONTIG, BASE COUNT or the end of the record
+                in_features = False
+            elif line.startswith(b'     ') and line[5:6].strip():
+                features += 1
+    return {'contigs': contigs, 'bases': bases, 'features': features}
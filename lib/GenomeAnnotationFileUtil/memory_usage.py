@@ -0,0 +1,202 @@
+'''
+Peak memory of a method call, logged with the size of the genome it
+handled so workers and job containers can be sized from real numbers.
+
+    with MemoryUsage('genbank_to_genome_annotation', trace_top=10) as usage:
+        ...
+        usage.sizes.update(bytes_in=..., contigs=..., features=...)
+    # logs one line: memory {"method": ..., "peak_rss": ..., "ok": true, ...}
+
+The peak is the resident set high water mark of the process (VmHWM),
+which is reset when a call starts if no other call is being measured.
+An async job runs one call per process, so its peak is exact.  Calls that
+overlap in a threaded server share the high water mark from when the
+first of them started, and are logged with overlapped set; their peaks
+are never too low, but can be too high.  Where the mark can't be reset,
+the peak is the process's since it started, and peak_reset is false.
+
+With trace_top, and on python 3, the allocation sites holding the most
+memory at the end of the call are logged too.  Tracing slows every
+allocation in the process while any call has it on.
+'''
+import json as _json
+import threading as _threading
+
+try:
+    import resource as _resource
+except ImportError:
+    _resource = None
+try:
+    import tracemalloc as _tracemalloc
+except ImportError:
+    _tracemalloc = None
+
+_lock = _threading.Lock()
+_active = 0
+_tracing = 0
+_tracing_ours = False
+_started = 0
+_peak_reset = False
+
+
+def _status_bytes(field):
+    # fields of /proc/self/status, e.g. 'VmRSS:    1234 kB'
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def rss_bytes():
+    ''' Returns the resident set size of this process, or None if not known. '''
+    return _status_bytes('VmRSS')
+
+
+def peak_rss_bytes():
+    ''' Returns the resident set high water mark of this process. '''
+    peak = _status_bytes('VmHWM')
+    if peak is None and _resource is not None:
+        # in kB on linux
+        peak = _resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss * 1024
+    return peak
+
+
+def reset_peak_rss():
+    ''' Resets the high water mark to the current RSS; returns whether it could. '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (IOError, OSError, ValueError):
+        # missing, or 'max' for no cgroup v2 limit
+        return None
+
+
+def available_bytes():
+    '''
+    Returns how much more memory this process could use, the smaller of
+    what the system has available and what its cgroup limit leaves, or
+    None if neither is known.
+    '''
+    available = []
+    meminfo = {}
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                name, value = line.split(':', 1)
+                meminfo[name] = int(value.split()[0]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    if 'MemAvailable' in meminfo:
+        available.append(meminfo['MemAvailable'])
+    for limit_path, usage_path in (
+            ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+            ('/sys/fs/cgroup/memory/memory.limit_in_bytes',
+             '/sys/fs/cgroup/memory/memory.usage_in_bytes')):
+        limit = _read_int(limit_path)
+        usage = _read_int(usage_path)
+        if limit is not None and usage is not None:
+            available.append(max(limit - usage, 0))
+            break
+    return min(available) if available else None
+
+
+def check_fits(method, estimate):
+    '''
+    Raises a ValueError if a call of method estimated to need estimate
+    more bytes won't fit in what's available.
+    '''
+    available = available_bytes()
+    if available is not None and estimate > available:
+        raise ValueError(
+            '{} would need about {} MB but only {} MB of memory is available'
+            .format(method, estimate // 2 ** 20, available // 2 ** 20))
+
+
+class MemoryUsage(object):
+
+    def __init__(self, method, trace_top=0):
+        global _active, _tracing, _tracing_ours, _started, _peak_reset
+        self.method = method
+        self.sizes = {}
+        self._trace_top = trace_top if _tracemalloc is not None else 0
+        self._done = False
+        with _lock:
+            # a reset while other calls are measured would hide their peaks
+            self._overlapped = _active > 0
+            if _active == 0:
+                _peak_reset = reset_peak_rss()
+            self.peak_reset = _peak_reset
+            _started += 1
+            self._started = _started
+            _active += 1
+            if self._trace_top:
+                if _tracing == 0 and not _tracemalloc.is_tracing():
+                    _tracemalloc.start()
+                    _tracing_ours = True
+                _tracing += 1
+        self.start_rss = rss_bytes()
+
+    def _finish(self):
+        global _active, _tracing, _tracing_ours
+        peak = peak_rss_bytes()
+        top = None
+        with _lock:
+            _active -= 1
+            overlapped = self._overlapped or _started != self._started
+            if self._trace_top:
+                snapshot = _tracemalloc.take_snapshot()
+                _tracing -= 1
+                # tracing someone else turned on is left on
+                if _tracing == 0 and _tracing_ours:
+                    _tracemalloc.stop()
+                    _tracing_ours = False
+        if self._trace_top:
+            top = [{'site': '{}:{}'.format(s.traceback[0].filename, s.traceback[0].lineno),
+                    'bytes': s.size, 'count': s.count}
+                   for s in snapshot.statistics('lineno')[:self._trace_top]]
+        return peak, overlapped, top
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.log(ok=exc_type is None)
+
+    def as_dict(self):
+        '''
+        Ends the measurement and returns it; call it once.  Peak and start
+        RSS are in bytes, and None where the platform doesn't report them.
+        '''
+        if self._done:
+            raise RuntimeError('memory usage of {} was already taken'.format(self.method))
+        self._done = True
+        peak, overlapped, top = self._finish()
+        usage = {'method': self.method,
+                 'peak_rss': peak,
+                 'start_rss': self.start_rss,
+                 'peak_reset': self.peak_reset,
+                 'overlapped': overlapped}
+        usage.update(self.sizes)
+        if top is not None:
+            usage['top_allocations'] = top
+        return usage
+
+    def log(self, ok=True):
+        ''' Ends the measurement and prints it as one line of JSON. '''
+        usage = self.as_dict()
+        usage['ok'] = ok
+        print('memory ' + _json.dumps(usage, sort_keys=True))
+        return usage
@@ -0,0 +1,226 @@
+'''
+Per-method request metrics for the JSON-RPC server, in the Prometheus
+text format: request counts by outcome, a latency histogram, the requests
+in flight, and request and response bytes.
+
+Each process keeps its own numbers and, at most every flush_interval
+seconds, writes them to a file of its own in directory.  render() adds up
+the files of every process started from the same parent (the uwsgi
+master, which imports the application before forking its workers), so a
+scrape answered by any worker covers them all.  A worker that has exited
+still counts towards the totals but not towards the requests in flight.
+Without a directory only this process is reported.
+'''
+import errno as _errno
+import glob as _glob
+import json as _json
+import os as _os
+import threading as _threading
+import time as _time
+
+PREFIX = 'genomeannotationfileutil_'
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+           120, 300, 600, 1800)
+
+_COUNTERS = (
+    ('request_bytes_total', 'Bytes of request bodies received.'),
+    ('response_bytes_total', 'Bytes of response bodies sent.'),
+)
+
+
+def _pid_alive(pid):
+    try:
+        _os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == _errno.EPERM
+    return True
+
+
+def _empty():
+    return {'requests': {}, 'duration': {}, 'in_flight': {},
+            'request_bytes_total': {}, 'response_bytes_total': {}}
+
+
+def _merge(total, state, alive):
+    for method, outcomes in state['requests'].items():
+        into = total['requests'].setdefault(method, {})
+        for outcome, n in outcomes.items():
+            into[outcome] = into.get(outcome, 0) + n
+    for method, hist in state['duration'].items():
+        into = total['duration'].setdefault(
+            method, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+        into['buckets'] = [a + b for a, b in zip(into['buckets'], hist['buckets'])]
+        into['sum'] += hist['sum']
+        into['count'] += hist['count']
+    for name, _ in _COUNTERS:
+        for method, n in state[name].items():
+            total[name][method] = total[name].get(method, 0) + n
+    for method, n in state['in_flight'].items():
+        total['in_flight'][method] = (total['in_flight'].get(method, 0) +
+                                      (n if alive else 0))
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(k, v) for k, v in
+                          sorted(labels.items())) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics(object):
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = _threading.Lock()
+        self._state = _empty()
+        self._state_pid = _os.getpid()
+        self._flushed = 0
+        self._flush_timer = None
+        # the process the workers are forked from
+        self._parent = _os.getpid()
+        if directory:
+            try:
+                _os.makedirs(directory)
+            except OSError as e:
+                if e.errno != _errno.EEXIST:
+                    raise
+            # files left by earlier runs of the server
+            for path in _glob.glob(_os.path.join(directory, '*-*.json')):
+                if not _pid_alive(self._file_parent(path)):
+                    try:
+                        _os.remove(path)
+                    except OSError:
+                        pass
+
+    @staticmethod
+    def _file_parent(path):
+        return int(_os.path.basename(path).split('-')[0])
+
+    def _path(self):
+        return _os.path.join(self.directory, '{}-{}.json'.format(
+            self._parent, _os.getpid()))
+
+    def _own_state(self):
+        # a forked worker starts with nothing, not with its parent's numbers
+        if self._state_pid != _os.getpid():
+            self._state = _empty()
+            self._state_pid = _os.getpid()
+            self._flushed = 0
+            self._flush_timer = None
+        return self._state
+
+    def start(self, method):
+        ''' Records the start of a call of method; returns what to pass to finish. '''
+        with self._lock:
+            state = self._own_state()
+            state['in_flight'][method] = state['in_flight'].get(method, 0) + 1
+        self._flush()
+        return _time.time()
+
+    def finish(self, method, started, ok, request_bytes, response_bytes):
+        elapsed = _time.time() - started
+        bucket = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                bucket = i
+                break
+        with self._lock:
+            state = self._own_state()
+            state['in_flight'][method] = state['in_flight'].get(method, 1) - 1
+            outcomes = state['requests'].setdefault(method, {})
+            outcome = 'ok' if ok else 'error'
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            hist = state['duration'].setdefault(
+                method, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+            hist['buckets'][bucket] += 1
+            hist['sum'] += elapsed
+            hist['count'] += 1
+            for name, n in (('request_bytes_total', request_bytes),
+                            ('response_bytes_total', response_bytes)):
+                state[name][method] = state[name].get(method, 0) + n
+        self._flush()
+
+    def _flush(self, force=False):
+        if not self.directory:
+            return
+        with self._lock:
+            state = self._own_state()
+            now = _time.time()
+            wait = self._flushed + self.flush_interval - now
+            if not force and wait > 0:
+                # written soon even if no other request comes to do it
+                if self._flush_timer is None:
+                    self._flush_timer = _threading.Timer(wait, self._flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+            self._flushed = now
+            self._flush_timer = None
+            data = _json.dumps(state)
+        path = self._path()
+        tmp = '{}.{}.tmp'.format(path, _threading.current_thread().ident)
+        with open(tmp, 'w') as f:
+            f.write(data)
+        _os.rename(tmp, path)
+
+    def collect(self):
+        ''' Returns the numbers of all the workers, added up. '''
+        if not self.directory:
+            total = _empty()
+            with self._lock:
+                _merge(total, self._own_state(), True)
+            return total
+        self._flush(force=True)
+        total = _empty()
+        for path in _glob.glob(_os.path.join(
+                self.directory, '{}-*.json'.format(self._parent))):
+            try:
+                with open(path) as f:
+                    state = _json.load(f)
+            except (IOError, OSError, ValueError):
+                # removed or replaced while listing
+                continue
+            pid = int(_os.path.basename(path)[:-len('.json')].split('-')[1])
+            _merge(total, state, _pid_alive(pid))
+        return total
+
+    def render(self):
+        ''' Returns the metrics in the Prometheus text exposition format. '''
+        total = self.collect()
+        lines = []
+
+        def header(name, kind, text):
+            lines.append('# HELP {}{} {}'.format(PREFIX, name, text))
+            lines.append('# TYPE {}{} {}'.format(PREFIX, name, kind))
+
+        header('requests_total', 'counter', 'Requests, by method and outcome.')
+        for method in sorted(total['requests']):
+            for outcome, n in sorted(total['requests'][method].items()):
+                lines.append('{}requests_total{} {}'.format(
+                    PREFIX, _labels(method=method, outcome=outcome), n))
+        header('request_duration_seconds', 'histogram', 'Request latency.')
+        for method in sorted(total['duration']):
+            hist = total['duration'][method]
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), hist['buckets']):
+                cumulative += n
+                lines.append('{}request_duration_seconds_bucket{} {}'.format(
+                    PREFIX, _labels(method=method, le=bound), cumulative))
+            lines.append('{}request_duration_seconds_sum{} {}'.format(
+                PREFIX, _labels(method=method), _number(hist['sum'])))
+            lines.append('{}request_duration_seconds_count{} {}'.format(
+                PREFIX, _labels(method=method), hist['count']))
+        header('requests_in_flight', 'gauge', 'Requests being handled now.')
+        for method, n in sorted(total['in_flight'].items()):
+            lines.append('{}requests_in_flight{} {}'.format(
+                PREFIX, _labels(method=method), n))
+        for name, text in _COUNTERS:
+            header(name, 'counter', text)
+            for method, n in sorted(total[name].items()):
+                lines.append('{}{}{} {}'.format(
+                    PREFIX, name, _labels(method=method), n))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,74 @@
+'''
+Opt-in CPU profiling of single calls, for finding out why one call is
+slow without its data at hand.  A call is profiled if its RPC context has
+profile set, or at random at sample_rate.  The cProfile stats are written
+to directory as <method>-<call_id>-<pid>-<time>.prof, loadable with
+pstats.Stats(path), and the path is logged against the call.
+
+Only the thread the method runs in is profiled; work it hands to thread
+or process pools shows as time spent waiting on them.
+'''
+import cProfile as _cProfile
+import errno as _errno
+import os as _os
+import random as _random
+import re as _re
+import time as _time
+
+
+class Profiler(object):
+
+    def __init__(self, directory, sample_rate=0.0):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError('sample_rate must be between 0 and 1')
+        self.directory = directory
+        self.sample_rate = sample_rate
+
+    def wanted(self, ctx):
+        ''' Returns whether the call ctx is for should be profiled. '''
+        rpc_context = ctx.get('rpc_context')
+        if isinstance(rpc_context, dict) and rpc_context.get('profile'):
+            return True
+        return self.sample_rate > 0 and _random.random() < self.sample_rate
+
+    def wrap(self, ctx, func):
+        ''' Returns func made to run under the profiler, for the call ctx. '''
+        def profiled(*args, **kwargs):
+            return self.run(ctx, func, *args, **kwargs)
+        return profiled
+
+    def run(self, ctx, func, *args, **kwargs):
+        ''' Calls func under the profiler, writing the profile even if it raises. '''
+        profile = _cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # python 3.12 and later allow one profiler at a time
+            ctx.log_info('not profiled: another call is being profiled')
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._dump(ctx, profile)
+
+    def _path(self, ctx):
+        name = '{}-{}-{}-{}.prof'.format(ctx.get('method'), ctx.get('call_id'),
+                                         _os.getpid(), int(_time.time()))
+        # the call id is whatever the client sent
+        return _os.path.join(self.directory, _re.sub(r'[^\w.-]', '_', name))
+
+    def _dump(self, ctx, profile):
+        path = self._path(ctx)
+        try:
+            try:
+                _os.makedirs(self.directory)
+            except OSError as e:
+                if e.errno != _errno.EEXIST:
+                    raise
+            profile.dump_stats(path)
+        except (IOError, OSError) as e:
+            # a lost profile mustn't fail the call
+            ctx.log_err('could not write profile {}: {}'.format(path, e))
+            return
+        ctx.log_info('profile written to ' + path)
@@ -0,0 +1,159 @@
+'''
+Resolves workspace refs to object info with get_object_info_new, caching
+the answers so that repeated requests for the same object don't each
+cost a workspace round trip.
+
+A numeric ws/obj/ver ref always names the same object, so its info is
+kept until the cache is full.  Any other ref (no version, or names) can
+move to a new version at any time and is only kept for ttl seconds.
+Refs missing from the cache are looked up together in one call, and a
+thread asking for a ref that another thread is already looking up waits
+for that answer instead of making a second call.
+'''
+import re as _re
+import threading as _threading
+import time as _time
+from collections import OrderedDict as _OrderedDict
+
+_VERSIONED = _re.compile(r'^\d+/\d+/\d+$')
+
+
+def versioned_ref(info):
+    ''' Returns the ws/obj/ver ref of an object info tuple. '''
+    return str(info[6]) + '/' + str(info[0]) + '/' + str(info[4])
+
+
+def is_versioned(ref):
+    return _VERSIONED.match(ref) is not None
+
+
+class _Lookup(object):
+    ''' A lookup in progress, which other threads can wait on. '''
+
+    def __init__(self):
+        self.done = _threading.Event()
+        self.info = None
+        self.error = None
+
+
+class RefResolver(object):
+    '''
+    get_ws returns the Workspace client to use; it is called once, on
+    first use.
+    '''
+
+    def __init__(self, get_ws, ttl=60, max_entries=100000):
+        self._get_ws = get_ws
+        self._ws = None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = _threading.Lock()
+        self._cache = _OrderedDict()
+        self._in_flight = {}
+        self._counts = {'hits': 0, 'misses': 0, 'shared': 0, 'calls': 0}
+
+    def _workspace(self):
+        if self._ws is None:
+            self._ws = self._get_ws()
+        return self._ws
+
+    def _cached(self, ref, now):
+        entry = self._cache.get(ref)
+        if entry is None:
+            return None
+        info, expires = entry
+        if expires is not None and expires < now:
+            del self._cache[ref]
+            return None
+        # move to the end, so the front holds the least recently used
+        del self._cache[ref]
+        self._cache[ref] = entry
+        return info
+
+    def _store(self, ref, info, now):
+        self._cache.pop(ref, None)
+        self._cache[ref] = (info, None if is_versioned(ref) else now + self.ttl)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def get_info(self, refs, fresh=False, ignore_errors=False):
+        '''
+        Returns the object info of each ref, in order.  fresh skips the
+        cache, e.g. to see a version that was just saved.  With
+        ignore_errors, a ref that doesn't resolve gives None instead of
+        failing the call; None is never cached.
+        '''
+        now = _time.time()
+        results = [None] * len(refs)
+        mine = _OrderedDict()
+        theirs = {}
+        with self._lock:
+            for i, ref in enumerate(refs):
+                info = None if fresh else self._cached(ref, now)
+                if info is not None:
+                    self._counts['hits'] += 1
+                    results[i] = info
+                elif ref in mine:
+                    results[i] = mine[ref]
+                elif not fresh and ref in self._in_flight:
+                    self._counts['shared'] += 1
+                    theirs[i] = self._in_flight[ref]
+                else:
+                    self._counts['misses'] += 1
+                    mine[ref] = _Lookup()
+                    if not fresh:
+                        self._in_flight[ref] = mine[ref]
+            if mine:
+                self._counts['calls'] += 1
+
+        if mine:
+            self._fetch(mine, ignore_errors)
+            for lookup in mine.values():
+                if lookup.error is not None:
+                    raise lookup.error
+            for i, ref in enumerate(refs):
+                if ref in mine:
+                    results[i] = mine[ref].info
+
+        for i, lookup in theirs.items():
+            lookup.done.wait()
+            if lookup.error is not None or (lookup.info is None and not ignore_errors):
+                # the other lookup failed, maybe on another ref in its batch, or ignored an
+                # error that this caller wants raised, so look this one up on its own
+                results[i] = self.get_info([refs[i]], True, ignore_errors)[0]
+            else:
+                results[i] = lookup.info
+        return [list(info) if info is not None else None for info in results]
+
+    def _fetch(self, lookups, ignore_errors):
+        refs = list(lookups)
+        try:
+            infos = self._workspace().get_object_info_new({
+                'objects': [{'ref': r} for r in refs],
+                'includeMetadata': 0,
+                'ignoreErrors': 1 if ignore_errors else 0})
+        except Exception as e:
+            infos = None
+            for lookup in lookups.values():
+                lookup.error = e
+        now = _time.time()
+        with self._lock:
+            for i, ref in enumerate(refs):
+                lookup = lookups[ref]
+                if infos is not None:
+                    lookup.info = infos[i]
+                    if infos[i] is not None:
+                        self._store(ref, infos[i], now)
+                        self._store(versioned_ref(infos[i]), infos[i], now)
+                if self._in_flight.get(ref) is lookup:
+                    del self._in_flight[ref]
+                lookup.done.set()
+
+    def stats(self):
+        ''' Returns the hit and miss counts, the number of workspace calls and the cache size. '''
+        with self._lock:
+            stats = dict(self._counts)
+            stats['entries'] = len(self._cache)
+        lookups = stats['hits'] + stats['misses'] + stats['shared']
+        stats['hit_rate'] = float(stats['hits']) / lookups if lookups else 0.0
+        return stats
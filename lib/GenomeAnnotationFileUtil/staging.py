@@ -0,0 +1,114 @@
+'''
+Puts a caller's input file into a staging directory without copying its
+bytes when the filesystem allows it.
+
+The strategies are tried in order:
+    hardlink      - a second name for the same inode, free on the same
+                    filesystem
+    reflink       - a copy-on-write clone (btrfs, xfs, ...), free until one
+                    side is written
+    read_in_place - a symbolic link, so the original is read where it is
+    copy          - a full copy, the only one that always works
+
+None of them moves, renames or writes to the source file; the staged path
+must only ever be read or unlinked.
+'''
+import errno as _errno
+import os as _os
+import shutil as _shutil
+import sys as _sys
+
+HARDLINK = 'hardlink'
+REFLINK = 'reflink'
+READ_IN_PLACE = 'read_in_place'
+COPY = 'copy'
+
+STRATEGIES = (HARDLINK, REFLINK, READ_IN_PLACE, COPY)
+
+# from linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def parse_strategies(text):
+    ''' Parses a comma separated strategy list, e.g. from deploy.cfg. '''
+    strategies = tuple(s.strip() for s in text.split(',') if s.strip())
+    for s in strategies:
+        if s not in STRATEGIES:
+            raise ValueError('Unknown staging strategy: ' + s)
+    if not strategies:
+        raise ValueError('At least one staging strategy is required')
+    return strategies
+
+
+def _hardlink(src, dest):
+    _os.link(src, dest)
+
+
+def _reflink(src, dest):
+    if not _sys.platform.startswith('linux'):
+        raise OSError(_errno.EOPNOTSUPP, 'reflink is only supported on linux')
+    import fcntl
+    with open(src, 'rb') as fin:
+        fd = _os.open(dest, _os.O_WRONLY | _os.O_CREAT | _os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(fd, _FICLONE, fin.fileno())
+        except (IOError, OSError):
+            _os.close(fd)
+            _os.remove(dest)
+            raise
+        _os.close(fd)
+
+
+def _read_in_place(src, dest):
+    _os.symlink(_os.path.abspath(src), dest)
+
+
+def _copy(src, dest):
+    _shutil.copy2(src, dest)
+
+
+_STAGERS = {HARDLINK: _hardlink,
+            REFLINK: _reflink,
+            READ_IN_PLACE: _read_in_place,
+            COPY: _copy}
+
+
+def stage_file(src, dest_dir, strategies=STRATEGIES, name=None):
+    '''
+    Makes src available as dest_dir/name (the source basename by default)
+    using the first strategy that works.  Returns the staged path and the
+    name of the strategy that was used.
+    '''
+    if not _os.path.isfile(src):
+        raise ValueError('Input file does not exist: ' + str(src))
+    dest = _os.path.join(dest_dir, name or _os.path.basename(src))
+    last_error = None
+    for strategy in strategies:
+        try:
+            _STAGERS[strategy](src, dest)
+            return dest, strategy
+        except (IOError, OSError) as e:
+            last_error = e
+    raise last_error
+
+
+def create_new_file(dest_dir, name):
+    '''
+    Opens a file that did not exist before in dest_dir for binary writing,
+    named name, or name with a number before its extension if that is
+    taken.  Returns its path and the open file.  An existing path, which
+    may be a staged file, is never opened.
+    '''
+    base, ext = _os.path.splitext(name)
+    n = 0
+    while True:
+        candidate = name if n == 0 else '{}.{}{}'.format(base, n, ext)
+        path = _os.path.join(dest_dir, candidate)
+        try:
+            fd = _os.open(path, _os.O_WRONLY | _os.O_CREAT | _os.O_EXCL, 0o644)
+        except OSError as e:
+            if e.errno != _errno.EEXIST:
+                raise
+            n += 1
+            continue
+        return path, _os.fdopen(fd, 'wb')
@@ -0,0 +1,90 @@
+'''
+Wall clock timings of the phases of a method call, e.g. staging the input,
+parsing it and saving it, so a slow call shows where its time went.
+
+    timer = PhaseTimer('genbank_to_genome_annotation')
+    with timer.phase('stage_input'):
+        ...
+    timer.log()         # one line: timings {"method": ..., "phases": {...}, ...}
+    timer.as_dict()     # {'stage_input': 1.2, ..., 'total': 3.4}
+
+A phase that runs more than once, or in several threads at the same
+time, adds up, so the phases of a mass call can add up to more than its
+total.
+
+A benchmark can have every phase measure more than time with add_probe;
+what the probes measure is logged with the timings.
+'''
+import json as _json
+import operator as _operator
+import threading as _threading
+import time as _time
+from contextlib import contextmanager as _contextmanager
+
+_probes = []
+
+
+def add_probe(name, start, stop, combine=_operator.add):
+    '''
+    Has every phase also record stop(start()) as name, e.g. the CPU time or
+    scratch space it took.  A phase that runs more than once keeps
+    combine(earlier, later).  Without probes a phase is only timed.
+    '''
+    _probes.append((name, start, stop, combine))
+
+
+def remove_probes():
+    del _probes[:]
+
+
+class PhaseTimer(object):
+
+    def __init__(self, method):
+        self.method = method
+        self._start = _time.time()
+        self._lock = _threading.Lock()
+        self._phases = {}
+        self._order = []
+        self._probed = {}
+
+    @_contextmanager
+    def phase(self, name):
+        ''' Times the with block as phase name, whether or not it raises. '''
+        probes = list(_probes)
+        states = [probe[1]() for probe in probes]
+        start = _time.time()
+        try:
+            yield
+        finally:
+            elapsed = _time.time() - start
+            measured = [(probe, probe[2](state)) for probe, state in zip(probes, states)]
+            with self._lock:
+                if name not in self._phases:
+                    self._order.append(name)
+                self._phases[name] = self._phases.get(name, 0.0) + elapsed
+                for (probe, _, _, combine), value in measured:
+                    values = self._probed.setdefault(probe, {})
+                    values[name] = combine(values[name], value) if name in values else value
+
+    def total(self):
+        return _time.time() - self._start
+
+    def as_dict(self):
+        ''' Returns the seconds spent in each phase, and in the whole call as total. '''
+        with self._lock:
+            timings = dict(self._phases)
+        timings['total'] = self.total()
+        return timings
+
+    def log(self):
+        ''' Prints the timings as one line of JSON, for the method's log. '''
+        with self._lock:
+            phases = [(name, round(self._phases[name], 3)) for name in self._order]
+            probed = dict((probe, dict(values)) for probe, values in self._probed.items())
+        timings = {'method': self.method,
+                   'phases': dict(phases),
+                   'order': [name for name, _ in phases],
+                   'total': round(self.total(), 3)}
+        if probed:
+            timings['probes'] = probed
+        print('timings ' + _json.dumps(timings, sort_keys=True))
@@ -0,0 +1,127 @@
+'''
+A local index of the GenBank uploads that have already been saved, so that
+a pipeline re-submitting the same bytes with the same parameters gets the
+existing GenomeAnnotation back instead of a second parse and save.
+
+Entries map (content hash, normalized parameters) to the saved reference.
+The index is a SQLite database in scratch; SQLite's file locking makes it
+safe to share between the uwsgi worker processes.  Once it holds more than
+max_entries the least recently used entries are dropped.
+'''
+import hashlib as _hashlib
+import json as _json
+import os as _os
+import sqlite3 as _sqlite3
+import time as _time
+
+# the parameters that change what gets saved; where the input came from does not
+KEY_PARAMS = ('workspace_name', 'genome_name', 'source', 'taxon_wsname',
+              'convert_to_legacy')
+
+_DEFAULTS = {'source': 'Genbank',
+             'taxon_wsname': 'ReferenceTaxons',
+             'convert_to_legacy': 0}
+
+_SCHEMA = '''CREATE TABLE IF NOT EXISTS uploads (
+                 content_hash TEXT NOT NULL,
+                 params TEXT NOT NULL,
+                 ref TEXT NOT NULL,
+                 created REAL NOT NULL,
+                 last_used REAL NOT NULL,
+                 PRIMARY KEY (content_hash, params))'''
+
+
+def normalize_params(params):
+    ''' Returns the upload parameters that matter, with defaults filled in, as a string. '''
+    return _json.dumps(dict((k, params.get(k, _DEFAULTS.get(k))) for k in KEY_PARAMS),
+                       sort_keys=True)
+
+
+def hash_files(paths, chunk_size=1 << 20):
+    '''
+    Returns the sha256 of a file, or for several files the sha256 of their
+    sorted digests, so neither file names nor listing order matter.
+    '''
+    digests = []
+    for path in paths:
+        h = _hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                h.update(chunk)
+        digests.append(h.hexdigest())
+    if len(digests) == 1:
+        return digests[0]
+    return _hashlib.sha256(','.join(sorted(digests)).encode('ascii')).hexdigest()
+
+
+class UploadIndex(object):
+    '''
+    (content hash, normalized parameters) -> saved GenomeAnnotation ref,
+    kept in the SQLite database at path.
+    '''
+
+    def __init__(self, path, max_entries=10000, timeout=30):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._created = False
+
+    def _connect(self):
+        # a connection per call, as sqlite3 connections can't be shared between threads
+        conn = _sqlite3.connect(self.path, timeout=self.timeout)
+        if not self._created:
+            with conn:
+                conn.execute(_SCHEMA)
+                conn.execute('CREATE INDEX IF NOT EXISTS uploads_last_used ON uploads (last_used)')
+            self._created = True
+        return conn
+
+    def lookup(self, content_hash, params):
+        ''' Returns the ref saved for this input, or None. '''
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute('SELECT ref FROM uploads WHERE content_hash = ? AND params = ?',
+                                   (content_hash, params)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('UPDATE uploads SET last_used = ? WHERE content_hash = ? AND params = ?',
+                             (_time.time(), content_hash, params))
+            return str(row[0])
+        finally:
+            conn.close()
+
+    def store(self, content_hash, params, ref):
+        ''' Records ref as the result of uploading this input, then evicts down to max_entries. '''
+        now = _time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)',
+                             (content_hash, params, ref, now, now))
+                conn.execute('DELETE FROM uploads WHERE rowid IN (SELECT rowid FROM uploads '
+                             'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+        finally:
+            conn.close()
+
+    def forget(self, content_hash, params):
+        ''' Drops an entry, e.g. because its object was deleted. '''
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM uploads WHERE content_hash = ? AND params = ?',
+                             (content_hash, params))
+        finally:
+            conn.close()
+
+    def __len__(self):
+        if not _os.path.exists(self.path):
+            return 0
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM uploads').fetchone()[0]
+        finally:
+            conn.close()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from genbank_generator import write_genbank
+from kbase_standins import KBaseStandins
+
+try:
+    from GenomeAnnotationFileUtil.GenomeAnnotationFileUtilImpl import GenomeAnnotationFileUtil
+except ImportError:
+    # the Impl needs the KBase libraries and the transform scripts, as in the docker image
+    GenomeAnnotationFileUtil = None
+
+
+@unittest.skipIf(GenomeAnnotationFileUtil is None, "needs the Impl's dependencies")
+class GenomeAnnotationFileUtilOfflineTest(unittest.TestCase):
+    ''' The Impl against in-process stand-ins for the KBase services. '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.standins = KBaseStandins().start()
+        os.environ['SDK_CALLBACK_URL'] = cls.standins.callback_url
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.standins.stop()
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.impl = GenomeAnnotationFileUtil(self.standins.config(self.scratch))
+        self.ctx = {'token': 'a-token', 'user_id': 'tester', 'authenticated': 1,
+                    'provenance': [{'service': 'GenomeAnnotationFileUtil',
+                                    'method': 'offline_test', 'method_params': []}]}
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def scratch_dirs(self, prefix):
+        return [f for f in os.listdir(self.scratch) if f.startswith(prefix)]
+
+    def upload_synthetic(self, name):
+        ''' Uploads a small synthetic genome and returns its ref. '''
+        path = os.path.join(self.scratch, name + '.gbff')
+        write_genbank(path, contigs=2, bases=20000)
+        return self.impl.genbank_to_genome_annotation(self.ctx, {
+            'file_path': path, 'workspace_name': 'offline',
+            'genome_name': name})[0]['genome_annotation_ref']
+
+    def save_broken(self):
+        ''' Saves a GenomeAnnotation the data api can't write out and returns its ref. '''
+        info = self.standins.workspace._save('offline', 'broken',
+                                             'KBaseGenomeAnnotations.GenomeAnnotation-3.1', {})
+        return '{}/{}/{}'.format(info[6], info[0], info[4])
+
+    def test_mass_upload_bad_items(self):
+        results = self.impl.genbank_to_genome_annotation_mass(self.ctx, [
+            'not a structure',
+            None,
+            {'workspace_name': 'offline', 'genome_name': 'missing',
+             'file_path': os.path.join(self.scratch, 'does_not_exist.gbk')},
+            {'genome_name': 'no_workspace'}])[0]
+        self.assertEqual((results['succeeded'], results['failed']), (0, 4))
+        errors = [d['error'] for d in results['details']]
+        self.assertIn('must be a structure', errors[0])
+        self.assertIn('must be a structure', errors[1])
+        self.assertIn('workspace_name', errors[3])
+        # every failed upload cleaned up after itself
+        self.assertEqual(self.scratch_dirs('genome-upload-staging-'), [])
+
+    def test_failed_exports_leave_no_directories(self):
+        ref = self.save_broken()
+        with self.assertRaises(Exception):
+            self.impl.export_genome_annotation_as_genbank(self.ctx, {'input_ref': ref})
+        with self.assertRaises(Exception):
+            self.impl.genome_annotation_to_genbank(self.ctx, {'genome_ref': ref})
+        self.assertEqual(self.scratch_dirs('genome-export-'), [])
+        self.assertEqual(self.scratch_dirs('genome-download-'), [])
+
+    def test_failed_mass_download_removes_finished_files(self):
+        good = self.upload_synthetic('good')
+        with self.assertRaises(Exception):
+            self.impl.genome_annotation_to_genbank_mass(self.ctx, {
+                'genome_refs': [good, self.save_broken(), good], 'parallelism': 3})
+        self.assertEqual(self.scratch_dirs('genome-download-'), [])
+        files = self.impl.genome_annotation_to_genbank_mass(self.ctx, {
+            'genome_refs': [good]})[0]['files']
+        self.assertTrue(os.path.isfile(files[0]['path']))
@@ -130,6 +130,49 @@ class GenomeAnnotationFileUtilTest(unittest.TestCase):
 #        pprint(result2)
 
 
+    def test_mass_upload(self):
+        genomeFileUtil = self.getImpl()
+        gbk_path = self.getTempGenbank()
+        print('attempting mass upload with one good and one missing file')
+        result = genomeFileUtil.genbank_to_genome_annotation_mass(self.getContext(),
+            [
+                {
+                    'file_path':gbk_path,
+                    'workspace_name':self.getWsName(),
+                    'genome_name':'MyMassGenome'
+                },
+                {
+                    'file_path':gbk_path + '.does_not_exist',
+                    'workspace_name':self.getWsName(),
+                    'genome_name':'MyMissingGenome'
+                }
+            ])[0];
+        pprint(result)
+        self.assertEqual(result['succeeded'], 1)
+        self.assertEqual(result['failed'], 1)
+        self.assertIn('genome_annotation_ref', result['details'][0])
+        self.assertIn('error', result['details'][1])
+
+
+    def test_dedup_upload(self):
+        genomeFileUtil = self.getImpl()
+        gbk_path = self.getTempGenbank()
+        params = {
+                'file_path':gbk_path,
+                'workspace_name':self.getWsName(),
+                'genome_name':'MyDedupGenome',
+                'dedup':1
+            }
+        print('attempting the same upload twice with dedup on')
+        first = genomeFileUtil.genbank_to_genome_annotation(self.getContext(), params)[0]
+        second = genomeFileUtil.genbank_to_genome_annotation(self.getContext(), params)[0]
+        self.assertEqual(first['genome_annotation_ref'], second['genome_annotation_ref'])
+        # without dedup the same input is saved again as a new version
+        del params['dedup']
+        third = genomeFileUtil.genbank_to_genome_annotation(self.getContext(), params)[0]
+        self.assertNotEqual(first['genome_annotation_ref'], third['genome_annotation_ref'])
+
+
     def test_simple_download(self):
         genomeFileUtil = self.getImpl()
 
@@ -172,6 +215,30 @@ class GenomeAnnotationFileUtilTest(unittest.TestCase):
                 'input_ref':self.getWsName()+'/'+ws_obj_name
             });
         pprint(exportResult)
+        # exporting the same object again used to collide on the package directory
+        exportResult2 = genomeFileUtil.export_genome_annotation_as_genbank(self.getContext(),
+            {
+                'input_ref':self.getWsName()+'/'+ws_obj_name
+            })[0];
+        self.assertNotEqual(exportResult[0]['shock_id'], exportResult2['shock_id'])
+
+        print('Download several genomes at once')
+        massResult = genomeFileUtil.genome_annotation_to_genbank_mass(self.getContext(),
+            {
+                'genome_refs':[result['genome_annotation_ref'],
+                               self.getWsName()+'/'+ws_obj_name],
+                'parallelism':2
+            })[0];
+        pprint(massResult)
+        self.assertEqual(len(massResult['files']), 2)
+        for f in massResult['files']:
+            self.assertTrue(os.path.isfile(f['path']))
+
+        # the same version was exported above, so with the export cache on these were hits
+        status = genomeFileUtil.status(self.getContext())[0]
+        pprint(status)
+        if 'export_cache' in status:
+            self.assertGreater(status['export_cache']['hits'], 0)
 
         # download from the old type -- seems like this should work, but fails with error:
         # Traceback (most recent call last):
@@ -0,0 +1,129 @@
+import unittest
+import json
+import socket
+import sys
+import threading
+import time
+
+from jsonrpc_standin import StandinServer
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from GenomeAnnotationFileUtil.GenomeAnnotationFileUtilAsyncClient import GenomeAnnotationFileUtil
+    from DataFileUtil.DataFileUtilAsyncClient import DataFileUtil
+    from DataFileUtil.baseclient import ServerError
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'the async clients need python 3.5')
+class AsyncClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.checks = {}
+        self.server = StandinServer({
+            'GenomeAnnotationFileUtil.genome_annotation_to_genbank': self.export,
+            'DataFileUtil._shock_to_file_submit': lambda params: ['job-' + params[0]['shock_id']],
+            'DataFileUtil._check_job': self.check_job}).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_async(self, client, make_awaitable):
+        # (no async def here, so this file still imports on python 2)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(make_awaitable())
+        finally:
+            client.close()
+            # let the closed connections finish closing
+            loop.run_until_complete(asyncio.sleep(0))
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def export(self, params):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        return [{'path': '/tmp/' + params[0]['genome_ref'] + '.gbk'}]
+
+    def check_job(self, params):
+        # finished on the third check; shock node 'bad' fails
+        job_id = params[0]
+        with self.lock:
+            self.checks[job_id] = self.checks.get(job_id, 0) + 1
+            finished = self.checks[job_id] >= 3
+        if finished and job_id == 'job-bad':
+            return [{'finished': 1, 'error': {'name': 'JobError', 'code': -32000,
+                                              'message': 'no such node', 'error': ''}}]
+        return [{'finished': 1 if finished else 0,
+                 'result': [{'node_file_name': job_id + '.gbk'}]}]
+
+    def test_bounded_concurrency(self):
+        client = GenomeAnnotationFileUtil(self.server.url, token='a-token', max_concurrency=4)
+        results = self.run_async(client, lambda: asyncio.gather(
+            *[client.genome_annotation_to_genbank({'genome_ref': str(i)}) for i in range(40)]))
+        self.assertEqual([r['path'] for r in results],
+                         ['/tmp/{}.gbk'.format(i) for i in range(40)])
+        self.assertLessEqual(self.most_in_flight, 4)
+        self.assertGreater(self.most_in_flight, 1)
+        self.assertLessEqual(self.server.connections, 4)
+
+    def test_run_job(self):
+        client = DataFileUtil(self.server.url, token='a-token', async_job_check_time_ms=10)
+        results = self.run_async(client, lambda: asyncio.gather(
+            *[client.shock_to_file({'shock_id': str(i)}) for i in range(20)]))
+        self.assertEqual([r['node_file_name'] for r in results],
+                         ['job-{}.gbk'.format(i) for i in range(20)])
+        with self.assertRaises(ServerError):
+            self.run_async(client, lambda: client.shock_to_file({'shock_id': 'bad'}))
+
+    def test_written_calls_are_not_resent(self):
+        # answers the first call on a connection and hangs up on the next, having read it
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(5)
+        requests = []
+
+        def serve():
+            conn, _ = listener.accept()
+            reader = conn.makefile('rb')
+            for answer in (True, False):
+                length = 0
+                for line in iter(reader.readline, b'\r\n'):
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':')[1])
+                requests.append(reader.read(length))
+                if answer:
+                    body = json.dumps({'version': '1.1', 'result': [{'path': 'p'}]}).encode()
+                    conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                                 b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' +
+                                 body)
+            reader.close()
+            conn.close()
+        server = threading.Thread(target=serve)
+        server.daemon = True
+        server.start()
+        url = 'http://127.0.0.1:{}'.format(listener.getsockname()[1])
+        client = GenomeAnnotationFileUtil(url, token='a-token', timeout=5)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            # one after the other, so the second reuses the first's connection
+            self.assertEqual(loop.run_until_complete(
+                client.genome_annotation_to_genbank({'genome_ref': '1'})), {'path': 'p'})
+            with self.assertRaises(ConnectionError):
+                loop.run_until_complete(client.genome_annotation_to_genbank({'genome_ref': '2'}))
+        finally:
+            client.close()
+            loop.run_until_complete(asyncio.sleep(0))
+            asyncio.set_event_loop(None)
+            loop.close()
+            server.join(5)
+            listener.close()
+        self.assertEqual(len(requests), 2)
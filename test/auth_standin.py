@@ -0,0 +1,84 @@
+'''
+A local stand-in for the KBase auth service's Sessions/Login endpoint,
+for tests and benchmarks of authclient.KBaseAuth.
+
+tokens maps each valid token to its user; any other token is rejected
+with a 401.  delay seconds are spent on every call, and the calls are
+counted.
+'''
+from __future__ import print_function
+
+import json
+import socket
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # py3
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # py2
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.calls += 1
+        body = self.rfile.read(int(self.headers['content-length']))
+        token = parse_qs(body.decode('utf-8')).get('token', [None])[0]
+        time.sleep(self.server.delay)
+        user = self.server.tokens.get(token)
+        if user is None:
+            status, resp = 401, {'error_msg': 'LoginFailure: Invalid token'}
+        else:
+            status, resp = 200, {'user_id': user}
+        out = json.dumps(resp).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+class AuthStandin(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, tokens, delay=0):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.tokens = tokens
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.connections = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/Sessions/Login'.format(self.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self.shutdown()
+        self.server_close()
+        self._thread = None
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+import threading
+import time
+
+from GenomeAnnotationFileUtil import authclient
+from auth_standin import AuthStandin
+
+
+class TokenCacheTest(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = authclient.TokenCache(maxsize=3)
+        for t in ('a', 'b', 'c'):
+            cache.add_valid_token(t, 'user-' + t)
+        self.assertEqual(cache.get_user('a'), 'user-a')
+        cache.add_valid_token('d', 'user-d')
+        # b was the least recently used
+        self.assertIsNone(cache.get_user('b'))
+        self.assertEqual([cache.get_user(t) for t in ('a', 'c', 'd')],
+                         ['user-a', 'user-c', 'user-d'])
+
+    def test_expiry(self):
+        cache = authclient.TokenCache()
+        cache._MAX_TIME_SEC = 0.1
+        cache.add_valid_token('a', 'user-a')
+        cache.add_invalid_token('b', 'rejected')
+        self.assertEqual(cache.get('a'), ('user-a', None))
+        self.assertEqual(cache.get('b'), (None, 'rejected'))
+        time.sleep(0.2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), (None, 'rejected'))
+
+
+class SharedTokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'tokens')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_shared_between_processes(self):
+        cache = authclient.SharedTokenCache(self.path)
+        cache.add_valid_token('a', 'user-a')
+        # a worker forked after the cache was used adds a token of its own
+        worker = multiprocessing.Process(target=cache.add_invalid_token,
+                                         args=('b', u'rejected \u2713'))
+        worker.start()
+        worker.join()
+        other = authclient.SharedTokenCache(self.path)
+        self.assertEqual(other.get('a'), ('user-a', None))
+        self.assertEqual(other.get('b'), (None, u'rejected \u2713'))
+        self.assertIsNone(other.get('c'))
+        # only the hash of a token is written
+        cache.add_valid_token('secret-token', 'user-s')
+        with open(self.path, 'rb') as f:
+            self.assertNotIn(b'secret-token', f.read())
+
+    def test_full_cache_keeps_recent_tokens(self):
+        cache = authclient.SharedTokenCache(self.path, maxsize=100)
+        for i in range(1000):
+            cache.add_valid_token('token-{}'.format(i), 'user')
+            # the first token is kept in use
+            self.assertEqual(cache.get_user('token-0'), 'user')
+        kept = sum(1 for i in range(1000) if cache.get_user('token-{}'.format(i)))
+        self.assertGreater(kept, 100)
+        self.assertLessEqual(kept, 200)
+
+    def test_expiry(self):
+        cache = authclient.SharedTokenCache(self.path)
+        cache._MAX_TIME_SEC = 0.1
+        cache.add_valid_token('a', 'user-a')
+        time.sleep(0.2)
+        self.assertIsNone(cache.get_user('a'))
+
+
+class KBaseAuthTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = AuthStandin({'good': 'alice'}, delay=0.2).start()
+        self.auth = authclient.KBaseAuth(self.server.url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_concurrent_validations_share_one_call(self):
+        users = []
+
+        def validate():
+            users.append(self.auth.get_user('good'))
+        threads = [threading.Thread(target=validate) for _ in range(25)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(users, ['alice'] * 25)
+        self.assertEqual(self.server.calls, 1)
+        self.assertEqual(self.auth.get_user('good'), 'alice')
+        self.assertEqual(self.server.calls, 1)
+
+    def test_rejected_tokens_are_cached(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError) as cm:
+                self.auth.get_user('bad')
+            self.assertIn('Invalid token', str(cm.exception))
+        self.assertEqual(self.server.calls, 1)
+        self.assertEqual(self.server.connections, 1)
+
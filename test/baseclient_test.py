@@ -0,0 +1,174 @@
+import unittest
+import threading
+import time
+
+from GenomeAnnotationFileUtil import baseclient
+from jsonrpc_standin import StandinServer
+
+
+class BaseClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandinServer({'Echo.echo': lambda params: params}).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def client(self, **kwargs):
+        return baseclient.BaseClient(self.server.url, token='a-token', **kwargs)
+
+    def test_connections_are_reused(self):
+        client = self.client()
+        for i in range(20):
+            self.assertEqual(client.call_method('Echo.echo', [i]), i)
+        # a second client with the same pool size shares the connections too
+        self.assertEqual(self.client().call_method('Echo.echo', ['x']), 'x')
+        self.assertEqual(self.server.requests, 21)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_threads_are_bounded_by_the_pool(self):
+        client = self.client(pool_size=2)
+        errors = []
+
+        def call():
+            try:
+                for i in range(10):
+                    client.call_method('Echo.echo', [i])
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.server.requests, 60)
+        # surplus connections are closed after use rather than kept; what's
+        # reused is bounded by the pool, not opened once per call
+        self.assertLess(self.server.connections, 60)
+
+    def test_service_urls_are_cached(self):
+        baseclient.clear_service_url_cache()
+        target = {'url': self.server.url}
+        wizard = StandinServer({
+            'ServiceWizard.get_service_status': lambda params: [dict(target)]}).start()
+        try:
+            client = baseclient.BaseClient(wizard.url, token='a-token', lookup_url=True)
+            before = baseclient.service_url_cache_stats()
+            for i in range(5):
+                self.assertEqual(client.call_method('Echo.echo', [i], service_ver='dev'), i)
+            self.assertEqual(wizard.requests, 1)
+            # another version is another service
+            client.call_method('Echo.echo', [0], service_ver='beta')
+            self.assertEqual(wizard.requests, 2)
+
+            # the service moves: the call to the old URL fails and drops it, and the next
+            # call looks the service up again
+            self.server.stop()
+            self.server = StandinServer({'Echo.echo': lambda params: ['moved']}).start()
+            target['url'] = self.server.url
+            with self.assertRaises(Exception):
+                client.call_method('Echo.echo', [0], service_ver='dev')
+            self.assertEqual(client.call_method('Echo.echo', [0], service_ver='dev'), 'moved')
+            stats = baseclient.service_url_cache_stats()
+            self.assertEqual(stats['hits'] - before['hits'], 5)
+            self.assertEqual(stats['misses'] - before['misses'], 3)
+            self.assertEqual(stats['invalidations'] - before['invalidations'], 1)
+        finally:
+            wizard.stop()
+
+    def test_server_error(self):
+        with self.assertRaises(baseclient.ServerError):
+            self.client().call_method('Echo.missing', [])
+        with self.assertRaises(ValueError):
+            baseclient.set_default_pool_size(0)
+
+    def test_batch(self):
+        client = self.client()
+        with client.batch() as batch:
+            calls = [batch.call_method('Echo.echo', [i]) for i in range(10)]
+            missing = batch.call_method('Echo.missing', [])
+            self.assertFalse(calls[0].done())
+        self.assertEqual([c.result() for c in calls], list(range(10)))
+        self.assertEqual(self.server.requests, 1)
+        # one failed call doesn't fail the others
+        self.assertEqual(missing.exception().name, 'JSONRPCError')
+        with self.assertRaises(baseclient.ServerError):
+            missing.result()
+
+        # if the request fails, every call in it fails
+        self.server.stop()
+        batch = client.batch()
+        calls = [batch.call_method('Echo.echo', [i]) for i in range(2)]
+        batch.send()
+        self.assertIsNotNone(calls[0].exception())
+        self.assertIs(calls[0].exception(), calls[1].exception())
+
+
+class JobSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.checks = {}
+        self.server = StandinServer({
+            'Jobs._work_submit': lambda params: ['job-{}'.format(params[0])],
+            'Jobs._check_job': self.check_job}).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def check_job(self, params):
+        # job-N finishes on its Nth check; job-fail fails on its first
+        job_id = params[0]
+        if job_id == 'job-fail':
+            return [{'finished': 1, 'error': {'name': 'JobError', 'code': -1,
+                                              'message': 'it broke', 'error': ''}}]
+        if job_id == 'job-garbled':
+            return [{'state': 'no idea'}]
+        with self.lock:
+            self.checks[job_id] = self.checks.get(job_id, 0) + 1
+            finished = self.checks[job_id] >= int(job_id.split('-')[1])
+        return [{'finished': 1 if finished else 0, 'result': [job_id]}]
+
+    def test_many_jobs_one_poller(self):
+        client = baseclient.BaseClient(self.server.url, token='a-token',
+                                       async_job_check_time_ms=10)
+        start = time.time()
+        futures = [client.submit_job('Jobs.work', [n]) for n in range(1, 9)]
+        pollers = [t for t in threading.enumerate() if t.name == 'JobScheduler']
+        self.assertEqual(len(pollers), 1)
+        self.assertEqual([f.result(10) for f in futures],
+                         ['job-{}'.format(n) for n in range(1, 9)])
+        self.assertEqual(self.checks['job-5'], 5)
+        # the eighth check comes about 0.5 s in, with the wait growing 1.5x from 10 ms
+        self.assertLess(time.time() - start, 3)
+        self.assertEqual(client.run_job('Jobs.work', [1]), 'job-1')
+
+    def test_job_errors(self):
+        client = baseclient.BaseClient(self.server.url, token='a-token',
+                                       async_job_check_time_ms=10)
+        future = client.submit_job('Jobs.work', ['fail'])
+        self.assertIsInstance(future.exception(5), baseclient.ServerError)
+        with self.assertRaises(baseclient.ServerError):
+            client.run_job('Jobs.work', ['fail'])
+        self.assertTrue(future.done())
+
+    def test_malformed_job_state(self):
+        client = baseclient.BaseClient(self.server.url, token='a-token',
+                                       async_job_check_time_ms=10)
+        future = client.submit_job('Jobs.work', ['garbled'])
+        self.assertIsInstance(future.exception(5), KeyError)
+        # the poller carries on for the jobs after it
+        self.assertEqual(client.submit_job('Jobs.work', [2]).result(5), 'job-2')
+
+    def test_run_job_timeout(self):
+        client = baseclient.BaseClient(self.server.url, token='a-token',
+                                       async_job_check_time_ms=10)
+        with self.assertRaises(baseclient.JobTimeoutError):
+            # finishes on its 1000th check
+            client.run_job('Jobs.work', [1000], timeout=0.3)
+        # the timed out job is no longer polled
+        checks = self.checks['job-1000']
+        time.sleep(0.3)
+        self.assertEqual(self.checks['job-1000'], checks)
+        self.assertEqual(client._job_scheduler._queue, [])
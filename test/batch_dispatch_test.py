@@ -0,0 +1,55 @@
+import sys
+import time
+import unittest
+
+JSONRPCServiceCustom = None
+if sys.version_info[0] == 2:
+    try:
+        from GenomeAnnotationFileUtil.GenomeAnnotationFileUtilServer import MethodContext
+        from GenomeAnnotationFileUtil.GenomeAnnotationFileUtilServer import JSONRPCServiceCustom
+    except ImportError:
+        # the server needs jsonrpcbase and the KBase libraries, as in the docker image
+        pass
+
+
+def _slow(ctx, n):
+    ctx['provenance'].append(n)
+    time.sleep(0.5)
+    return [n, ctx['provenance']]
+
+
+def _broken(ctx):
+    raise ValueError('broken')
+
+
+@unittest.skipIf(JSONRPCServiceCustom is None, "needs python 2 and the server's dependencies")
+class BatchDispatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = JSONRPCServiceCustom(batch_workers=4)
+        self.service.add(_slow, name='Test.slow', types=[int])
+        self.service.add(_broken, name='Test.broken')
+
+    def test_concurrent_batch(self):
+        batch = [{'method': 'Test.slow', 'params': [n], 'version': '1.1', 'id': str(n)}
+                 for n in range(4)]
+        batch.insert(2, {'method': 'Test.broken', 'params': [], 'version': '1.1', 'id': 'b'})
+        ctx = MethodContext(None)
+        ctx['provenance'] = []
+        start = time.time()
+        responds = self.service.call_py(ctx, batch)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertEqual([r['id'] for r in responds], ['0', '1', 'b', '2', '3'])
+        self.assertEqual(responds[2]['error']['name'], 'Server error')
+        # each member saw only its own copy of the context
+        self.assertEqual(responds[3]['result'], [2, [2]])
+        self.assertEqual(ctx['provenance'], [])
+
+    def test_one_worker_runs_members_in_turn(self):
+        service = JSONRPCServiceCustom()
+        service.add(_slow, name='Test.slow', types=[int])
+        ctx = MethodContext(None)
+        ctx['provenance'] = []
+        responds = service.call_py(ctx, [{'method': 'Test.slow', 'params': [n],
+                                          'version': '1.1', 'id': str(n)} for n in range(2)])
+        self.assertEqual([r['result'] for r in responds], [[0, [0]], [1, [1]]])
@@ -0,0 +1,77 @@
+'''
+Per-call overhead of the JSON-RPC BaseClient against a local stand-in
+service, with a new connection for every call (the old requests.post
+behaviour) and with the pooled keep-alive session.
+
+usage:
+    python client_pooling.py [--calls 2000] [--threads 1,5]
+'''
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, '..', '..', 'lib'))
+sys.path.insert(0, os.path.join(_HERE, '..'))
+
+import requests  # @IgnorePep8
+from GenomeAnnotationFileUtil import baseclient  # @IgnorePep8
+from jsonrpc_standin import StandinServer  # @IgnorePep8
+
+
+def run(url, calls, threads):
+    client = baseclient.BaseClient(url, token='benchmark-token')
+    per_thread = calls // threads
+
+    def work():
+        for i in range(per_thread):
+            client.call_method('Echo.echo', [{'i': i}])
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.time() - start, per_thread * threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--threads', default='1,5')
+    args = parser.parse_args()
+
+    server = StandinServer({'Echo.echo': lambda params: params}).start()
+    pooled_session = baseclient._get_session
+    results = []
+    try:
+        for threads in [int(t) for t in args.threads.split(',')]:
+            for mode in ('per-call', 'pooled'):
+                if mode == 'per-call':
+                    # requests.post makes and closes a session for every call
+                    baseclient._get_session = lambda pool_size: requests
+                else:
+                    baseclient._get_session = pooled_session
+                connections = server.connections
+                elapsed, calls = run(server.url, args.calls, threads)
+                results.append({'mode': mode, 'threads': threads, 'calls': calls,
+                                 'seconds': elapsed,
+                                 'us_per_call': elapsed / calls * 1e6,
+                                 'connections': server.connections - connections})
+    finally:
+        baseclient._get_session = pooled_session
+        server.stop()
+    for r in results:
+        print('{mode:>8} {threads:>2} threads: {us_per_call:8.1f} us/call, '
+              '{connections} connections for {calls} calls'.format(**r))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,434 @@
+'''
+End to end cost of genbank_to_genome_annotation,
+genome_annotation_to_genbank and export_genome_annotation_as_genbank,
+run offline against the in-process stand-ins of kbase_standins.
+
+For each method and for each phase the Impl times, the median over
+--repeat runs is kept of:
+    wall            seconds
+    cpu             seconds of CPU used by the whole process, stand-ins
+                    included, and by its finished child processes
+    peak_rss        bytes, sampled every --rss-interval seconds; for the
+                    whole call, the VmHWM the Impl logs
+    scratch_bytes   the most bytes in the scratch directory at the end of
+                    a phase
+The results are printed and written as JSON with --output.  With
+--baseline, the run is compared with an earlier one and any number that
+grew by more than --tolerance (and by more than a floor that ignores
+noise) is flagged as a regression; the exit status is then 1.  --compare
+compares two saved runs without running anything.
+
+The input is the E. coli GenBank file in test/data, or with
+--synthetic-size a file of about that size made by repeating its record,
+e.g. 5G for the peak memory of the upload of a multi-GB genome.
+Needs the module's run-time dependencies (biokbase, doekbase and the
+transform uploader), as in the module's docker image.
+
+usage:
+    python end_to_end.py [--synthetic-size 200M] [--repeat 3] [--output run.json]
+    python end_to_end.py --baseline base.json [--tolerance 0.2] [--output run.json]
+    python end_to_end.py --compare base.json run.json
+'''
+from __future__ import print_function
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from ConfigParser import RawConfigParser  # py2
+except ImportError:
+    from configparser import RawConfigParser  # py3
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, '..', '..', 'lib'))
+sys.path.insert(0, os.path.join(_HERE, '..'))
+
+from GenomeAnnotationFileUtil import memory_usage  # @IgnorePep8
+from GenomeAnnotationFileUtil import timings  # @IgnorePep8
+from kbase_standins import KBaseStandins  # @IgnorePep8
+
+METHODS = ('genbank_to_genome_annotation', 'genome_annotation_to_genbank',
+           'export_genome_annotation_as_genbank')
+
+ECOLI = os.path.join(_HERE, '..', 'data', 'GCF_000005845.2_ASM584v2_genomic.gbff.gz')
+# the export cache budget used when asked for, if deploy.cfg leaves the cache off
+EXPORT_CACHE_BYTES = 5 * 2 ** 30
+# smaller changes than these are noise, whatever the tolerance
+FLOORS = {'wall': 0.05, 'cpu': 0.05, 'peak_rss': 16 * 2 ** 20, 'scratch_bytes': 2 ** 20}
+
+
+def cpu_seconds():
+    t = os.times()
+    return t[0] + t[1] + t[2] + t[3]
+
+
+def scratch_bytes(directory):
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                # removed while walking
+                pass
+    return total
+
+
+class RssSampler(object):
+    ''' Keeps the highest RSS seen while each of its windows is open. '''
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.windows = {}
+        self.next_id = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+
+    def _sample(self):
+        rss = memory_usage.rss_bytes() or 0
+        with self.lock:
+            for window, peak in self.windows.items():
+                self.windows[window] = max(peak, rss)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def open(self):
+        with self.lock:
+            self.next_id += 1
+            self.windows[self.next_id] = memory_usage.rss_bytes() or 0
+            return self.next_id
+
+    def close(self, window):
+        self._sample()
+        with self.lock:
+            return self.windows.pop(window)
+
+
+class _Capture(object):
+    ''' Collects the timings and memory lines the Impl prints. '''
+
+    def __init__(self, out, echo):
+        self.out = out
+        self.echo = echo
+        self.lines = []
+        self.partial = ''
+
+    def write(self, text):
+        if self.echo:
+            self.out.write(text)
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()
+        self.lines += lines
+
+    def flush(self):
+        self.out.flush()
+
+    def logged(self, kind, method):
+        prefix = kind + ' '
+        for line in reversed(self.lines):
+            if line.startswith(prefix):
+                entry = json.loads(line[len(prefix):])
+                if entry['method'] == method:
+                    return entry
+        return None
+
+
+def measure(method, call, scratch, echo):
+    ''' Runs call() and returns its result and its numbers. '''
+    capture = _Capture(sys.stdout, echo)
+    real_stdout = sys.stdout
+    sys.stdout = capture
+    start, cpu = time.time(), cpu_seconds()
+    try:
+        result = call()
+    finally:
+        sys.stdout = real_stdout
+    numbers = {'wall': time.time() - start, 'cpu': cpu_seconds() - cpu}
+    logged_timings = capture.logged('timings', method) or {'phases': {}}
+    logged_memory = capture.logged('memory', method) or {}
+    numbers['peak_rss'] = logged_memory.get('peak_rss')
+    probed = logged_timings.get('probes', {})
+    numbers['phases'] = dict(
+        (phase, {'wall': wall,
+                 'cpu': probed.get('cpu', {}).get(phase),
+                 'peak_rss': probed.get('peak_rss', {}).get(phase),
+                 'scratch_bytes': probed.get('scratch_bytes', {}).get(phase)})
+        for phase, wall in logged_timings['phases'].items())
+    numbers['scratch_bytes'] = max(
+        [p['scratch_bytes'] for p in numbers['phases'].values()
+         if p['scratch_bytes'] is not None] or [scratch_bytes(scratch)])
+    return result, numbers
+
+
+def _median(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def summarize(runs):
+    ''' The median of each number over the runs of a method. '''
+    summary = {}
+    for metric in FLOORS:
+        summary[metric] = _median([r[metric] for r in runs])
+    phases = set(p for r in runs for p in r['phases'])
+    summary['phases'] = dict(
+        (phase, dict((metric, _median([r['phases'][phase][metric] for r in runs
+                                       if phase in r['phases']]))
+                     for metric in FLOORS))
+        for phase in phases)
+    return summary
+
+
+def compare(baseline, current, tolerance):
+    ''' Returns a row for every number of both runs, flagging regressions. '''
+    rows = []
+    for method in sorted(baseline['methods']):
+        if method not in current['methods']:
+            continue
+        base, cur = baseline['methods'][method], current['methods'][method]
+        pairs = [(method, base, cur)]
+        pairs += [('{} {}'.format(method, phase), base['phases'][phase], cur['phases'][phase])
+                  for phase in sorted(base['phases']) if phase in cur['phases']]
+        for name, b, c in pairs:
+            for metric in sorted(FLOORS):
+                if b.get(metric) is None or c.get(metric) is None:
+                    continue
+                regressed = (c[metric] - b[metric] > FLOORS[metric] and
+                             c[metric] > b[metric] * (1 + tolerance))
+                rows.append({'name': name, 'metric': metric, 'baseline': b[metric],
+                             'current': c[metric], 'regression': regressed})
+    return rows
+
+
+def print_comparison(rows):
+    for r in rows:
+        change = ''
+        if r['baseline']:
+            change = '{:+.0%}'.format(float(r['current']) / r['baseline'] - 1)
+        print('{flag} {name:>60} {metric:>13}: {baseline:>14.3f} -> {current:>14.3f} {change}'
+              .format(flag='!!' if r['regression'] else '  ', change=change, **r))
+    regressions = [r for r in rows if r['regression']]
+    print('{} regressions in {} numbers'.format(len(regressions), len(rows)))
+    return regressions
+
+
+def print_run(run):
+    for method in METHODS:
+        m = run['methods'].get(method)
+        if m is None:
+            continue
+        print('{}: {:.2f}s wall, {:.2f}s cpu, peak rss {} bytes, scratch {} bytes'.format(
+            method, m['wall'], m['cpu'], m['peak_rss'], m['scratch_bytes']))
+        for phase, p in sorted(m['phases'].items(), key=lambda item: -item[1]['wall']):
+            print('    {:>24}: {:8.3f}s wall, {} cpu, peak rss {}, scratch {}'.format(
+                phase, p['wall'], p['cpu'], p['peak_rss'], p['scratch_bytes']))
+
+
+def _parse_size(text):
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def write_synthetic(template, dest, size):
+    '''
+    Writes a multi-record file of roughly size bytes by repeating the
+    template record under new LOCUS names, one record at a time.
+    '''
+    with open(template, 'r') as f:
+        record = f.read()
+    first_line, rest = record.split('\n', 1)
+    name = first_line.split()[1]
+    written = 0
+    i = 0
+    with open(dest, 'w') as out:
+        while written < size:
+            new_name = 'SYN{:07d}'.format(i)
+            line = first_line.replace(name, new_name.ljust(len(name)), 1)
+            out.write(line + '\n')
+            out.write(rest)
+            written += len(line) + 1 + len(rest)
+            i += 1
+    return i
+
+
+def load_config(scratch, standins, keep_export_cache):
+    ''' deploy.cfg's settings, pointed at the stand-ins and scratch. '''
+    parser = RawConfigParser()
+    parser.read(os.path.join(_HERE, '..', '..', 'deploy.cfg'))
+    config = dict(parser.items('GenomeAnnotationFileUtil'))
+    config.update(standins.config(scratch))
+    config['metrics-directory'] = ''
+    config['profile-directory'] = ''
+    if not keep_export_cache:
+        # a repeat would be answered from the cache
+        config['export-cache-bytes'] = '0'
+    elif int(config.get('export-cache-bytes') or 0) <= 0:
+        config['export-cache-bytes'] = str(EXPORT_CACHE_BYTES)
+    return config
+
+
+class Bench(object):
+    '''
+    The Impl, running against the stand-ins with every phase probed.
+    Call close() when done.
+    '''
+
+    def __init__(self, work_dir, rss_interval=0.01, keep_export_cache=False, echo=False):
+        self.scratch = os.path.join(work_dir, 'scratch')
+        os.makedirs(self.scratch)
+        self.echo = echo
+        self.standins = KBaseStandins().start()
+        self.sampler = RssSampler(rss_interval).start()
+        timings.add_probe('cpu', cpu_seconds, lambda started: cpu_seconds() - started)
+        timings.add_probe('peak_rss', self.sampler.open, self.sampler.close, max)
+        timings.add_probe('scratch_bytes', lambda: None,
+                          lambda _: scratch_bytes(self.scratch), max)
+        try:
+            os.environ['SDK_CALLBACK_URL'] = self.standins.callback_url
+            from GenomeAnnotationFileUtil.GenomeAnnotationFileUtilImpl import \
+                GenomeAnnotationFileUtil
+            self.impl = GenomeAnnotationFileUtil(
+                load_config(self.scratch, self.standins, keep_export_cache))
+        except Exception:
+            self.close()
+            raise
+        self.ctx = {'token': 'benchmark-token', 'user_id': 'benchmark', 'authenticated': 1,
+                    'provenance': [{'service': 'GenomeAnnotationFileUtil',
+                                    'method': 'benchmark', 'method_params': []}]}
+
+    def close(self):
+        timings.remove_probes()
+        self.sampler.stop()
+        self.standins.stop()
+
+    def upload(self, path, genome_name):
+        ''' Returns the ref of the saved genome and the numbers of the upload. '''
+        details, numbers = measure(
+            METHODS[0], lambda: self.impl.genbank_to_genome_annotation(self.ctx, {
+                'file_path': path, 'workspace_name': 'benchmark',
+                'genome_name': genome_name, 'timings': 1})[0],
+            self.scratch, self.echo)
+        return details['genome_annotation_ref'], numbers
+
+    def download(self, ref):
+        genbank, numbers = measure(
+            METHODS[1], lambda: self.impl.genome_annotation_to_genbank(self.ctx, {
+                'genome_ref': ref, 'timings': 1})[0],
+            self.scratch, self.echo)
+        shutil.rmtree(os.path.dirname(genbank['path']))
+        return numbers
+
+    def export(self, ref):
+        return measure(
+            METHODS[2], lambda: self.impl.export_genome_annotation_as_genbank(self.ctx, {
+                'input_ref': ref, 'timings': 1})[0],
+            self.scratch, self.echo)[1]
+
+
+def run(args, input_path, work_dir):
+    bench = Bench(work_dir, args.rss_interval, args.keep_export_cache, args.verbose)
+    runs = dict((method, []) for method in METHODS)
+    try:
+        for i in range(args.repeat):
+            ref, numbers = bench.upload(input_path, 'genome_{}'.format(i))
+            runs[METHODS[0]].append(numbers)
+            runs[METHODS[1]].append(bench.download(ref))
+            runs[METHODS[2]].append(bench.export(ref))
+            print('run {} of {} done'.format(i + 1, args.repeat))
+    finally:
+        bench.close()
+    return dict((method, summarize(r)) for method, r in runs.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--input', default=ECOLI,
+                        help='GenBank file to upload, compressed or not')
+    parser.add_argument('--synthetic-size', default=None,
+                        help='upload a file of about this size made from the input instead')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--rss-interval', type=float, default=0.01)
+    parser.add_argument('--keep-export-cache', action='store_true',
+                        help="use the export cache, with deploy.cfg's budget or 5 GB if it has none")
+    parser.add_argument('--work-dir', default=None,
+                        help='where to make the scratch directory and inputs')
+    parser.add_argument('--output', help='write the results as JSON here')
+    parser.add_argument('--baseline', help='compare with the results in this file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='growth flagged as a regression, as a fraction')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two saved results and exit')
+    parser.add_argument('--verbose', action='store_true', help="show the Impl's output")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        sys.exit(1 if print_comparison(compare(baseline, current, args.tolerance)) else 0)
+
+    work_dir = tempfile.mkdtemp(dir=args.work_dir)
+    try:
+        input_path = args.input
+        if args.synthetic_size:
+            template = os.path.join(work_dir, 'template.gbff')
+            opener = gzip.open if input_path.endswith('.gz') else open
+            with opener(input_path, 'rb') as fin, open(template, 'wb') as fout:
+                shutil.copyfileobj(fin, fout)
+            input_path = os.path.join(work_dir, 'synthetic.gbff')
+            write_synthetic(template, input_path, _parse_size(args.synthetic_size))
+            os.remove(template)
+        result = {'meta': {'python': platform.python_version(),
+                           'host': platform.node(),
+                           'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()),
+                           'input': os.path.basename(args.input),
+                           'input_bytes': os.path.getsize(input_path),
+                           'synthetic_size': args.synthetic_size,
+                           'repeat': args.repeat},
+                  'methods': run(args, input_path, work_dir)}
+    finally:
+        shutil.rmtree(work_dir)
+
+    print_run(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if print_comparison(compare(baseline, result, args.tolerance)):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
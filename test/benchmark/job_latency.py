@@ -0,0 +1,111 @@
+'''
+Latency of a DataFileUtil call made as an SDK job against a local
+stand-in callback server whose jobs finish a few milliseconds after they
+are submitted.  Compares the old fixed 5 s sleep-then-check loop with the
+job scheduler, for one call at a time and for many jobs submitted
+together.
+
+usage:
+    python job_latency.py [--job-ms 10] [--calls 20] [--concurrent 200]
+'''
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, '..', '..', 'lib'))
+sys.path.insert(0, os.path.join(_HERE, '..'))
+
+from DataFileUtil.DataFileUtilClient import DataFileUtil  # @IgnorePep8
+from jsonrpc_standin import StandinServer  # @IgnorePep8
+
+
+class Callback(object):
+    ''' Jobs that finish job_ms after they were submitted. '''
+
+    def __init__(self, job_ms):
+        self.job_ms = job_ms
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.checks = 0
+
+    def submit(self, params):
+        with self.lock:
+            job_id = str(len(self.jobs))
+            self.jobs[job_id] = time.time() + self.job_ms / 1000.0
+        return [job_id]
+
+    def check(self, params):
+        with self.lock:
+            self.checks += 1
+            finished = time.time() >= self.jobs[params[0]]
+        return [{'finished': 1 if finished else 0,
+                 'result': [{'node_file_name': 'x.gbk'}]}]
+
+
+def old_shock_to_file(dfu, params):
+    # the loop the generated DataFileUtil client used to run
+    job_id = dfu._client._submit_job('DataFileUtil.shock_to_file', [params], dfu._service_ver)
+    while True:
+        time.sleep(dfu._client.async_job_check_time)
+        job_state = dfu._client._check_job('DataFileUtil', job_id)
+        if job_state['finished']:
+            return job_state['result'][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--job-ms', type=int, default=10)
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--old-calls', type=int, default=2)
+    parser.add_argument('--concurrent', type=int, default=200)
+    parser.add_argument('--first-check-ms', type=int, default=20)
+    args = parser.parse_args()
+
+    callback = Callback(args.job_ms)
+    server = StandinServer({'DataFileUtil._shock_to_file_submit': callback.submit,
+                            'DataFileUtil._check_job': callback.check}).start()
+    params = {'shock_id': 'node', 'file_path': '/tmp'}
+    results = []
+    try:
+        old = DataFileUtil(server.url, token='t', async_job_check_time_ms=5000)
+        start = time.time()
+        for _ in range(args.old_calls):
+            old_shock_to_file(old, params)
+        results.append({'mode': 'fixed 5 s poll', 'calls': args.old_calls,
+                        'ms_per_call': (time.time() - start) / args.old_calls * 1000})
+
+        new = DataFileUtil(server.url, token='t',
+                           async_job_check_time_ms=args.first_check_ms)
+        start = time.time()
+        for _ in range(args.calls):
+            new.shock_to_file(params)
+        results.append({'mode': 'scheduler, one at a time', 'calls': args.calls,
+                        'ms_per_call': (time.time() - start) / args.calls * 1000})
+
+        checks = callback.checks
+        start = time.time()
+        futures = [new._client.submit_job('DataFileUtil.shock_to_file', [params], 'dev')
+                   for _ in range(args.concurrent)]
+        for f in futures:
+            f.result()
+        elapsed = time.time() - start
+        results.append({'mode': 'scheduler, all submitted together',
+                        'calls': args.concurrent, 'wall_ms': elapsed * 1000,
+                        'ms_per_call': elapsed / args.concurrent * 1000,
+                        'checks_per_job': float(callback.checks - checks) / args.concurrent})
+    finally:
+        server.stop()
+    for r in results:
+        print('{mode:>34}: {ms_per_call:9.1f} ms/call over {calls} calls'.format(**r))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+'''
+How the cost of genbank_to_genome_annotation and
+genome_annotation_to_genbank grows with the shape of the genome, on
+synthetic GenBank files from genbank_generator, uploaded and downloaded
+offline against the stand-ins as in end_to_end.py.
+
+Each axis varies one thing from a 5 Mb genome of one contig:
+    contigs     1 to 100k contigs of 5 Mb in total
+    size        viral size (50 kb) up to 5 Gb of bases, a file of about
+                10 GB; contigs of at most 5 Mb
+    density     genes per kb
+    qualifiers  bytes of /note on every CDS
+Points over --max-bases bases are skipped, so the largest sizes have to
+be asked for.  For each point the wall and cpu seconds, peak RSS and most
+scratch bytes of each call are kept with the generated file's statistics,
+and are printed and written as JSON with --output.  The peak RSS includes
+the stand-ins, which hold the saved genome in the same process.
+
+With --plot-dir and matplotlib installed, the curves of each axis are
+drawn on log scales to <axis>.png; --plot replots a saved run.
+
+Needs the module's run-time dependencies, as in the module's docker image.
+
+usage:
+    python scaling_sweep.py [--axes contigs,size] [--max-bases 500M] [--output sweep.json]
+        [--plot-dir plots]
+    python scaling_sweep.py --plot sweep.json --plot-dir plots
+'''
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, '..'))
+
+from end_to_end import Bench, METHODS  # @IgnorePep8
+from genbank_generator import parse_size, write_genbank  # @IgnorePep8
+
+_CONTIG_BASES = 5000000
+
+# axis: (the generator argument varied, its values)
+AXES = {
+    'contigs': ('contigs', [1, 10, 100, 1000, 10000, 100000]),
+    'size': ('bases', [50000, 500000, 5000000, 50000000, 500000000, 5000000000]),
+    'density': ('genes_per_kb', [0.1, 0.3, 0.9, 1.8]),
+    'qualifiers': ('note_bytes', [0, 100, 1000, 10000]),
+}
+_AXIS_ORDER = ('contigs', 'size', 'density', 'qualifiers')
+
+
+def points(axis):
+    ''' Yields the generator arguments of each point of an axis. '''
+    name, values = AXES[axis]
+    for value in values:
+        shape = {'contigs': 1, 'bases': _CONTIG_BASES}
+        shape[name] = value
+        if axis == 'size':
+            # as a large genome comes, in chromosomes or scaffolds
+            shape['contigs'] = max(1, -(-value // _CONTIG_BASES))
+        if axis == 'density':
+            # room for the genes at the highest density
+            shape['gene_length'] = min(900, int(1000 / value) - 100)
+        yield value, shape
+
+
+def _call_numbers(numbers):
+    return dict((metric, numbers[metric])
+                for metric in ('wall', 'cpu', 'peak_rss', 'scratch_bytes'))
+
+
+def sweep(bench, axes, max_bases, work_dir):
+    results = dict((axis, []) for axis in axes)
+    for axis in axes:
+        for value, shape in points(axis):
+            if shape['bases'] > max_bases:
+                print('{} {}: skipped, over --max-bases'.format(axis, value))
+                continue
+            path = os.path.join(work_dir, 'sweep.gbff')
+            stats = write_genbank(path, **shape)
+            try:
+                ref, upload = bench.upload(path, 'sweep')
+                download = bench.download(ref)
+            finally:
+                os.remove(path)
+                # the stand-ins would otherwise hold every genome of the sweep
+                bench.standins.clear()
+            results[axis].append({'value': value, 'input': stats,
+                                  METHODS[0]: _call_numbers(upload),
+                                  METHODS[1]: _call_numbers(download)})
+            print('{} {}: {} bytes, upload {:.2f}s, download {:.2f}s'.format(
+                axis, value, stats['bytes'], upload['wall'], download['wall']))
+    return results
+
+
+def print_sweep(result):
+    for axis in _AXIS_ORDER:
+        if axis not in result['axes']:
+            continue
+        print('\n{} ({})'.format(axis, AXES[axis][0]))
+        print('{:>12} {:>14} {:>10} {:>10} {:>12} {:>10} {:>10} {:>12}'.format(
+            'value', 'input bytes', 'up wall', 'up cpu', 'up peak MB',
+            'down wall', 'down cpu', 'down peak MB'))
+        for p in result['axes'][axis]:
+            up, down = p[METHODS[0]], p[METHODS[1]]
+            print('{:>12} {:>14} {:>10.2f} {:>10.2f} {:>12} {:>10.2f} {:>10.2f} {:>12}'.format(
+                p['value'], p['input']['bytes'], up['wall'], up['cpu'],
+                (up['peak_rss'] or 0) // 2 ** 20, down['wall'], down['cpu'],
+                (down['peak_rss'] or 0) // 2 ** 20))
+
+
+def plot(result, plot_dir):
+    ''' Draws wall seconds and peak RSS against each axis; needs matplotlib. '''
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print('matplotlib is not installed, so no plots were drawn')
+        return
+    if not os.path.isdir(plot_dir):
+        os.makedirs(plot_dir)
+    for axis, runs in sorted(result['axes'].items()):
+        if not runs:
+            continue
+        fig, (wall, peak) = plt.subplots(1, 2, figsize=(11, 4.5))
+        values = [p['value'] for p in runs]
+        for method in METHODS[:2]:
+            wall.plot(values, [p[method]['wall'] for p in runs], marker='o', label=method)
+            peak.plot(values, [(p[method]['peak_rss'] or 0) / 2.0 ** 20 for p in runs],
+                      marker='o', label=method)
+        for ax, label in ((wall, 'wall seconds'), (peak, 'peak RSS MB')):
+            ax.set_xscale('symlog' if 0 in values else 'log')
+            ax.set_yscale('log')
+            ax.set_xlabel(AXES[axis][0])
+            ax.set_ylabel(label)
+            ax.grid(True, which='both', alpha=0.3)
+        wall.legend(fontsize='small')
+        fig.suptitle('{} axis'.format(axis))
+        fig.tight_layout()
+        path = os.path.join(plot_dir, axis + '.png')
+        fig.savefig(path)
+        plt.close(fig)
+        print('plotted ' + path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--axes', default=','.join(_AXIS_ORDER),
+                        help='comma separated, of ' + ', '.join(_AXIS_ORDER))
+    parser.add_argument('--max-bases', default='500M',
+                        help='skip genomes bigger than this, e.g. 5G for the whole size axis')
+    parser.add_argument('--rss-interval', type=float, default=0.01)
+    parser.add_argument('--work-dir', default=None,
+                        help='where to make the scratch directory and inputs')
+    parser.add_argument('--output', help='write the results as JSON here')
+    parser.add_argument('--plot-dir', help='draw the curves of each axis here')
+    parser.add_argument('--plot', metavar='SWEEP', help='plot a saved sweep and exit')
+    parser.add_argument('--verbose', action='store_true', help="show the Impl's output")
+    args = parser.parse_args()
+
+    if args.plot:
+        with open(args.plot) as f:
+            plot(json.load(f), args.plot_dir or '.')
+        return
+    axes = [a.strip() for a in args.axes.split(',') if a.strip()]
+    unknown = [a for a in axes if a not in AXES]
+    if unknown:
+        parser.error('unknown axes: ' + ', '.join(unknown))
+
+    work_dir = tempfile.mkdtemp(dir=args.work_dir)
+    try:
+        bench = Bench(work_dir, args.rss_interval, echo=args.verbose)
+        try:
+            axes_results = sweep(bench, axes, parse_size(args.max_bases), work_dir)
+        finally:
+            bench.close()
+    finally:
+        shutil.rmtree(work_dir)
+    result = {'meta': {'python': platform.python_version(),
+                       'host': platform.node(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()),
+                       'max_bases': args.max_bases},
+              'axes': axes_results}
+
+    print_sweep(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    if args.plot_dir:
+        plot(result, args.plot_dir)
+
+
+if __name__ == '__main__':
+    main()
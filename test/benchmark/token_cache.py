@@ -0,0 +1,175 @@
+'''
+Contention on the auth client's token cache and on the auth service.
+
+cache: threads look tokens up in a full cache while new tokens keep
+    pushing it past its size, with the old sort-and-halve eviction, the
+    LRU cache and the file backed cache shared between processes.
+validate: threads all ask for the same token the cache doesn't have,
+    against a local stand-in auth service with --auth-ms latency,
+    counting how many calls reach the service.
+processes: the same tokens are validated in each of --processes
+    workers in turn, as a user's requests land on different uwsgi
+    workers, with a cache per process and with a shared one.
+
+usage:
+    python token_cache.py [--threads 25] [--ops 20000] [--maxsize 2000]
+                          [--processes 5]
+'''
+from __future__ import print_function
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, '..', '..', 'lib'))
+sys.path.insert(0, os.path.join(_HERE, '..'))
+
+from GenomeAnnotationFileUtil import authclient  # @IgnorePep8
+from auth_standin import AuthStandin  # @IgnorePep8
+
+
+class SortingTokenCache(object):
+    ''' The cache as it was: evicts the older half, by sorting, once past maxsize. '''
+
+    _lock = threading.RLock()
+
+    def __init__(self, maxsize=2000):
+        self._cache = {}
+        self._maxsize = maxsize
+        self._halfmax = maxsize // 2
+
+    def get_user(self, token):
+        token = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        with self._lock:
+            usertime = self._cache.get(token)
+        if not usertime:
+            return None
+        user, intime = usertime
+        if time.time() - intime > 5 * 60:
+            return None
+        return user
+
+    def add_valid_token(self, token, user):
+        token = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        with self._lock:
+            self._cache[token] = [user, time.time()]
+            if len(self._cache) > self._maxsize:
+                for i, (t, _) in enumerate(sorted(self._cache.items(),
+                                                  key=lambda kv: kv[1][1])):
+                    if i <= self._halfmax:
+                        del self._cache[t]
+                    else:
+                        break
+
+
+def run_threads(threads, work):
+    workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.time() - start
+
+
+def bench_cache(name, cache, threads, ops, maxsize):
+    for i in range(maxsize):
+        cache.add_valid_token('token-{}'.format(i), 'user')
+    per_thread = ops // threads
+    worst = [0.0]
+
+    def work(n):
+        for i in range(per_thread):
+            start = time.time()
+            if i % 10 == 0:
+                # a new user: every tenth request brings an uncached token
+                cache.add_valid_token('new-{}-{}'.format(n, i), 'user')
+            else:
+                cache.get_user('token-{}'.format((n * per_thread + i) % maxsize))
+            worst[0] = max(worst[0], time.time() - start)
+    elapsed = run_threads(threads, work)
+    return {'cache': name, 'threads': threads,
+            'ops': per_thread * threads, 'seconds': elapsed,
+            'us_per_op': elapsed / (per_thread * threads) * 1e6,
+            'worst_op_ms': worst[0] * 1000}
+
+
+def bench_validate(threads, auth_ms):
+    server = AuthStandin({'token': 'user'}, delay=auth_ms / 1000.0).start()
+    try:
+        auth = authclient.KBaseAuth(server.url)
+        elapsed = run_threads(threads, lambda n: auth.get_user('token'))
+        return {'threads': threads, 'seconds': elapsed,
+                'auth_calls': server.calls}
+    finally:
+        server.stop()
+
+
+def bench_processes(processes, tokens, shared_path):
+    server = AuthStandin(dict(('token-{}'.format(i), 'user')
+                              for i in range(tokens))).start()
+
+    def work():
+        cache = authclient.SharedTokenCache(shared_path) if shared_path else None
+        auth = authclient.KBaseAuth(server.url, cache=cache)
+        for i in range(tokens):
+            auth.get_user('token-{}'.format(i))
+    try:
+        start = time.time()
+        for _ in range(processes):
+            worker = multiprocessing.Process(target=work)
+            worker.start()
+            worker.join()
+        return {'cache': 'shared' if shared_path else 'per-process',
+                'processes': processes, 'tokens': tokens,
+                'seconds': time.time() - start, 'auth_calls': server.calls}
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--threads', type=int, default=25)
+    parser.add_argument('--ops', type=int, default=20000)
+    parser.add_argument('--maxsize', type=int, default=2000)
+    parser.add_argument('--auth-ms', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        caches = [
+            ('sort-and-halve', SortingTokenCache(args.maxsize)),
+            ('lru', authclient.TokenCache(args.maxsize)),
+            ('shared', authclient.SharedTokenCache(
+                os.path.join(tmp, 'bench'), args.maxsize))]
+        results = {
+            'cache': [bench_cache(name, cache, args.threads, args.ops, args.maxsize)
+                      for name, cache in caches],
+            'validate': bench_validate(args.threads, args.auth_ms),
+            'processes': [bench_processes(args.processes, 100, path)
+                          for path in (None, os.path.join(tmp, 'processes'))]}
+    finally:
+        shutil.rmtree(tmp)
+    for r in results['cache']:
+        print('{cache:>14} {threads} threads: {us_per_op:7.1f} us/op, '
+              'worst {worst_op_ms:.1f} ms'.format(**r))
+    print('{threads} threads validating one token: {auth_calls} auth service '
+          'call(s) in {seconds:.3f} s'.format(**results['validate']))
+    for r in results['processes']:
+        print('{processes} processes validating {tokens} tokens, {cache:>11} cache: '
+              '{auth_calls} auth service calls'.format(**r))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
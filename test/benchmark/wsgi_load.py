@@ -0,0 +1,545 @@
+'''
+Throughput, latency and errors of the JSON-RPC server under a mix of
+status, upload, download and export calls, to size uwsgi's --processes
+and --threads from data rather than guesses.
+
+The load goes to one of:
+    in-process  the Application WSGI callable, called directly by the
+                client threads as the threads of one uwsgi worker would
+                (the default; the server module is python 2, as in the
+                module's image)
+    --server    a server started with --server-command for each of the
+                --workers PROCESSESxTHREADS settings in turn, by default
+                uwsgi as start_server.sh runs it
+    --url       a server that is already running, with its own services
+In the first two the upstream services are the stand-ins of
+kbase_standins and auth_standin, run in a child process, and deploy.cfg
+is pointed at them and at a scratch directory of the run.
+
+--concurrency client threads send calls picked at random in the --mix
+proportions, back to back, or with --rate at that many calls a second in
+all, evenly spaced or with --poisson at random.  With a rate the load is
+open loop: latency counts from when a call was due, so a server that
+falls behind is charged for the wait, and calls still waiting at the end
+are reported as unsent.  Calls due in the first --warmup seconds are not
+counted.
+
+A genome is uploaded before the load for the downloads and exports, and
+each upload of the mix uploads it again; it is the --upload-bases
+synthetic genome of genbank_generator, or --upload-path.  For each method
+and in all, the calls, errors, error rate, throughput and latency
+percentiles of the successful calls are printed, and written as JSON with
+--output.  Needs the module's run-time dependencies.
+
+usage:
+    python wsgi_load.py [--mix status=8,export=1,upload=1] [--concurrency 25]
+        [--rate 50 [--poisson]] [--duration 30] [--output load.json]
+    python wsgi_load.py --server --workers 5x5,10x5,5x10 [--rate 50]
+    python wsgi_load.py --url http://host:5000 --token TOKEN --upload-path /data/g.gbff
+'''
+from __future__ import print_function
+
+import argparse
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shlex
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from ConfigParser import RawConfigParser  # py2
+    from Queue import Queue
+except ImportError:
+    from configparser import RawConfigParser  # py3
+    from queue import Queue
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_LIB = os.path.join(_HERE, '..', '..', 'lib')
+sys.path.insert(0, _LIB)
+sys.path.insert(0, os.path.join(_HERE, '..'))
+
+import requests  # @IgnorePep8
+from auth_standin import AuthStandin  # @IgnorePep8
+from genbank_generator import parse_size, write_genbank  # @IgnorePep8
+from kbase_standins import KBaseStandins  # @IgnorePep8
+
+SERVICE = 'GenomeAnnotationFileUtil'
+METHODS = {'status': 'status',
+           'upload': 'genbank_to_genome_annotation',
+           'download': 'genome_annotation_to_genbank',
+           'export': 'export_genome_annotation_as_genbank'}
+PERCENTILES = (50, 90, 95, 99)
+TOKEN = 'load-token'
+SERVER_COMMAND = ('uwsgi --master --processes {processes} --threads {threads} '
+                  '--http 127.0.0.1:{port} --wsgi-file {wsgi_file}')
+_ids = itertools.count(1)
+
+
+def parse_mix(text):
+    ''' Parses 'status=8,export=1' into [(method, weight)]. '''
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in METHODS:
+            raise ValueError('unknown method {} in the mix, not one of {}'.format(
+                name, ', '.join(sorted(METHODS))))
+        mix.append((name, float(weight or 1)))
+    if not mix or sum(w for _, w in mix) <= 0:
+        raise ValueError('the mix has no calls in it')
+    return mix
+
+
+def _chooser(mix):
+    total = sum(w for _, w in mix)
+    bounds = []
+    upto = 0.0
+    for name, weight in mix:
+        upto += weight / total
+        bounds.append((upto, name))
+
+    def choose(rng):
+        x = rng.random()
+        for bound, name in bounds:
+            if x < bound:
+                return name
+        return bounds[-1][1]
+    return choose
+
+
+def _request(method, params):
+    return json.dumps({'version': '1.1', 'id': str(next(_ids)),
+                       'method': '{}.{}'.format(SERVICE, METHODS[method]),
+                       'params': params}).encode('utf-8')
+
+
+def _outcome(ok, body):
+    ''' Returns (result, error) from an HTTP status and a JSON-RPC response body. '''
+    try:
+        resp = json.loads(body.decode('utf-8'))
+    except ValueError:
+        return None, 'unreadable response: {!r}'.format(body[:200])
+    error = resp.get('error') if isinstance(resp, dict) else None
+    if error or not ok:
+        if isinstance(error, dict):
+            return None, '{}: {}'.format(error.get('name'), error.get('message'))
+        return None, str(error)
+    return resp.get('result'), None
+
+
+class WsgiTarget(object):
+    ''' Calls a WSGI application directly, with no HTTP in between. '''
+
+    def __init__(self, app, token):
+        self.app = app
+        self.token = token
+        self.name = 'in-process'
+
+    def call(self, method, params):
+        body = _request(method, params)
+        environ = {'REQUEST_METHOD': 'POST', 'PATH_INFO': '/',
+                   'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body),
+                   'REMOTE_ADDR': '127.0.0.1', 'HTTP_AUTHORIZATION': self.token}
+        status = []
+        out = b''.join(self.app(environ, lambda s, headers: status.append(s)))
+        return _outcome(status[0].startswith('200'), out)
+
+
+class HttpTarget(object):
+    ''' Posts to a server, with a kept-alive connection per client thread. '''
+
+    def __init__(self, url, token, timeout, name=None):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.name = name or url
+        self._local = threading.local()
+
+    def call(self, method, params):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        try:
+            resp = session.post(self.url, data=_request(method, params), timeout=self.timeout,
+                                headers={'Authorization': self.token})
+        except requests.RequestException as e:
+            return None, '{}: {}'.format(type(e).__name__, e)
+        return _outcome(resp.status_code == 200, resp.content)
+
+
+def percentile(ordered, q):
+    ''' The nearest rank q-th percentile of sorted values, or None if there are none. '''
+    if not ordered:
+        return None
+    rank = int(math.ceil(q / 100.0 * len(ordered)))
+    return ordered[max(rank, 1) - 1]
+
+
+def summarize(records, seconds, unsent=0):
+    ''' Counts, rates and latency of (due, started, finished, error) records. '''
+    latencies = sorted(finished - due for due, _, finished, error in records if not error)
+    waits = sorted(started - due for due, started, _, error in records)
+    errors = [error for _, _, _, error in records if error]
+    summary = {'calls': len(records),
+               'errors': len(errors),
+               'error_rate': len(errors) / float(len(records)) if records else 0.0,
+               'unsent': unsent,
+               'throughput': len(latencies) / seconds,
+               'latency': dict(('p{}'.format(q), percentile(latencies, q))
+                               for q in PERCENTILES),
+               'wait_p99': percentile(waits, 99)}
+    summary['latency']['mean'] = sum(latencies) / len(latencies) if latencies else None
+    summary['latency']['max'] = latencies[-1] if latencies else None
+    # a few of the errors, each once, to tell what went wrong
+    summary['error_samples'] = sorted(set(errors))[:5]
+    return summary
+
+
+def drive(target, calls, mix, concurrency, duration, warmup, rate=0, poisson=False, seed=0):
+    '''
+    Sends calls to target for warmup + duration seconds and returns the
+    summaries by method and in all.  calls maps each method to a function
+    of a client thread's number that returns its params.
+    '''
+    choose = _chooser(mix)
+    start = time.time() + 0.1
+    counted_from = start + warmup
+    end = counted_from + duration
+    records = []
+    unsent = []
+
+    def send(worker, method, due):
+        started = time.time()
+        try:
+            _, error = target.call(method, calls[method](worker))
+        except Exception as e:
+            error = '{}: {}'.format(type(e).__name__, e)
+        records.append((method, due, started, time.time(), error))
+
+    def closed_loop(worker):
+        rng = random.Random(seed * 1000 + worker)
+        time.sleep(max(start - time.time(), 0))
+        while time.time() < end:
+            send(worker, choose(rng), time.time())
+
+    queue = Queue()
+
+    def open_loop(worker):
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            method, due = item
+            if time.time() >= end:
+                unsent.append((method, due))
+                continue
+            send(worker, method, due)
+
+    def dispatch():
+        rng = random.Random(seed)
+        due = start
+        while due < end:
+            time.sleep(max(due - time.time(), 0))
+            queue.put((choose(rng), due))
+            due += rng.expovariate(rate) if poisson else 1.0 / rate
+        for _ in range(concurrency):
+            queue.put(None)
+
+    threads = [threading.Thread(target=open_loop if rate else closed_loop, args=(i,))
+               for i in range(concurrency)]
+    if rate:
+        threads.append(threading.Thread(target=dispatch))
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+
+    counted = [r for r in records if r[1] >= counted_from]
+    not_sent = [m for m, due in unsent if due >= counted_from]
+    summaries = {'all': summarize([r[1:] for r in counted], duration, len(not_sent))}
+    for method, _ in mix:
+        summaries[method] = summarize([r[1:] for r in counted if r[0] == method], duration,
+                                      not_sent.count(method))
+    return summaries
+
+
+def _serve_standins(conn, scratch):
+    # in a child process, so the stand-ins' work doesn't slow the clients
+    standins = KBaseStandins().start()
+    auth = AuthStandin({TOKEN: 'loaduser'}).start()
+    services = standins.config(scratch)
+    services['auth-server-url'] = auth.url
+    conn.send((services, standins.callback_url))
+    conn.recv()
+    auth.stop()
+    standins.stop()
+
+
+def write_config(path, services, work_dir, export_cache):
+    ''' Writes deploy.cfg's settings, pointed at the stand-ins and the run's scratch. '''
+    parser = RawConfigParser()
+    parser.read(os.path.join(_HERE, '..', '..', 'deploy.cfg'))
+    for key, value in services.items():
+        parser.set(SERVICE, key, value)
+    parser.set(SERVICE, 'metrics-directory', os.path.join(work_dir, 'metrics'))
+    parser.set(SERVICE, 'profile-directory', '')
+    if not export_cache:
+        parser.set(SERVICE, 'export-cache-bytes', '0')
+    elif int(parser.get(SERVICE, 'export-cache-bytes') or 0) <= 0:
+        # deploy.cfg leaves the cache off
+        parser.set(SERVICE, 'export-cache-bytes', str(5 * 2 ** 30))
+    with open(path, 'w') as f:
+        parser.write(f)
+
+
+def _free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+class Server(object):
+    ''' A server run by a command, up once it answers a status call. '''
+
+    def __init__(self, command, env, log_path, timeout):
+        self.log_path = log_path
+        self.log = open(log_path, 'w')
+        self.proc = subprocess.Popen(shlex.split(command), env=env, stdout=self.log,
+                                     stderr=subprocess.STDOUT)
+        self.timeout = timeout
+
+    def wait_until_up(self, target):
+        deadline = time.time() + self.timeout
+        while True:
+            if self.proc.poll() is not None:
+                raise RuntimeError('the server exited with {}; see {}'.format(
+                    self.proc.returncode, self.log_path))
+            _, error = target.call('status', [])
+            if error is None:
+                return
+            if time.time() > deadline:
+                raise RuntimeError('the server did not answer in {}s: {}'.format(
+                    self.timeout, error))
+            time.sleep(0.5)
+
+    def stop(self):
+        if self.proc.poll() is None:
+            # uwsgi's master stops its workers on SIGINT
+            self.proc.send_signal(signal.SIGINT)
+            deadline = time.time() + 30
+            while self.proc.poll() is None and time.time() < deadline:
+                time.sleep(0.1)
+            if self.proc.poll() is None:
+                self.proc.kill()
+                self.proc.wait()
+        self.log.close()
+
+
+def _calls(upload_path, genome_ref, workspace):
+    return {'status': lambda worker: [],
+            'upload': lambda worker: [{'file_path': upload_path, 'workspace_name': workspace,
+                                       'genome_name': 'load_upload_{}'.format(worker)}],
+            'download': lambda worker: [{'genome_ref': genome_ref}],
+            'export': lambda worker: [{'input_ref': genome_ref}]}
+
+
+def _first_genome(target, upload_path, workspace):
+    result, error = target.call('upload', [{'file_path': upload_path,
+                                            'workspace_name': workspace,
+                                            'genome_name': 'load_genome'}])
+    if error:
+        raise RuntimeError('uploading the genome for the load failed: ' + error)
+    return result[0]['genome_annotation_ref']
+
+
+def _load(target, args, mix, upload_path, genome_ref):
+    needs = set(name for name, _ in mix)
+    if genome_ref is None and needs & set(('download', 'export')):
+        genome_ref = _first_genome(target, upload_path, args.workspace)
+    summaries = drive(target, _calls(upload_path, genome_ref, args.workspace), mix,
+                      args.concurrency, args.duration, args.warmup, args.rate, args.poisson,
+                      args.seed)
+    return {'target': target.name, 'summaries': summaries}
+
+
+def print_run(run):
+    print('\n{}'.format(run['target']))
+    print('{:<10} {:>7} {:>7} {:>7} {:>7} {:>9} {:>8} {:>8} {:>8} {:>8} {:>8}'.format(
+        'method', 'calls', 'errors', 'err %', 'unsent', 'calls/s', 'p50', 'p90', 'p95',
+        'p99', 'max'))
+    summaries = run['summaries']
+    for method in sorted(m for m in summaries if m != 'all') + ['all']:
+        s = summaries[method]
+        latency = ['{:8.3f}'.format(s['latency'][k]) if s['latency'][k] is not None
+                   else '{:>8}'.format('-')
+                   for k in ['p{}'.format(q) for q in PERCENTILES] + ['max']]
+        print('{:<10} {:>7} {:>7} {:>7.2f} {:>7} {:>9.2f} {}'.format(
+            method, s['calls'], s['errors'], 100 * s['error_rate'], s['unsent'],
+            s['throughput'], ' '.join(latency)))
+        for sample in s['error_samples'] if method != 'all' else []:
+            print('    error: {}'.format(sample[:160]))
+
+
+def _parse_workers(text):
+    settings = []
+    for part in text.split(','):
+        processes, _, threads = part.strip().lower().partition('x')
+        settings.append((int(processes), int(threads or 1)))
+    return settings
+
+
+def _stubbed(args, mix, work_dir):
+    ''' Runs the load with the upstream services stood in for; returns the runs. '''
+    scratch = os.path.join(work_dir, 'scratch')
+    os.makedirs(scratch)
+    upload_path = args.upload_path
+    if upload_path is None:
+        upload_path = os.path.join(work_dir, 'upload.gbff')
+        write_genbank(upload_path, bases=parse_size(args.upload_bases))
+    parent, child = multiprocessing.Pipe()
+    standins = multiprocessing.Process(target=_serve_standins, args=(child, scratch))
+    standins.daemon = True
+    standins.start()
+    try:
+        services, callback_url = parent.recv()
+        config_path = os.path.join(work_dir, 'deploy.cfg')
+        write_config(config_path, services, work_dir, args.export_cache)
+        env = dict(os.environ, KB_DEPLOYMENT_CONFIG=config_path,
+                   SDK_CALLBACK_URL=callback_url,
+                   PYTHONPATH=os.pathsep.join([os.path.abspath(_LIB)] + (
+                       [os.environ['PYTHONPATH']] if os.environ.get('PYTHONPATH') else [])))
+        if not args.server:
+            run = _in_process(args, mix, env, upload_path, work_dir)
+            print_run(run)
+            return [run]
+        runs = []
+        for processes, threads in _parse_workers(args.workers):
+            port = _free_port()
+            command = args.server_command.format(
+                processes=processes, threads=threads, port=port,
+                wsgi_file=os.path.join(os.path.abspath(_LIB), SERVICE, SERVICE + 'Server.py'))
+            name = '{}x{}'.format(processes, threads)
+            target = HttpTarget('http://127.0.0.1:{}'.format(port), TOKEN, args.timeout,
+                                name='{} processes x {} threads'.format(processes, threads))
+            server = Server(command, env, os.path.join(work_dir, 'server-{}.log'.format(name)),
+                            args.startup_timeout)
+            try:
+                server.wait_until_up(target)
+                run = _load(target, args, mix, upload_path, None)
+            finally:
+                server.stop()
+            run.update(processes=processes, threads=threads)
+            print_run(run)
+            runs.append(run)
+        return runs
+    finally:
+        parent.send('stop')
+        standins.join(10)
+
+
+def _in_process(args, mix, env, upload_path, work_dir):
+    os.environ.update(env)
+    real_stdout = sys.stdout
+    # the Impl prints as it works; that goes to a log, as it would under uwsgi
+    with open(os.path.join(work_dir, 'server.log'), 'w') as log:
+        sys.stdout = log
+        try:
+            from GenomeAnnotationFileUtil.GenomeAnnotationFileUtilServer import application
+            return _load(WsgiTarget(application, TOKEN), args, mix, upload_path, None)
+        finally:
+            sys.stdout = real_stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--mix', default='status=8,export=1,upload=1',
+                        help='method=weight, of ' + ', '.join(sorted(METHODS)))
+    parser.add_argument('--concurrency', type=int, default=25, help='client threads')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='calls a second in all; 0 sends them back to back')
+    parser.add_argument('--poisson', action='store_true',
+                        help='space the calls at random rather than evenly')
+    parser.add_argument('--duration', type=float, default=30, help='seconds counted')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds not counted first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='seconds before an HTTP call is an error')
+    parser.add_argument('--server', action='store_true',
+                        help='start a server for each --workers setting')
+    parser.add_argument('--workers', default='5x5',
+                        help='PROCESSESxTHREADS settings for --server, e.g. 5x5,10x5')
+    parser.add_argument('--server-command', default=SERVER_COMMAND,
+                        help='with {processes}, {threads}, {port} and {wsgi_file}')
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--url', help='load this running server instead')
+    parser.add_argument('--token', default=os.environ.get('KB_AUTH_TOKEN'),
+                        help='for --url; KB_AUTH_TOKEN by default')
+    parser.add_argument('--workspace', default='load_test',
+                        help='where uploads are saved')
+    parser.add_argument('--genome-ref', help='for --url, the genome to download and export')
+    parser.add_argument('--upload-path',
+                        help='GenBank file to upload, which the server must be able to read')
+    parser.add_argument('--upload-bases', default='500k',
+                        help='size of the synthetic genome uploaded otherwise')
+    parser.add_argument('--export-cache', action='store_true',
+                        help="use the export cache, with deploy.cfg's budget or 5 GB if it has "
+                             "none, so repeated exports are hits")
+    parser.add_argument('--work-dir', default=None,
+                        help='where to make the scratch directory, config and logs')
+    parser.add_argument('--output', help='write the results as JSON here')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.rate < 0 or args.concurrency < 1:
+        parser.error('--rate must be 0 or more and --concurrency at least 1')
+    if args.url:
+        needs = set(name for name, _ in mix)
+        if 'upload' in needs or (needs & set(('download', 'export')) and not args.genome_ref):
+            if not args.upload_path:
+                parser.error('--url needs --upload-path to upload, or --genome-ref')
+        runs = [_load(HttpTarget(args.url, args.token, args.timeout), args, mix,
+                      args.upload_path, args.genome_ref)]
+        print_run(runs[0])
+    else:
+        work_dir = tempfile.mkdtemp(dir=args.work_dir)
+        try:
+            runs = _stubbed(args, mix, work_dir)
+        finally:
+            shutil.rmtree(work_dir)
+
+    result = {'meta': {'python': platform.python_version(),
+                       'host': platform.node(),
+                       'cpus': multiprocessing.cpu_count(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()),
+                       'mix': args.mix,
+                       'concurrency': args.concurrency,
+                       'rate': args.rate,
+                       'poisson': args.poisson,
+                       'duration': args.duration,
+                       'warmup': args.warmup},
+              'runs': runs}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from GenomeAnnotationFileUtil import export_cache
+
+
+class ExportCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = export_cache.ExportCache(os.path.join(self.tmp_dir, 'cache'), 1000)
+        self.builds = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def dest(self):
+        d = tempfile.mkdtemp(dir=self.tmp_dir)
+        return os.path.join(d, 'out.gbk')
+
+    def build(self, size):
+        def build(path):
+            self.builds.append(path)
+            time.sleep(0.05)
+            with open(path, 'w') as f:
+                f.write('x' * size)
+        return build
+
+    def test_hit_and_miss(self):
+        first = self.dest()
+        self.assertFalse(self.cache.get('1/2/3', first, self.build(100)))
+        second = self.dest()
+        self.assertTrue(self.cache.get('1/2/3', second, self.build(100)))
+        self.assertEqual(len(self.builds), 1)
+        with open(second) as f:
+            self.assertEqual(f.read(), 'x' * 100)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+        with self.assertRaises(ValueError):
+            self.cache.get('ws/obj', self.dest(), self.build(1))
+
+    def test_handed_out_files_are_not_the_entry(self):
+        first = self.dest()
+        self.cache.get('1/2/3', first, self.build(100))
+        entry = os.path.join(self.tmp_dir, 'cache', '1_2_3.gbk')
+        self.assertFalse(os.path.samefile(first, entry))
+        # a caller editing its file leaves the next hit alone
+        with open(first, 'a') as f:
+            f.write('edited')
+        second = self.dest()
+        self.assertTrue(self.cache.get('1/2/3', second, self.build(100)))
+        with open(second) as f:
+            self.assertEqual(f.read(), 'x' * 100)
+        shared = self.dest()
+        self.cache.get('1/2/3', shared, self.build(100), shared=True)
+        self.assertTrue(os.path.samefile(shared, entry))
+
+    def test_concurrent_requests_build_once(self):
+        dests = [self.dest() for _ in range(8)]
+        threads = [threading.Thread(target=self.cache.get, args=('1/2/3', d, self.build(10)))
+                   for d in dests]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.builds), 1)
+        self.assertTrue(all(os.path.getsize(d) == 10 for d in dests))
+        self.assertEqual(self.cache.stats()['hits'], 7)
+
+    def test_failed_build_leaves_nothing(self):
+        def fail(path):
+            with open(path, 'w') as f:
+                f.write('partial')
+            raise IOError('data api went away')
+        with self.assertRaises(IOError):
+            self.cache.get('1/2/3', self.dest(), fail)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+        self.assertEqual([f for f in os.listdir(self.cache.directory) if f.endswith('.tmp')], [])
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get('1/1/1', self.dest(), self.build(400))
+        self.cache.get('1/2/1', self.dest(), self.build(400))
+        # make 1/1/1 the most recently used one
+        time.sleep(0.05)
+        self.cache.get('1/1/1', self.dest(), self.build(400))
+        self.cache.get('1/3/1', self.dest(), self.build(400))
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertLessEqual(stats['bytes'], 1000)
+        self.assertTrue(self.cache.get('1/1/1', self.dest(), self.build(400)))
+        self.assertFalse(self.cache.get('1/2/1', self.dest(), self.build(400)))
+
+    def test_hits_are_checked(self):
+        checks = []
+        self.cache.get('1/2/3', self.dest(), self.build(10), check=lambda: checks.append(1))
+        # a miss is built with the caller's own access
+        self.assertEqual(checks, [])
+
+        def refuse():
+            raise ValueError('no access')
+        dest = self.dest()
+        with self.assertRaises(ValueError):
+            self.cache.get('1/2/3', dest, self.build(10), check=refuse)
+        self.assertFalse(os.path.exists(dest))
+        self.assertTrue(self.cache.get('1/2/3', self.dest(), self.build(10),
+                                       check=lambda: checks.append(1)))
+        self.assertEqual(checks, [1])
+
+    def test_lock_files_go_with_their_entries(self):
+        def fail(path):
+            raise IOError('data api went away')
+        with self.assertRaises(IOError):
+            self.cache.get('9/9/9', self.dest(), fail)
+        for n in range(1, 6):
+            self.cache.get('1/{}/1'.format(n), self.dest(), self.build(400))
+        locks = sorted(f for f in os.listdir(self.cache.directory)
+                       if f.endswith('.gbk.lock'))
+        self.assertEqual(locks, ['1_4_1.gbk.lock', '1_5_1.gbk.lock'])
+        # a ref whose lock file was removed is locked and built again
+        self.assertFalse(self.cache.get('1/1/1', self.dest(), self.build(400)))
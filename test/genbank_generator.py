@@ -0,0 +1,208 @@
+'''
+Writes synthetic GenBank files of a chosen shape, for scale testing the
+upload and export of genomes from a single 5 Mb contig up to 100k contigs
+and from viral size up to many GB.
+
+Each contig carries evenly spaced genes, each a gene and a CDS feature.
+Some CDSs are on the complement strand and some are joins of two exons,
+and every CDS has a /translation of its full length.  Sequence and
+proteins are cut from a seeded random block, so the same arguments always
+give the same file, and the file is written a line at a time whatever
+its size.
+
+    write_genbank(path, contigs=100, bases=5000000, genes_per_kb=0.9)
+
+usage:
+    python genbank_generator.py out.gbff [--contigs 100] [--bases 5M] [--genes-per-kb 0.9]
+'''
+from __future__ import print_function
+
+import argparse
+import json
+import random
+import textwrap
+
+_LINE_BASES = 60
+_QUALIFIER_WIDTH = 58
+_INDENT = ' ' * 21
+_BLOCK = 1 << 18
+_AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def parse_size(text):
+    ''' Parses a count such as 5M or 100k, in powers of 1000. '''
+    units = {'K': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9, 'T': 10 ** 12}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class _Source(object):
+    ''' Cuts DNA and protein of any length from random blocks. '''
+
+    def __init__(self, seed):
+        rng = random.Random(seed)
+        dna = ''.join(rng.choice('acgt') for _ in range(_BLOCK))
+        protein = ''.join(rng.choice(_AMINO_ACIDS) for _ in range(_BLOCK // 8))
+        # doubled, so any window up to a block long is one slice
+        self._dna = dna + dna
+        self._protein = protein + protein
+        self._rng = rng
+
+    def dna(self, length):
+        ''' Yields the sequence of a contig in pieces. '''
+        start = self._rng.randrange(_BLOCK)
+        while length > 0:
+            n = min(length, _BLOCK)
+            yield self._dna[start:start + n]
+            length -= n
+
+    def protein(self, length):
+        out = []
+        while length > 0:
+            n = min(length, _BLOCK // 8)
+            start = self._rng.randrange(_BLOCK // 8)
+            out.append(self._protein[start:start + n])
+            length -= n
+        return 'M' + ''.join(out)[1:]
+
+    def chance(self, fraction):
+        return self._rng.random() < fraction
+
+
+def _qualifier(key, value, quoted=True):
+    text = '/{}="{}"'.format(key, value) if quoted else '/{}={}'.format(key, value)
+    if ' ' in text:
+        # text is wrapped at spaces, which readers put back when joining the lines
+        lines = textwrap.wrap(text, _QUALIFIER_WIDTH, break_on_hyphens=False)
+    else:
+        lines = [text[i:i + _QUALIFIER_WIDTH] for i in range(0, len(text), _QUALIFIER_WIDTH)]
+    return ''.join(_INDENT + line + '\n' for line in lines)
+
+
+def _feature(kind, location, qualifiers):
+    return '     {:<16}{}\n'.format(kind, location) + ''.join(qualifiers)
+
+
+def _genes(source, name, length, genes_per_kb, gene_length, join_fraction,
+           complement_fraction, note_bytes):
+    ''' Yields (feature text, feature count) for the genes of a contig. '''
+    if genes_per_kb <= 0:
+        return
+    spacing = max(int(1000 / genes_per_kb), 30)
+    size = min(gene_length, spacing - 10)
+    # a gene long enough for a codon and the intron of a join
+    if size < 30:
+        return
+    for n, start in enumerate(range(1, length - size + 1, spacing)):
+        end = start + size - 1
+        tag = '{}_{:06d}'.format(name, n + 1)
+        span = '{}..{}'.format(start, end)
+        cds = span
+        coding = size
+        if source.chance(join_fraction):
+            # two exons around an intron of a tenth of the gene
+            intron = max(size // 10, 3)
+            first_end = start + (size - intron) // 2 - 1
+            cds = 'join({}..{},{}..{})'.format(start, first_end, first_end + intron + 1, end)
+            coding = size - intron
+        if source.chance(complement_fraction):
+            span = 'complement({})'.format(span)
+            cds = 'complement({})'.format(cds)
+        qualifiers = [_qualifier('locus_tag', tag),
+                      _qualifier('product', 'synthetic protein {}'.format(n + 1)),
+                      _qualifier('protein_id', tag + '.1'),
+                      _qualifier('codon_start', 1, quoted=False),
+                      _qualifier('transl_table', 11, quoted=False)]
+        if note_bytes:
+            note = ('synthetic note ' * (note_bytes // 15 + 1))[:note_bytes].strip()
+            qualifiers.append(_qualifier('note', note))
+        qualifiers.append(_qualifier('translation', source.protein(max(coding // 3 - 1, 1))))
+        yield (_feature('gene', span, [_qualifier('locus_tag', tag)]) +
+               _feature('CDS', cds, qualifiers)), 2
+
+
+def _write_record(out, source, name, length, gene_args):
+    out.write('LOCUS       {:<16} {:>11} bp    DNA     linear   BCT 01-JAN-2020\n'.format(
+        name, length))
+    out.write('DEFINITION  Synthetic genome contig {}.\n'.format(name))
+    out.write('ACCESSION   {}\n'.format(name))
+    out.write('VERSION     {}.1\n'.format(name))
+    out.write('KEYWORDS    .\n')
+    out.write('SOURCE      Synthetic organism\n')
+    out.write('  ORGANISM  Synthetic organism\n')
+    out.write('            Bacteria; Synthetic.\n')
+    out.write('FEATURES             Location/Qualifiers\n')
+    out.write(_feature('source', '1..{}'.format(length), [
+        _qualifier('organism', 'Synthetic organism'),
+        _qualifier('mol_type', 'genomic DNA')]))
+    features = 1
+    for text, count in _genes(source, name, length, *gene_args):
+        out.write(text)
+        features += count
+    out.write('ORIGIN\n')
+    position = 1
+    pending = ''
+    for piece in source.dna(length):
+        pending += piece
+        full = len(pending) - len(pending) % _LINE_BASES
+        lines = []
+        for i in range(0, full, _LINE_BASES):
+            line = pending[i:i + _LINE_BASES]
+            lines.append('{:>9} {}\n'.format(position + i, ' '.join(
+                line[j:j + 10] for j in range(0, len(line), 10))))
+        out.write(''.join(lines))
+        position += full
+        pending = pending[full:]
+    if pending:
+        out.write('{:>9} {}\n'.format(position, ' '.join(
+            pending[j:j + 10] for j in range(0, len(pending), 10))))
+    out.write('//\n')
+    return features
+
+
+def write_genbank(path, contigs=1, bases=5000000, genes_per_kb=0.9, gene_length=900,
+                  join_fraction=0.1, complement_fraction=0.5, note_bytes=0, seed=0):
+    '''
+    Writes a GenBank file of contigs records with bases bases between
+    them, split as evenly as possible, and returns its size statistics.
+    genes_per_kb genes of gene_length bases are placed on each contig
+    that has room; join_fraction of their CDSs are joins of two exons and
+    complement_fraction are on the complement strand.  note_bytes adds a
+    /note of that length to each CDS.
+    '''
+    if contigs < 1 or bases < contigs:
+        raise ValueError('need at least one base per contig')
+    source = _Source(seed)
+    gene_args = (genes_per_kb, gene_length, join_fraction, complement_fraction, note_bytes)
+    features = 0
+    with open(path, 'w') as out:
+        for i in range(contigs):
+            length = bases // contigs + (1 if i < bases % contigs else 0)
+            features += _write_record(out, source, 'SYN{:07d}'.format(i + 1), length, gene_args)
+        size = out.tell()
+    return {'contigs': contigs, 'bases': bases, 'features': features, 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--contigs', default='1')
+    parser.add_argument('--bases', default='5M', help='total bases, e.g. 50k, 5M or 8G')
+    parser.add_argument('--genes-per-kb', type=float, default=0.9)
+    parser.add_argument('--gene-length', type=int, default=900)
+    parser.add_argument('--join-fraction', type=float, default=0.1)
+    parser.add_argument('--complement-fraction', type=float, default=0.5)
+    parser.add_argument('--note-bytes', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    stats = write_genbank(args.path, parse_size(args.contigs), parse_size(args.bases),
+                          args.genes_per_kb, args.gene_length, args.join_fraction,
+                          args.complement_fraction, args.note_bytes, args.seed)
+    print(json.dumps(stats, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
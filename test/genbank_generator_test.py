@@ -0,0 +1,64 @@
+import filecmp
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from genbank_generator import write_genbank
+
+
+class GenbankGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_written_as_asked(self):
+        path = os.path.join(self.dir, 'synthetic.gbff')
+        stats = write_genbank(path, contigs=3, bases=30001, genes_per_kb=1,
+                              join_fraction=0.5, note_bytes=300, seed=3)
+        self.assertEqual(stats['bytes'], os.path.getsize(path))
+        with open(path) as f:
+            records = f.read().split('//\n')
+        self.assertEqual(records.pop(), '')
+        self.assertEqual(len(records), 3)
+        bases = features = 0
+        shapes = set()
+        for record in records:
+            length = int(re.match(r'LOCUS +\S+ +(\d+) bp', record).group(1))
+            table, sequence = record.split('FEATURES')[1].split('\nORIGIN\n')
+            self.assertEqual(len(re.sub(r'[\s\d]', '', sequence)), length)
+            bases += length
+            features += len(re.findall(r'^     \S', table, re.M))
+            cds = re.findall(r'^     CDS +(\S+)$', table, re.M)
+            translations = re.findall(r'/translation="([^"]*)"', table)
+            notes = re.findall(r'/note="([^"]*)"', table)
+            self.assertEqual(len(translations), len(cds))
+            for location, translation, note in zip(cds, translations, notes):
+                segments = re.findall(r'(\d+)\.\.(\d+)', location)
+                shapes.add((len(segments), -1 if location.startswith('complement') else 1))
+                coding = sum(int(end) - int(start) + 1 for start, end in segments)
+                self.assertEqual(len(re.sub(r'\s', '', translation)), coding // 3 - 1)
+                # wrapped at spaces
+                self.assertEqual(len(re.sub(r'\s+', ' ', note)), 299)
+        self.assertEqual((bases, features), (30001, stats['features']))
+        # plain and joined CDSs, on both strands
+        self.assertEqual(shapes, set([(1, 1), (1, -1), (2, 1), (2, -1)]))
+
+    def test_same_seed_same_file(self):
+        paths = [os.path.join(self.dir, name) for name in ('a', 'b', 'c')]
+        for path, seed in zip(paths, (1, 1, 2)):
+            write_genbank(path, contigs=2, bases=5000, seed=seed)
+        self.assertTrue(filecmp.cmp(paths[0], paths[1], shallow=False))
+        self.assertFalse(filecmp.cmp(paths[0], paths[2], shallow=False))
+
+    def test_no_genes(self):
+        path = os.path.join(self.dir, 'tiny.gbff')
+        stats = write_genbank(path, contigs=10, bases=200)
+        # too short for a gene, so only the source features
+        self.assertEqual(stats['features'], 10)
+        with self.assertRaises(ValueError):
+            write_genbank(path, contigs=10, bases=5)
@@ -0,0 +1,104 @@
+import unittest
+import os
+import bz2
+import gzip
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+from GenomeAnnotationFileUtil import genbank_input
+
+
+SMALL_GENBANK = '''LOCUS       CONTIG_1                  60 bp    DNA     linear   BCT 01-JAN-2016
+DEFINITION  A tiny test contig.
+ACCESSION   CONTIG_1
+SOURCE      Test organism
+  ORGANISM  Test organism
+            Bacteria.
+FEATURES             Location/Qualifiers
+     source          1..60
+                     /organism="Test organism"
+     gene            complement(join(3..10,20..>30))
+                     /locus_tag="T_0001"
+     CDS             complement(join(3..10,
+                     20..>30))
+                     /locus_tag="T_0001"
+                     /note="a note that wraps over
+                     two lines with a /slash"
+                     /translation="MKRISTTITTTITITTGNGAG
+                     MKR"
+                     /pseudo
+ORIGIN
+        1 atgaaacgca ttagcaccac cattaccacc accatcacca ttaccacagg taacggtgcg
+//
+LOCUS       CONTIG_2                  12 bp    DNA     circular BCT 01-JAN-2016
+DEFINITION  Another contig.
+FEATURES             Location/Qualifiers
+     misc_feature    1^2
+ORIGIN
+        1 acgtacgtac gt
+//
+'''
+
+
+class GenbankInputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_compressed_inputs(self):
+        plain = os.path.join(self.tmp_dir, 'small.gbk')
+        with open(plain, 'w') as f:
+            f.write(SMALL_GENBANK)
+        with open(plain, 'rb') as fin, gzip.open(plain + '.gz', 'wb') as fout:
+            shutil.copyfileobj(fin, fout)
+        with open(plain, 'rb') as fin, bz2.BZ2File(plain + '.bz2', 'wb') as fout:
+            shutil.copyfileobj(fin, fout)
+        with zipfile.ZipFile(plain + '.zip', 'w') as zf:
+            zf.write(plain, 'dir/small.gbk')
+        with tarfile.open(plain + '.tar.gz', 'w:gz') as tf:
+            tf.add(plain, 'small.gbk')
+        expected = {'': None, '.gz': 'gzip', '.bz2': 'bzip2',
+                    '.zip': 'zip', '.tar.gz': 'tar'}
+        with open(plain, 'rb') as f:
+            raw = f.read()
+        for suffix, fmt in expected.items():
+            path = plain + suffix
+            self.assertEqual(genbank_input.detect_compression(path), fmt)
+            streams = []
+            for name, stream in genbank_input.iter_input_streams(path):
+                with stream:
+                    streams.append((name, stream.read()))
+            self.assertEqual(streams, [('small.gbk', raw)])
+
+    def test_is_genbank_file(self):
+        gbk_path = os.path.join(self.tmp_dir, 'ecoli.gbff')
+        src = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'data', 'GCF_000005845.2_ASM584v2_genomic.gbff.gz')
+        with gzip.open(src, 'rb') as fin, open(gbk_path, 'wb') as fout:
+            shutil.copyfileobj(fin, fout)
+        self.assertTrue(genbank_input.is_genbank_file(gbk_path))
+        self.assertFalse(genbank_input.is_genbank_file(src))
+        self.assertFalse(genbank_input.is_genbank_file(self.tmp_dir))
+
+    def test_count_records(self):
+        counts = genbank_input.count_records(
+            line.encode('utf-8') for line in SMALL_GENBANK.splitlines(True))
+        self.assertEqual(counts, {'contigs': 2, 'bases': 72, 'features': 4})
+        # only the LOCUS line of a record cut short
+        counts = genbank_input.count_records(
+            line.encode('utf-8') for line in SMALL_GENBANK.splitlines(True)[:1])
+        self.assertEqual(counts, {'contigs': 1, 'bases': 60, 'features': 0})
+
+    def test_count_ecoli(self):
+        src = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'data', 'GCF_000005845.2_ASM584v2_genomic.gbff.gz')
+        with gzip.open(src, 'rb') as f:
+            counts = genbank_input.count_records(f)
+        self.assertEqual((counts['contigs'], counts['bases']), (1, 4641652))
+        # source, genes, CDSs, RNAs and the rest
+        self.assertGreater(counts['features'], 4319 * 2)
@@ -0,0 +1,115 @@
+'''
+A local stand-in for a KBase JSON-RPC service, for tests and benchmarks
+that need to talk to a real HTTP server without any KBase deployment.
+
+Methods are plain callables registered by their full name, e.g.
+'DataFileUtil.versions', taking the params list and returning the
+result list; an exception is returned as a server error.  The server
+speaks HTTP/1.1 with keep-alive, answers JSON-RPC batch arrays, and
+counts the connections and requests it has seen.
+'''
+from __future__ import print_function
+
+import json
+import socket
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # py3
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # py2
+    from SocketServer import ThreadingMixIn
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        # headers and body go out in separate writes, which Nagle would hold
+        # back on a kept-alive connection
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+            self.server.open_connections.add(self.connection)
+
+    def finish(self):
+        with self.server.lock:
+            self.server.open_connections.discard(self.connection)
+        BaseHTTPRequestHandler.finish(self)
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.requests += 1
+        body = self.rfile.read(int(self.headers['content-length']))
+        req = json.loads(body.decode('utf-8'))
+        if isinstance(req, list):
+            # a batch: one response per call, in order, and errors don't fail the request
+            status = 200
+            resp = [self._respond(r)[1] for r in req]
+        else:
+            status, resp = self._respond(req)
+        out = json.dumps(resp).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _respond(self, req):
+        method = self.server.methods.get(req['method'])
+        if method is None:
+            return 500, {'version': '1.1', 'id': req.get('id'),
+                         'error': {'name': 'JSONRPCError', 'code': -32601,
+                                   'message': 'Method not found', 'error': ''}}
+        try:
+            result = method(req['params'])
+        except Exception as e:
+            # as a KBase server reports an exception in a method
+            return 500, {'version': '1.1', 'id': req.get('id'),
+                         'error': {'name': 'Server error', 'code': -32000,
+                                   'message': '{}: {}'.format(type(e).__name__, e),
+                                   'error': ''}}
+        return 200, {'version': '1.1', 'id': req.get('id'), 'result': result}
+
+    def log_message(self, *args):
+        pass
+
+
+class StandinServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, methods):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.methods = methods
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.open_connections = set()
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        ''' Stops the server and drops its kept-alive connections, as a real shutdown would. '''
+        if self._thread is None:
+            return
+        self.shutdown()
+        self.server_close()
+        self._thread = None
+        with self.lock:
+            connections = list(self.open_connections)
+        for c in connections:
+            try:
+                c.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
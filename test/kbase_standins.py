@@ -0,0 +1,522 @@
+'''
+In-process stand-ins for the KBase services the Impl talks to: the
+Workspace, Shock, the Handle Service and the DataFileUtil callback server.
+They keep everything in memory, so the Impl methods can run end to end
+with no KBase deployment, e.g. for benchmarks.
+
+    services = KBaseStandins().start()
+    config = services.config(scratch)   # workspace-url, shock-url, ...
+    os.environ['SDK_CALLBACK_URL'] = services.callback_url
+    ...
+    services.stop()
+
+The Workspace implements the calls the upload and download code make:
+workspaces are made on first use, objects are versioned, and any data
+saved can be read back whole or as a subset.  Shock speaks enough of the
+REST API to load, describe and download nodes.  DataFileUtil jobs run
+when they are submitted and are finished at the first check.  A call
+nothing implements fails as "Method not found", naming the method.
+'''
+from __future__ import print_function
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+
+from jsonrpc_standin import StandinServer
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # py3
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # py2
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+
+def _timestamp():
+    return time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime())
+
+
+class Workspace(object):
+    ''' The objects of every workspace, by workspace id. '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.workspaces = {}
+        self.names = {}
+        # taxon lookups by the uploader fall back to this one
+        self._save('ReferenceTaxons', 'unknown_taxon', 'KBaseGenomeAnnotations.Taxon-1.0', {
+            'taxonomy_id': -1, 'scientific_name': 'Unknown', 'scientific_lineage': 'Unknown',
+            'domain': 'Unknown', 'kingdom': 'Unknown', 'genetic_code': 11, 'aliases': []})
+
+    def methods(self):
+        return dict(('Workspace.' + name, getattr(self, name)) for name in (
+            'ver', 'create_workspace', 'get_workspace_info', 'save_objects',
+            'get_object_info_new', 'get_object_info3', 'get_objects', 'get_objects2',
+            'get_object_subset', 'get_object_provenance', 'list_objects'))
+
+    def _workspace(self, ws):
+        # by id or name; a name is made a workspace on first use
+        with self.lock:
+            if isinstance(ws, int) or str(ws).isdigit():
+                return self.workspaces[int(ws)]
+            if ws not in self.names:
+                wsid = len(self.workspaces) + 1
+                self.workspaces[wsid] = {'id': wsid, 'name': ws, 'objects': {}, 'object_names': {}}
+                self.names[ws] = wsid
+            return self.workspaces[self.names[ws]]
+
+    def _ws_info(self, w):
+        return [w['id'], w['name'], 'standin', _timestamp(), len(w['objects']), 'a', 'n',
+                'unlocked', {}]
+
+    def _save(self, ws, name, obj_type, data, meta=None, provenance=None):
+        w = self._workspace(ws)
+        body = json.dumps(data, sort_keys=True)
+        with self.lock:
+            objid = w['object_names'].setdefault(name, len(w['object_names']) + 1)
+            versions = w['objects'].setdefault(objid, [])
+            info = [objid, name, obj_type, _timestamp(), len(versions) + 1, 'standin',
+                    w['id'], w['name'], hashlib.md5(body.encode('utf-8')).hexdigest(),
+                    len(body), meta or {}]
+            versions.append({'info': info, 'data': body, 'provenance': provenance or []})
+        return info
+
+    def _find(self, spec):
+        # a {'ref': ...} or {'workspace'/'wsid', 'name'/'objid', 'ver'} object identity
+        if 'ref' in spec:
+            parts = spec['ref'].split('/')
+            ws, obj = parts[0], parts[1]
+            ver = int(parts[2]) if len(parts) > 2 else None
+        else:
+            ws = spec.get('workspace', spec.get('wsid'))
+            obj = spec.get('name', spec.get('objid'))
+            ver = spec.get('ver')
+        w = self._workspace(ws)
+        with self.lock:
+            objid = int(obj) if str(obj).isdigit() else w['object_names'].get(obj)
+            versions = w['objects'].get(objid)
+        if not versions:
+            raise ValueError('No object with name or id {} exists in workspace {}'.format(
+                obj, w['id']))
+        return versions[ver - 1] if ver else versions[-1]
+
+    def _object(self, spec, included=None):
+        found = self._find(spec)
+        data = json.loads(found['data'])
+        if included:
+            data = dict((path.strip('/').split('/')[0], data.get(path.strip('/').split('/')[0]))
+                        for path in included)
+        return {'data': data, 'info': found['info'], 'provenance': found['provenance'],
+                'refs': [], 'created': found['info'][3], 'creator': 'standin'}
+
+    def ver(self, params):
+        return ['0.0.0-standin']
+
+    def create_workspace(self, params):
+        return [self._ws_info(self._workspace(params[0]['workspace']))]
+
+    def get_workspace_info(self, params):
+        p = params[0]
+        return [self._ws_info(self._workspace(p.get('workspace', p.get('id'))))]
+
+    def save_objects(self, params):
+        p = params[0]
+        ws = p.get('workspace', p.get('id'))
+        return [[self._save(ws, o.get('name') or str(uuid.uuid4()), o['type'], o['data'],
+                            o.get('meta'), o.get('provenance')) for o in p['objects']]]
+
+    def get_object_info_new(self, params):
+        p = params[0]
+        infos = []
+        for spec in p['objects']:
+            try:
+                infos.append(self._find(spec)['info'])
+            except (KeyError, ValueError):
+                if not p.get('ignoreErrors'):
+                    raise
+                infos.append(None)
+        return [infos]
+
+    def get_object_info3(self, params):
+        return [{'infos': self.get_object_info_new(params)[0], 'paths': []}]
+
+    def get_objects(self, params):
+        return [[self._object(spec) for spec in params[0]]]
+
+    def get_objects2(self, params):
+        return [{'data': [self._object(spec, spec.get('included'))
+                          for spec in params[0]['objects']]}]
+
+    def get_object_subset(self, params):
+        return [[self._object(spec, spec.get('included')) for spec in params[0]]]
+
+    def get_object_provenance(self, params):
+        return [[self._object(spec) for spec in params[0]]]
+
+    def list_objects(self, params):
+        p = params[0]
+        infos = []
+        for ws in p.get('workspaces', []) + p.get('ids', []):
+            w = self._workspace(ws)
+            with self.lock:
+                infos += [versions[-1]['info'] for versions in w['objects'].values()]
+        return [infos]
+
+
+class _ShockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body, content_type='application/json', headers=()):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _node_id(self):
+        parts = urlparse(self.path).path.strip('/').split('/')
+        return parts[1] if len(parts) > 1 and parts[0] == 'node' else None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        node_id = self._node_id()
+        if node_id is None:
+            return self._send(200, {'id': 'Shock', 'type': 'Shock', 'version': '0.9.6',
+                                    'url': self.server.url})
+        node = self.server.store.nodes.get(node_id)
+        if node is None:
+            return self._send(404, {'status': 404, 'data': None, 'error': ['Node not found']})
+        query = parse_qs(url.query, keep_blank_values=True)
+        if 'download' in query or 'download_raw' in query:
+            return self._send(200, node['bytes'], 'application/octet-stream',
+                              [('Content-Disposition',
+                                'attachment; filename=' + node['name'])])
+        if url.path.rstrip('/').endswith('/acl'):
+            return self._send(200, {'status': 200, 'data': self.server.store.acl(), 'error': None})
+        self._send(200, {'status': 200, 'data': self.server.store.describe(node_id),
+                         'error': None})
+
+    def do_PUT(self):
+        self._read_body()
+        node_id = self._node_id()
+        if node_id not in self.server.store.nodes:
+            return self._send(404, {'status': 404, 'data': None, 'error': ['Node not found']})
+        self._send(200, {'status': 200, 'data': self.server.store.acl(), 'error': None})
+
+    def do_DELETE(self):
+        self.server.store.nodes.pop(self._node_id(), None)
+        self._send(200, {'status': 200, 'data': None, 'error': None})
+
+    def do_POST(self):
+        body = self._read_body()
+        fields = _parse_multipart(self.headers.get('Content-Type', ''), body)
+        upload = fields.get('upload', ('', b''))
+        attributes = None
+        if 'attributes' in fields:
+            attributes = json.loads(fields['attributes'][1].decode('utf-8'))
+        node_id = self.server.store.add(upload[0], upload[1], attributes)
+        self._send(200, {'status': 200, 'data': self.server.store.describe(node_id),
+                         'error': None})
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def log_message(self, *args):
+        pass
+
+
+def _parse_multipart(content_type, body):
+    ''' Returns {field name: (file name, bytes)} of a multipart/form-data body. '''
+    if 'boundary=' not in content_type:
+        return {}
+    boundary = content_type.split('boundary=', 1)[1].split(';')[0].strip('"')
+    fields = {}
+    for part in body.split(b'--' + boundary.encode('latin-1'))[1:]:
+        if part.startswith(b'--'):
+            break
+        head, _, content = part.partition(b'\r\n\r\n')
+        disposition = [line for line in head.decode('latin-1').split('\r\n')
+                       if line.lower().startswith('content-disposition')]
+        if not disposition:
+            continue
+        params = dict(p.strip().split('=', 1) for p in disposition[0].split(';')[1:] if '=' in p)
+        name = params.get('name', '').strip('"')
+        fields[name] = (params.get('filename', '').strip('"'), content[:-2])
+    return fields
+
+
+class ShockStore(object):
+    ''' Shock nodes, by id. '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.nodes = {}
+
+    def add(self, name, data, attributes=None):
+        node_id = str(uuid.uuid4())
+        with self.lock:
+            self.nodes[node_id] = {'name': name, 'bytes': data, 'attributes': attributes,
+                                   'created': _timestamp()}
+        return node_id
+
+    def describe(self, node_id):
+        node = self.nodes[node_id]
+        return {'id': node_id, 'version': '1', 'attributes': node['attributes'],
+                'created_on': node['created'], 'last_modified': node['created'],
+                'type': 'basic',
+                'file': {'name': node['name'], 'size': len(node['bytes']),
+                         'checksum': {'md5': hashlib.md5(node['bytes']).hexdigest()},
+                         'format': '', 'virtual': False}}
+
+    def acl(self):
+        user = {'uuid': 'standin', 'username': 'standin'}
+        return {'owner': user, 'read': [user], 'write': [user], 'delete': [user],
+                'public': {'read': False, 'write': False, 'delete': False}}
+
+
+class ShockServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, store):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _ShockHandler)
+        self.store = store
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self.shutdown()
+        self.server_close()
+        self._thread = None
+
+
+class HandleService(object):
+    ''' Handles, by hid. '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handles = {}
+
+    def methods(self):
+        return dict(('AbstractHandle.' + name, getattr(self, name)) for name in (
+            'persist_handle', 'hids_to_handles', 'ids_to_handles', 'are_readable',
+            'is_owner', 'is_readable'))
+
+    def persist_handle(self, params):
+        handle = dict(params[0])
+        with self.lock:
+            handle['hid'] = 'KBH_{}'.format(len(self.handles) + 1)
+            self.handles[handle['hid']] = handle
+        return [handle['hid']]
+
+    def hids_to_handles(self, params):
+        return [[self.handles[hid] for hid in params[0]]]
+
+    def ids_to_handles(self, params):
+        ids = set(params[0])
+        return [[h for h in self.handles.values() if h.get('id') in ids]]
+
+    def are_readable(self, params):
+        return [1]
+
+    def is_owner(self, params):
+        return [1]
+
+    def is_readable(self, params):
+        return [1]
+
+
+class DataFileUtilCallback(object):
+    '''
+    The DataFileUtil calls of the Impl, as SDK jobs of the callback server.
+    Each job runs when it is submitted.
+    '''
+
+    def __init__(self, store, workspace, handles, shock_url):
+        self.store = store
+        self.workspace = workspace
+        self.handles = handles
+        self.shock_url = shock_url
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def methods(self):
+        methods = {'DataFileUtil._check_job': self.check_job,
+                   'CallbackServer.get_provenance': lambda params: [[]]}
+        for name in ('shock_to_file', 'shock_to_file_mass', 'file_to_shock',
+                     'file_to_shock_mass', 'package_for_download', 'versions'):
+            methods['DataFileUtil._{}_submit'.format(name)] = self._submitter(getattr(self, name))
+        return methods
+
+    def _submitter(self, func):
+        def submit(params):
+            try:
+                state = {'finished': 1, 'result': [func(*params)]}
+            except Exception as e:
+                state = {'finished': 1, 'error': {'name': type(e).__name__, 'code': -32000,
+                                                  'message': str(e), 'error': ''}}
+            with self.lock:
+                job_id = str(len(self.jobs) + 1)
+                self.jobs[job_id] = state
+            return [job_id]
+        return submit
+
+    def check_job(self, params):
+        with self.lock:
+            return [self.jobs[params[0]]]
+
+    def versions(self):
+        return ['0.0.0-standin', 'standin']
+
+    def shock_to_file(self, params):
+        node = self.store.nodes[params['shock_id']]
+        path = params['file_path']
+        if os.path.isdir(path):
+            path = os.path.join(path, node['name'])
+        with open(path, 'wb') as f:
+            f.write(node['bytes'])
+        if params.get('unpack') in ('uncompress', 'unpack') and path.endswith('.gz'):
+            with gzip.open(path, 'rb') as fin, open(path[:-3], 'wb') as fout:
+                shutil.copyfileobj(fin, fout)
+            os.remove(path)
+            path = path[:-3]
+        return {'node_file_name': node['name'], 'file_path': path,
+                'size': len(node['bytes']), 'attributes': node['attributes']}
+
+    def shock_to_file_mass(self, params):
+        return [self.shock_to_file(p) for p in params]
+
+    def _pack(self, path, pack):
+        if pack == 'gzip' and not path.endswith('.gz'):
+            with open(path, 'rb') as fin, gzip.open(path + '.gz', 'wb') as fout:
+                shutil.copyfileobj(fin, fout)
+            return path + '.gz'
+        if pack in ('targz', 'zip'):
+            directory = path if os.path.isdir(path) else os.path.dirname(path)
+            if pack == 'targz':
+                archive = directory.rstrip('/') + '.tar.gz'
+                with tarfile.open(archive, 'w:gz') as tar:
+                    tar.add(directory, arcname=os.path.basename(directory))
+            else:
+                archive = directory.rstrip('/') + '.zip'
+                _zip_directory(directory, archive)
+            return archive
+        return path
+
+    def file_to_shock(self, params):
+        path = self._pack(params['file_path'], params.get('pack'))
+        with open(path, 'rb') as f:
+            data = f.read()
+        name = os.path.basename(path)
+        node_id = self.store.add(name, data, params.get('attributes'))
+        handle = None
+        if params.get('make_handle'):
+            handle = {'id': node_id, 'url': self.shock_url, 'type': 'shock', 'file_name': name,
+                      'remote_md5': hashlib.md5(data).hexdigest()}
+            handle['hid'] = self.handles.persist_handle([handle])[0]
+        return {'shock_id': node_id, 'handle': handle, 'node_file_name': name,
+                'size': str(len(data))}
+
+    def file_to_shock_mass(self, params):
+        return [self.file_to_shock(p) for p in params]
+
+    def package_for_download(self, params):
+        directory = params['file_path']
+        if not os.path.isdir(directory):
+            directory = os.path.dirname(directory)
+        for ref in params.get('ws_refs', []):
+            obj = self.workspace._object({'ref': ref})
+            name = 'KBase_object_details_{}.json'.format(ref.replace('/', '_'))
+            with open(os.path.join(directory, name), 'w') as f:
+                json.dump({'info': obj['info'], 'provenance': obj['provenance']}, f)
+        archive = directory.rstrip('/') + '.zip'
+        _zip_directory(directory, archive)
+        with open(archive, 'rb') as f:
+            data = f.read()
+        node_id = self.store.add(os.path.basename(archive), data, params.get('attributes'))
+        return {'shock_id': node_id, 'node_file_name': os.path.basename(archive),
+                'size': str(len(data))}
+
+
+def _zip_directory(directory, archive):
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as z:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                z.write(path, os.path.relpath(path, os.path.dirname(directory)))
+
+
+class KBaseStandins(object):
+    ''' All the stand-ins, each on its own local port. '''
+
+    def __init__(self):
+        self.workspace = Workspace()
+        self.shock_store = ShockStore()
+        self.handle_service = HandleService()
+        self.shock = ShockServer(self.shock_store)
+        self.workspace_server = StandinServer(self.workspace.methods())
+        self.handle_server = StandinServer(self.handle_service.methods())
+        self.callback = DataFileUtilCallback(self.shock_store, self.workspace,
+                                             self.handle_service, self.shock.url)
+        self.callback_server = StandinServer(self.callback.methods())
+
+    @property
+    def callback_url(self):
+        return self.callback_server.url
+
+    def start(self):
+        for server in (self.shock, self.workspace_server, self.handle_server,
+                       self.callback_server):
+            server.start()
+        return self
+
+    def stop(self):
+        for server in (self.shock, self.workspace_server, self.handle_server,
+                       self.callback_server):
+            server.stop()
+
+    def clear(self):
+        ''' Drops every saved object, node and handle but the reference taxon. '''
+        with self.workspace.lock:
+            for w in self.workspace.workspaces.values():
+                if w['name'] != 'ReferenceTaxons':
+                    w['objects'].clear()
+                    w['object_names'].clear()
+        with self.shock_store.lock:
+            self.shock_store.nodes.clear()
+        with self.handle_service.lock:
+            self.handle_service.handles.clear()
+
+    def config(self, scratch):
+        ''' The service URLs and scratch directory of a deploy.cfg. '''
+        return {'workspace-url': self.workspace_server.url,
+                'shock-url': self.shock.url,
+                'handle-service-url': self.handle_server.url,
+                'kbase-endpoint': self.workspace_server.url,
+                'job-service-url': self.callback_server.url,
+                'scratch': scratch}
@@ -0,0 +1,55 @@
+import unittest
+
+from GenomeAnnotationFileUtil import memory_usage
+
+
+class MemoryUsageTest(unittest.TestCase):
+
+    def test_logged_fields(self):
+        usage = memory_usage.MemoryUsage('upload')
+        usage.sizes.update(bytes_in=10, contigs=2)
+        block = bytearray(64 * 2 ** 20)
+        for i in range(0, len(block), 4096):
+            block[i] = 1
+        del block
+        logged = usage.log()
+        self.assertEqual(logged['method'], 'upload')
+        self.assertEqual((logged['bytes_in'], logged['contigs']), (10, 2))
+        self.assertTrue(logged['ok'])
+        self.assertFalse(logged['overlapped'])
+        if logged['peak_reset']:
+            self.assertGreaterEqual(logged['peak_rss'], logged['start_rss'] + 60 * 2 ** 20)
+        with self.assertRaises(RuntimeError):
+            usage.log()
+
+    def test_overlapping_calls(self):
+        first = memory_usage.MemoryUsage('export')
+        second = memory_usage.MemoryUsage('export')
+        self.assertTrue(first.as_dict()['overlapped'])
+        self.assertTrue(second.as_dict()['overlapped'])
+        # once they're done, a new call is measured on its own
+        self.assertFalse(memory_usage.MemoryUsage('export').as_dict()['overlapped'])
+
+    def test_failed_calls_are_logged(self):
+        with self.assertRaises(ValueError):
+            with memory_usage.MemoryUsage('upload'):
+                raise ValueError('bad input')
+        self.assertFalse(memory_usage.MemoryUsage('upload').as_dict()['overlapped'])
+
+    @unittest.skipIf(memory_usage._tracemalloc is None, 'needs tracemalloc')
+    def test_top_allocations(self):
+        usage = memory_usage.MemoryUsage('upload', trace_top=3)
+        kept = [bytearray(2 ** 20) for _ in range(8)]
+        top = usage.as_dict()['top_allocations']
+        self.assertEqual(len(top), 3)
+        self.assertIn('memory_usage_test.py', top[0]['site'])
+        self.assertGreaterEqual(top[0]['bytes'], 8 * 2 ** 20)
+        self.assertFalse(memory_usage._tracemalloc.is_tracing())
+        del kept
+
+    def test_check_fits(self):
+        if memory_usage.available_bytes() is None:
+            self.skipTest('available memory not known here')
+        memory_usage.check_fits('upload', 1)
+        with self.assertRaises(ValueError):
+            memory_usage.check_fits('upload', 2 ** 62)
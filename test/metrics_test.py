@@ -0,0 +1,66 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from GenomeAnnotationFileUtil import metrics
+
+
+def _worker_request(m, method):
+    m.finish(method, m.start(method), True, 100, 10)
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_changes_are_written_after_the_interval(self):
+        m = metrics.Metrics(self.dir, flush_interval=0.2)
+        m.finish('status', m.start('status'), True, 1, 1)
+        m.finish('status', m.start('status'), True, 1, 1)
+        # the first start was written at once, the rest wait for the interval
+        with open(m._path()) as f:
+            self.assertEqual(json.load(f)['requests'], {})
+        time.sleep(0.4)
+        with open(m._path()) as f:
+            self.assertEqual(json.load(f)['requests']['status']['ok'], 2)
+
+    def test_render(self):
+        m = metrics.Metrics()
+        m.finish('status', m.start('status') - 0.2, True, 50, 300)
+        m.finish('status', m.start('status'), False, 50, 100)
+        m.start('genome_annotation_to_genbank')
+        text = m.render()
+        p = metrics.PREFIX
+        self.assertIn(p + 'requests_total{method="status",outcome="ok"} 1\n', text)
+        self.assertIn(p + 'requests_total{method="status",outcome="error"} 1\n', text)
+        self.assertIn(p + 'request_duration_seconds_bucket{le="0.1",method="status"} 1\n', text)
+        self.assertIn(p + 'request_duration_seconds_bucket{le="0.25",method="status"} 2\n', text)
+        self.assertIn(p + 'request_duration_seconds_bucket{le="+Inf",method="status"} 2\n', text)
+        self.assertIn(p + 'request_duration_seconds_count{method="status"} 2\n', text)
+        self.assertIn(p + 'requests_in_flight{method="genome_annotation_to_genbank"} 1\n', text)
+        self.assertIn(p + 'request_bytes_total{method="status"} 100\n', text)
+        self.assertIn(p + 'response_bytes_total{method="status"} 400\n', text)
+
+    def test_workers_are_added_up(self):
+        m = metrics.Metrics(self.dir, flush_interval=0)
+        m.finish('status', m.start('status'), True, 1, 1)
+        for _ in range(3):
+            worker = multiprocessing.Process(target=_worker_request, args=(m, 'status'))
+            worker.start()
+            worker.join()
+        self.assertIn(metrics.PREFIX + 'requests_total{method="status",outcome="ok"} 4\n',
+                      m.render())
+        # a new server doesn't count the requests of an old one
+        self.assertEqual(len(os.listdir(self.dir)), 4)
+        with open(os.path.join(self.dir, '999999999-1.json'), 'w') as f:
+            f.write('{}')
+        metrics.Metrics(self.dir)
+        self.assertEqual(len(os.listdir(self.dir)), 4)
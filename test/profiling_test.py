@@ -0,0 +1,63 @@
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from GenomeAnnotationFileUtil.profiling import Profiler
+
+
+class _Context(dict):
+    ''' Stands in for the server's MethodContext. '''
+
+    def __init__(self, **fields):
+        dict.__init__(self, **fields)
+        self.logged = []
+
+    def log_info(self, message):
+        self.logged.append(message)
+
+    def log_err(self, message):
+        self.logged.append(message)
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_only_flagged_calls_by_default(self):
+        profiler = Profiler(self.dir)
+        self.assertFalse(profiler.wanted(_Context(rpc_context=None)))
+        self.assertFalse(profiler.wanted(_Context(rpc_context={'call_stack': []})))
+        self.assertTrue(profiler.wanted(_Context(rpc_context={'profile': 1})))
+        self.assertTrue(Profiler(self.dir, 1).wanted(_Context(rpc_context=None)))
+        with self.assertRaises(ValueError):
+            Profiler(self.dir, 2)
+
+    def test_profile_is_written_and_logged(self):
+        profiler = Profiler(os.path.join(self.dir, 'profiles'))
+        ctx = _Context(method='export', call_id='1/2', rpc_context={'profile': 1})
+        self.assertEqual(profiler.wrap(ctx, _busy)(1000), _busy(1000))
+        [path] = [os.path.join(self.dir, 'profiles', f)
+                  for f in os.listdir(os.path.join(self.dir, 'profiles'))]
+        self.assertTrue(os.path.basename(path).startswith('export-1_2-'))
+        self.assertEqual(ctx.logged, ['profile written to ' + path])
+        functions = [func[2] for func in pstats.Stats(path).stats]
+        self.assertIn('_busy', functions)
+
+    def test_failed_calls_are_profiled(self):
+        ctx = _Context(method='export', call_id='3', rpc_context={'profile': 1})
+
+        def fail():
+            raise ValueError('no such genome')
+        with self.assertRaises(ValueError):
+            Profiler(self.dir).run(ctx, fail)
+        self.assertEqual(len(os.listdir(self.dir)), 1)
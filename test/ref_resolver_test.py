@@ -0,0 +1,90 @@
+import unittest
+import threading
+import time
+
+from GenomeAnnotationFileUtil import ref_resolver
+
+
+class FakeWorkspace(object):
+    ''' Answers get_object_info_new for objects 1/1 (two versions) and 1/2 named 'genome'. '''
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = []
+        self.latest = {'1': 1, '2': 2}
+
+    def get_object_info_new(self, params):
+        refs = [o['ref'] for o in params['objects']]
+        self.calls.append(refs)
+        time.sleep(self.delay)
+        infos = []
+        for ref in refs:
+            parts = ref.replace('ws/genome', '1/2').split('/')
+            if parts[1] not in self.latest:
+                if params['ignoreErrors']:
+                    infos.append(None)
+                    continue
+                raise ValueError('No object with id ' + parts[1])
+            ver = int(parts[2]) if len(parts) > 2 else self.latest[parts[1]]
+            infos.append([int(parts[1]), 'genome', 'KBaseGenomeAnnotations.GenomeAnnotation',
+                          '', ver, 'owner', int(parts[0]), 'ws', '', 0, None])
+        return infos
+
+
+class RefResolverTest(unittest.TestCase):
+
+    def test_batching_and_caching(self):
+        ws = FakeWorkspace()
+        resolver = ref_resolver.RefResolver(lambda: ws, ttl=60)
+        infos = resolver.get_info(['1/1/1', 'ws/genome', '1/1/1'])
+        self.assertEqual([ref_resolver.versioned_ref(i) for i in infos],
+                         ['1/1/1', '1/2/2', '1/1/1'])
+        self.assertEqual(ws.calls, [['1/1/1', 'ws/genome']])
+        # the name and the versioned ref it resolved to are both cached now
+        resolver.get_info(['1/2/2', 'ws/genome'])
+        self.assertEqual(len(ws.calls), 1)
+        stats = resolver.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['calls']), (2, 2, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_unversioned_refs_expire(self):
+        ws = FakeWorkspace()
+        resolver = ref_resolver.RefResolver(lambda: ws, ttl=0.05)
+        self.assertEqual(resolver.get_info(['ws/genome'])[0][4], 2)
+        ws.latest['2'] = 3
+        self.assertEqual(resolver.get_info(['ws/genome'])[0][4], 2)
+        self.assertEqual(resolver.get_info(['ws/genome'], fresh=True)[0][4], 3)
+        ws.latest['2'] = 4
+        time.sleep(0.1)
+        self.assertEqual(resolver.get_info(['ws/genome'])[0][4], 4)
+        # versioned refs don't expire
+        calls = len(ws.calls)
+        resolver.get_info(['1/2/2'])
+        self.assertEqual(len(ws.calls), calls)
+
+    def test_errors(self):
+        ws = FakeWorkspace()
+        resolver = ref_resolver.RefResolver(lambda: ws)
+        with self.assertRaises(ValueError):
+            resolver.get_info(['1/1/1', '1/9'])
+        self.assertEqual(resolver.get_info(['1/9'], ignore_errors=True), [None])
+        with self.assertRaises(ValueError):
+            resolver.get_info(['1/9'])
+
+    def test_concurrent_lookups_are_shared(self):
+        ws = FakeWorkspace(delay=0.1)
+        resolver = ref_resolver.RefResolver(lambda: ws)
+        results = []
+
+        def resolve():
+            results.append(resolver.get_info(['ws/genome'])[0][4])
+        threads = [threading.Thread(target=resolve) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [2] * 10)
+        self.assertEqual(len(ws.calls), 1)
+        stats = resolver.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'] + stats['shared'], 9)
@@ -0,0 +1,77 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from GenomeAnnotationFileUtil import staging
+
+
+class StagingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmp_dir, 'input.gbk')
+        with open(self.src, 'w') as f:
+            f.write('LOCUS       X 1 bp    DNA     linear\n//\n')
+        self.staging_dir = os.path.join(self.tmp_dir, 'staging')
+        os.makedirs(self.staging_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def check_source_untouched(self):
+        with open(self.src) as f:
+            self.assertTrue(f.read().startswith('LOCUS'))
+
+    def test_hardlink_first(self):
+        path, method = staging.stage_file(self.src, self.staging_dir)
+        self.assertEqual(method, staging.HARDLINK)
+        self.assertEqual(path, os.path.join(self.staging_dir, 'input.gbk'))
+        self.assertTrue(os.path.samefile(path, self.src))
+        shutil.rmtree(self.staging_dir)
+        self.check_source_untouched()
+
+    def test_read_in_place(self):
+        path, method = staging.stage_file(
+            self.src, self.staging_dir, (staging.READ_IN_PLACE,))
+        self.assertEqual(method, staging.READ_IN_PLACE)
+        self.assertTrue(os.path.islink(path))
+        with open(path) as f:
+            self.assertTrue(f.read().startswith('LOCUS'))
+        shutil.rmtree(self.staging_dir)
+        self.check_source_untouched()
+
+    def test_falls_back_to_copy(self):
+        # a link can't be made over an existing name, so this exercises the
+        # fallthrough with a name that only the copy can overwrite
+        dest = os.path.join(self.staging_dir, 'input.gbk')
+        with open(dest, 'w') as f:
+            f.write('stale')
+        path, method = staging.stage_file(
+            self.src, self.staging_dir,
+            (staging.HARDLINK, staging.READ_IN_PLACE, staging.COPY))
+        self.assertEqual(method, staging.COPY)
+        self.assertFalse(os.path.samefile(path, self.src))
+        with open(path) as f:
+            self.assertTrue(f.read().startswith('LOCUS'))
+        self.check_source_untouched()
+
+    def test_parse_strategies(self):
+        self.assertEqual(staging.parse_strategies('hardlink, copy'),
+                         (staging.HARDLINK, staging.COPY))
+        with self.assertRaises(ValueError):
+            staging.parse_strategies('hardlink,teleport')
+        with self.assertRaises(ValueError):
+            staging.stage_file(self.src + '.missing', self.staging_dir)
+
+    def test_create_new_file_never_opens_a_staged_path(self):
+        for strategy in (staging.HARDLINK, staging.READ_IN_PLACE):
+            path, _ = staging.stage_file(self.src, self.staging_dir, (strategy,))
+            new_path, out = staging.create_new_file(self.staging_dir, 'input.gbk')
+            with out:
+                out.write(b'decompressed')
+            self.assertEqual(new_path, os.path.join(self.staging_dir, 'input.1.gbk'))
+            self.check_source_untouched()
+            shutil.rmtree(self.staging_dir)
+            os.makedirs(self.staging_dir)
+
@@ -0,0 +1,96 @@
+import json
+import sys
+import threading
+import time
+import unittest
+
+from GenomeAnnotationFileUtil import timings
+from GenomeAnnotationFileUtil.timings import PhaseTimer
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class PhaseTimerTest(unittest.TestCase):
+
+    def test_phases_add_up(self):
+        timer = PhaseTimer('upload')
+        with timer.phase('stage_input'):
+            time.sleep(0.02)
+        for _ in range(2):
+            with timer.phase('parse_input'):
+                time.sleep(0.01)
+        with self.assertRaises(ValueError):
+            with timer.phase('save'):
+                raise ValueError('failed')
+        timings = timer.as_dict()
+        self.assertEqual(sorted(timings), ['parse_input', 'save', 'stage_input', 'total'])
+        self.assertGreaterEqual(timings['parse_input'], 0.02)
+        self.assertGreaterEqual(timings['total'],
+                                timings['stage_input'] + timings['parse_input'])
+
+    def test_threads_add_up(self):
+        timer = PhaseTimer('mass_download')
+
+        def work():
+            with timer.phase('download'):
+                time.sleep(0.05)
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        timings = timer.as_dict()
+        # the phase ran four times at once, so it adds up to more than the call
+        self.assertGreaterEqual(timings['download'], 0.2)
+        self.assertLess(timings['total'], timings['download'])
+
+    def test_log(self):
+        timer = PhaseTimer('export')
+        with timer.phase('resolve_ref'):
+            pass
+        with timer.phase('package_for_download'):
+            pass
+        out = StringIO()
+        real_stdout = sys.stdout
+        sys.stdout = out
+        try:
+            timer.log()
+        finally:
+            sys.stdout = real_stdout
+        prefix, logged = out.getvalue().split(' ', 1)
+        self.assertEqual(prefix, 'timings')
+        logged = json.loads(logged)
+        self.assertEqual(logged['method'], 'export')
+        self.assertEqual(logged['order'], ['resolve_ref', 'package_for_download'])
+        self.assertEqual(sorted(logged['phases']), sorted(logged['order']))
+
+    def test_probes(self):
+        counter = [0]
+
+        def start():
+            counter[0] += 10
+            return counter[0]
+        timings.add_probe('work', start, lambda started: counter[0] - started + 1)
+        timings.add_probe('most', lambda: None, lambda _: counter[0], max)
+        try:
+            timer = PhaseTimer('upload')
+            for _ in range(2):
+                with timer.phase('parse_input'):
+                    pass
+        finally:
+            timings.remove_probes()
+        with timer.phase('save'):
+            pass
+        out = StringIO()
+        real_stdout = sys.stdout
+        sys.stdout = out
+        try:
+            timer.log()
+        finally:
+            sys.stdout = real_stdout
+        logged = json.loads(out.getvalue().split(' ', 1)[1])
+        self.assertEqual(logged['probes'], {'work': {'parse_input': 2},
+                                            'most': {'parse_input': 20}})
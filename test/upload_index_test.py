@@ -0,0 +1,64 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from GenomeAnnotationFileUtil import upload_index
+
+
+class UploadIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'upload-index.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_normalize_params(self):
+        base = {'workspace_name': 'ws', 'genome_name': 'g'}
+        key = upload_index.normalize_params(base)
+        # the input location and explicit defaults don't change the key
+        self.assertEqual(key, upload_index.normalize_params(
+            dict(base, file_path='/a/b.gbk', source='Genbank', dedup=1)))
+        self.assertNotEqual(key, upload_index.normalize_params(
+            dict(base, taxon_wsname='OtherTaxons')))
+        self.assertNotEqual(key, upload_index.normalize_params(
+            dict(base, convert_to_legacy=1)))
+
+    def test_hash_files(self):
+        a = self.write('a.gbk', 'LOCUS A\n//\n')
+        b = self.write('b.gbk', 'LOCUS B\n//\n')
+        a2 = self.write('renamed.gbk', 'LOCUS A\n//\n')
+        self.assertEqual(upload_index.hash_files([a]), upload_index.hash_files([a2]))
+        self.assertNotEqual(upload_index.hash_files([a]), upload_index.hash_files([b]))
+        self.assertEqual(upload_index.hash_files([a, b]), upload_index.hash_files([b, a2]))
+
+    def test_lookup_store_forget(self):
+        index = upload_index.UploadIndex(self.db_path)
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.lookup('h1', 'p'))
+        index.store('h1', 'p', '1/2/3')
+        # a second instance stands in for another worker process
+        other = upload_index.UploadIndex(self.db_path)
+        self.assertEqual(other.lookup('h1', 'p'), '1/2/3')
+        self.assertIsNone(other.lookup('h1', 'q'))
+        other.forget('h1', 'p')
+        self.assertIsNone(index.lookup('h1', 'p'))
+
+    def test_evicts_least_recently_used(self):
+        index = upload_index.UploadIndex(self.db_path, max_entries=2)
+        index.store('h1', 'p', '1/1/1')
+        index.store('h2', 'p', '1/2/1')
+        index.lookup('h1', 'p')
+        index.store('h3', 'p', '1/3/1')
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.lookup('h1', 'p'), '1/1/1')
+        self.assertIsNone(index.lookup('h2', 'p'))
+        self.assertEqual(index.lookup('h3', 'p'), '1/3/1')